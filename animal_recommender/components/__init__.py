@@ -0,0 +1,7 @@
+## Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+## SPDX-License-Identifier: MIT-0
+from animal_recommender.components.component import Component
+from animal_recommender.components.datasets import PersonalizeDatasets
+from animal_recommender.components.ingestion import Ingestion
+from animal_recommender.components.serving import Serving
+from animal_recommender.components.training import TrainingPipeline
@@ -0,0 +1,56 @@
+## Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+## SPDX-License-Identifier: MIT-0
+import ast, os
+
+from aws_cdk import aws_lambda as _lambda
+
+LAMBDA_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.realpath(__file__))), "lambda"
+)
+
+
+def handler_modules(directory, handler):
+    """The handler module and the modules of the directory it imports.
+
+    Imports are followed through the imported modules and include the ones
+    deferred into functions.
+    """
+    path = os.path.join(LAMBDA_DIR, directory)
+    local = {name[:-3] for name in os.listdir(path) if name.endswith(".py")}
+    modules = set()
+    pending = [handler]
+    while pending:
+        module = pending.pop()
+        if module in modules:
+            continue
+        modules.add(module)
+        with open(os.path.join(path, f"{module}.py")) as fr:
+            tree = ast.parse(fr.read())
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                names = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and not node.level:
+                names = [node.module]
+            else:
+                continue
+            pending.extend(
+                name.split(".")[0] for name in names if name.split(".")[0] in local
+            )
+    return sorted(modules)
+
+
+def lambda_bundle(directory, modules):
+    """Lambda code with only the given modules of a lambda directory.
+
+    The asset hash covers the bundled modules alone, so an edit to a module
+    re-uploads only the bundles that ship it.
+    """
+    return _lambda.Code.from_asset(
+        os.path.join(LAMBDA_DIR, directory),
+        exclude=["*"] + [f"!{module}.py" for module in modules],
+    )
+
+
+def function_bundle(directory, handler):
+    """Lambda code with the handler module and the modules it imports."""
+    return lambda_bundle(directory, handler_modules(directory, handler))
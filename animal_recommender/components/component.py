@@ -0,0 +1,60 @@
+## Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+## SPDX-License-Identifier: MIT-0
+import hashlib, re
+
+import aws_cdk as cdk
+from constructs import Construct
+
+# same rules as the cdk logical id allocation
+HIDDEN_ID = "Default"
+HIDDEN_FROM_HUMAN_ID = "Resource"
+HASH_LEN = 8
+MAX_HUMAN_LEN = 240
+MAX_ID_LEN = 255
+
+
+class Component(Construct):
+    """A group of the stack resources that does not show in their logical ids.
+
+    The resources of a component keep the logical ids they would get as
+    children of the stack, so moving resources between the stack and its
+    components updates a deployed stack in place instead of replacing them.
+    """
+
+    def keep_stack_logical_ids(self):
+        """Override the logical ids of the component resources, call it once
+        the component and the resources added to it are complete."""
+        for construct in self.node.find_all():
+            if isinstance(construct, cdk.CfnElement):
+                construct.override_logical_id(flattened_logical_id(construct))
+
+
+def _unique_id(components):
+    components = [component for component in components if component != HIDDEN_ID]
+    if len(components) == 1:
+        candidate = re.sub("[^A-Za-z0-9]", "", components[0])
+        if len(candidate) <= MAX_ID_LEN:
+            return candidate
+    path_hash = hashlib.md5("/".join(components).encode("utf-8")).hexdigest()
+    human = []
+    for component in components:
+        if not human or not human[-1].endswith(component):
+            human.append(component)
+    human = "".join(
+        re.sub("[^A-Za-z0-9]", "", component)
+        for component in human
+        if component != HIDDEN_FROM_HUMAN_ID
+    )
+    return human[:MAX_HUMAN_LEN] + path_hash[:HASH_LEN].upper()
+
+
+def flattened_logical_id(cfn_element: cdk.CfnElement):
+    """Logical id of the element without the components in its path, or None."""
+    stack = cdk.Stack.of(cfn_element)
+    scopes = cfn_element.node.scopes
+    scopes = scopes[scopes.index(stack) + 1 :]
+    if not any(isinstance(scope, Component) for scope in scopes):
+        return None
+    return _unique_id(
+        [scope.node.id for scope in scopes if not isinstance(scope, Component)]
+    )
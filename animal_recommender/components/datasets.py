@@ -0,0 +1,92 @@
+## Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+## SPDX-License-Identifier: MIT-0
+from animal_recommender.components.component import Component
+from animal_recommender.utils.constants import *
+
+
+class PersonalizeDatasets(Component):
+    """Dataset group with the items and interactions datasets."""
+
+    def __init__(
+        self,
+        scope,
+        construct_id,
+        *,
+        seed_bucket_name,
+        kms_key,
+        personalize_role,
+        dataset_role,
+    ):
+        super().__init__(scope, construct_id)
+        self.kms_key = kms_key
+        self.personalize_role = personalize_role
+        self.dataset_role = dataset_role
+
+        self.create_datasets(seed_bucket_name)
+
+    def create_datasets(self, seed_bucket_name):
+        # Items and interaction schema
+        self.personalize_interaction_schema = personalize.CfnSchema(
+            self,
+            resource_name(personalize.CfnSchema, "recommender-interaction-schema"),
+            name=resource_name(personalize.CfnSchema, "recommender-interaction-schema"),
+            schema='{"type": "record", "name": "Interactions", "namespace": "com.amazonaws.personalize.schema", "fields": [{"name": "USER_ID", "type": "string"}, {"name": "ITEM_ID", "type": "string"}, {"name": "TIMESTAMP", "type": "long"}], "version": "1.0"}',
+        )
+
+        self.personalize_item_schema = personalize.CfnSchema(
+            self,
+            resource_name(personalize.CfnSchema, "recommender-item-schema"),
+            name=resource_name(personalize.CfnSchema, "recommender-item-schema"),
+            schema='{"type": "record", "name": "Items", "namespace": "com.amazonaws.personalize.schema", "fields": [{"name": "ITEM_ID", "type": "string"}, {"name": "ANIMAL_BREED", "type": "string", "categorical": true}, {"name": "ANIMAL_AGE", "type": "string", "categorical": true}, {"name": "ANIMAL_TYPE", "type": "string", "categorical": true}, {"name": "ANIMAL_SIZE", "type": "string", "categorical": true}, {"name": "item_value", "type": "float", "categorical": false}, {"name": "CREATION_TIMESTAMP", "type": "long"}], "version": "1.0"}',
+        )
+        # Dataset group which holds all our personalize resources
+        self.personalize_dataset_group = personalize.CfnDatasetGroup(
+            self,
+            resource_name(personalize.CfnDatasetGroup, "recommender-datasetgroup"),
+            name=resource_name(personalize.CfnDatasetGroup, "recommender-datasetgroup"),
+            kms_key_arn=self.kms_key.key_arn,
+            role_arn=self.personalize_role.role_arn,
+        )
+        self.personalize_dataset_group.node.add_dependency(self.kms_key)
+        self.personalize_dataset_group.node.add_dependency(self.personalize_role)
+
+        # Interactions dataset which points to seed bucket
+        self.personalize_interaction_dataset = personalize.CfnDataset(
+            self,
+            resource_name(personalize.CfnDataset, "recommender-interaction-dataset"),
+            dataset_group_arn=self.personalize_dataset_group.attr_dataset_group_arn,
+            name=resource_name(
+                personalize.CfnDataset, "recommender-interaction-dataset"
+            ),
+            schema_arn=self.personalize_interaction_schema.attr_schema_arn,
+            dataset_type="Interactions",
+            dataset_import_job=personalize.CfnDataset.DatasetImportJobProperty(
+                data_source={
+                    "DataLocation": f"s3://{seed_bucket_name}/seed_data/interactions"
+                },
+                job_name=f"{ENV_PREFIX}-recommender-dataimport-interactions-job",
+                role_arn=self.dataset_role.role_arn,
+            ),
+        )
+        self.personalize_interaction_dataset.node.add_dependency(
+            self.personalize_dataset_group
+        )
+        # Items dataset which points to seed bucket
+        self.personalize_items_dataset = personalize.CfnDataset(
+            self,
+            resource_name(personalize.CfnDataset, "recommender-items-dataset"),
+            dataset_group_arn=self.personalize_dataset_group.attr_dataset_group_arn,
+            name=resource_name(personalize.CfnDataset, "recommender-items-dataset"),
+            schema_arn=self.personalize_item_schema.attr_schema_arn,
+            dataset_type="Items",
+            dataset_import_job=personalize.CfnDataset.DatasetImportJobProperty(
+                data_source={
+                    "DataLocation": f"s3://{seed_bucket_name}/seed_data/items"
+                },
+                job_name=f"{ENV_PREFIX}-recommender-dataimport-items-job",
+                role_arn=self.dataset_role.role_arn,
+            ),
+        )
+        self.personalize_items_dataset.node.add_dependency(
+            self.personalize_dataset_group
+        )
@@ -0,0 +1,250 @@
+## Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+## SPDX-License-Identifier: MIT-0
+from aws_cdk import (
+    Duration,
+    aws_lambda as _lambda,
+    aws_kinesisfirehose as firehose,
+    aws_lambda_event_sources as event_sources,
+)
+from animal_recommender.components.assets import function_bundle
+from animal_recommender.components.component import Component
+from animal_recommender.utils.constants import *
+
+config = get_config()
+
+
+class Ingestion(Component):
+    """Event tracker, event stream with its firehose archive and the put events lambda."""
+
+    def __init__(
+        self,
+        scope,
+        construct_id,
+        *,
+        dataset_group,
+        kms_key,
+        s3_bucket,
+        personalize_role,
+        kinesis_role,
+        kinesis_policy,
+        put_events_role,
+        kinesis_consumer_policy,
+    ):
+        super().__init__(scope, construct_id)
+        self.personalize_dataset_group = dataset_group
+        self.kms_key = kms_key
+        self.s3_bucket = s3_bucket
+        self.personalize_role = personalize_role
+        self.kinesis_role = kinesis_role
+        self.kinesis_policy = kinesis_policy
+        self.put_events_role = put_events_role
+        self.kinesis_consumer_policy = kinesis_consumer_policy
+
+        self.create_event_tracker_cr()
+        self.create_kinesis_stream()
+        self.create_dead_letter_queue()
+        self.create_availability_table()
+        self.create_put_events_lambda()
+
+    def create_event_tracker_cr(self):
+        # Create event tracker for event ingestion, this posts event tracker id to ssm
+        self.create_personalize_event_tracker_lambda = _lambda.Function(
+            self,
+            resource_name(_lambda.Function, "recommender-event-tracker-lambda"),
+            function_name=resource_name(_lambda.Function, "recommender-event-tracker"),
+            handler="create_event_tracker.lambda_handler",
+            runtime=_lambda.Runtime.PYTHON_3_9,
+            code=function_bundle("custom_resources", "create_event_tracker"),
+            role=self.personalize_role,
+            environment_encryption=self.kms_key,
+            environment={
+                "event_tracker_id_ssm": config["eventTrackerIdSsmPath"],
+                "env": ENV_PREFIX,
+                "data_set_group_arn": self.personalize_dataset_group.attr_dataset_group_arn,
+            },
+            timeout=Duration.seconds(120),
+            memory_size=256,
+        )
+        # event tracker cr that calls abov e lambda
+        self.create_personalize_event_tracker_cr = cr.AwsCustomResource(
+            self,
+            resource_name(cr.AwsCustomResource, "recommender-event-tracker"),
+            function_name=resource_name(
+                cr.AwsCustomResource, "recommender-event-tracker"
+            ),
+            role=self.personalize_role,
+            install_latest_aws_sdk=False,
+            on_create=cr.AwsSdkCall(
+                service="Lambda",
+                action="invoke",
+                parameters={
+                    "FunctionName": self.create_personalize_event_tracker_lambda.function_name,
+                },
+                physical_resource_id=cr.PhysicalResourceId.of(
+                    resource_name(
+                        personalize.CfnDatasetGroup, "recommender-datasetgroup"
+                    ),
+                ),
+                assumed_role_arn=self.personalize_role.role_arn,
+            ),
+            policy=cr.AwsCustomResourcePolicy.from_sdk_calls(
+                resources=[
+                    f"arn:aws:personalize:{DEPLOY_REGION}:{ACCOUNT_ID}:event-tracker/{ENV_PREFIX}-recommender-personalize-event-tracker-tkr",
+                    f"arn:aws:personalize:{DEPLOY_REGION}:{ACCOUNT_ID}:dataset-group/{ENV_PREFIX}-recommender-datasetgroup-pdg",
+                    f"arn:aws:personalize:{DEPLOY_REGION}:{ACCOUNT_ID}:campaign/{ENV_PREFIX}-recommender-personalize-campaign-cpn",
+                    f"arn:aws:personalize:{DEPLOY_REGION}:{ACCOUNT_ID}:campaign/{ENV_PREFIX}-reranking-personalize-campaign-cpn",
+                ]
+            ),
+        )
+        self.create_personalize_event_tracker_cr.node.add_dependency(
+            self.personalize_dataset_group
+        )
+
+    # Create kinesis stream
+    def create_kinesis_stream(self):
+
+        self.kinesis_stream = kinesis.Stream(
+            self,
+            resource_name(kinesis.Stream, "recommender-stream"),
+            stream_name=resource_name(kinesis.Stream, "recommender-stream"),
+            retention_period=Duration.hours(48),
+            encryption=kinesis.StreamEncryption.KMS,
+            encryption_key=self.kms_key,
+            stream_mode=kinesis.StreamMode.ON_DEMAND,
+        )
+
+        ssm_kinesis_stream = ssm.StringParameter(
+            self,
+            resource_name(ssm.StringParameter, "recommender-kinesis-stream-ssm"),
+            string_value=self.kinesis_stream.stream_name,
+            parameter_name=config["kinesisStreamNameSsmPath"],
+        )
+
+        self.kinesis_stream_consumer = kinesis.CfnStreamConsumer(
+            self,
+            resource_name(kinesis.CfnStreamConsumer, "recommender-streamconsumer"),
+            consumer_name=resource_name(
+                kinesis.CfnStreamConsumer, "recommender-streamconsumer"
+            ),
+            stream_arn=self.kinesis_stream.stream_arn,
+        )
+        # Record historical events in s3
+        self.delivery_stream = firehose.CfnDeliveryStream(
+            self,
+            resource_name(kinesisfirehose.CfnDeliveryStream, "recommender-firehose"),
+            delivery_stream_type="KinesisStreamAsSource",
+            extended_s3_destination_configuration=firehose.CfnDeliveryStream.ExtendedS3DestinationConfigurationProperty(
+                bucket_arn=self.s3_bucket.bucket_arn,
+                prefix="YYYY/MM/DD/HH",
+                error_output_prefix="error/!{firehose:error-output-type}/",
+                role_arn=self.kinesis_role.role_arn,
+                compression_format="UNCOMPRESSED",
+                buffering_hints=firehose.CfnDeliveryStream.BufferingHintsProperty(
+                    interval_in_seconds=300, size_in_m_bs=50
+                ),
+            ),
+            kinesis_stream_source_configuration=kinesisfirehose.CfnDeliveryStream.KinesisStreamSourceConfigurationProperty(
+                kinesis_stream_arn=self.kinesis_stream.stream_arn,
+                role_arn=self.kinesis_role.role_arn,
+            ),
+        )
+        self.delivery_stream.node.add_dependency(self.kinesis_policy)
+
+    def create_dead_letter_queue(self):
+        # Failed put events records, with the payload when the lambda captured
+        # them or the shard range when the event source mapping gave up
+        self.dead_letter_queue = sqs.Queue(
+            self,
+            resource_name(sqs.Queue, "recommender-put-events-dlq"),
+            queue_name=resource_name(sqs.Queue, "recommender-put-events-dlq"),
+            encryption=sqs.QueueEncryption.KMS,
+            encryption_master_key=self.kms_key,
+            retention_period=Duration.days(config["deadLetterRetentionDays"]),
+            removal_policy=cdk.RemovalPolicy.DESTROY,
+        )
+
+    def create_availability_table(self):
+        # Availability of each animal and its animal group, written by the put
+        # events lambda and read by the recommendation lambdas
+        self.availability_table = dynamodb.Table(
+            self,
+            resource_name(dynamodb.Table, "recommender-availability"),
+            table_name=resource_name(dynamodb.Table, "recommender-availability"),
+            partition_key=dynamodb.Attribute(
+                name="animal_id", type=dynamodb.AttributeType.STRING
+            ),
+            billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,
+            encryption=dynamodb.TableEncryption.CUSTOMER_MANAGED,
+            encryption_key=self.kms_key,
+            removal_policy=cdk.RemovalPolicy.DESTROY,
+        )
+
+    def create_put_events_lambda(self):
+        # have kinesis trigger put events lambda, through the enhanced fan-out
+        # consumer when enabled so it does not share read throughput with firehose
+        put_events_sources = []
+        if not config["putEventsEnhancedFanOut"]:
+            self.kinesis_event_source = event_sources.KinesisEventSource(
+                stream=self.kinesis_stream,
+                starting_position=_lambda.StartingPosition.LATEST,
+                batch_size=config["putEventsBatchSize"],
+                max_batching_window=Duration.seconds(
+                    config["putEventsMaxBatchingWindowSeconds"]
+                ),
+                parallelization_factor=config["putEventsParallelizationFactor"],
+                report_batch_item_failures=True,
+                bisect_batch_on_error=True,
+                retry_attempts=config["putEventsRetryAttempts"],
+                max_record_age=Duration.seconds(config["putEventsMaxRecordAgeSeconds"]),
+                on_failure=event_sources.SqsDlq(self.dead_letter_queue),
+            )
+            put_events_sources.append(self.kinesis_event_source)
+
+        self.put_events_lambda = _lambda.Function(
+            self,
+            resource_name(_lambda.Function, "recommender-put-events-lambda"),
+            function_name=resource_name(
+                _lambda.Function, "recommender-put-events-lambda"
+            ),
+            handler="put_personalize_events.lambda_handler",
+            runtime=_lambda.Runtime.PYTHON_3_9,
+            code=function_bundle("api", "put_personalize_events"),
+            role=self.put_events_role,
+            events=put_events_sources,
+            environment_encryption=self.kms_key,
+            timeout=Duration.seconds(30),
+            memory_size=config["putEventsMemorySize"],
+            environment={
+                "event_tracker_ssm_path": config["eventTrackerIdSsmPath"],
+                "availability_table_name": self.availability_table.table_name,
+                "dedup_window_seconds": f"{config['dedupWindowSeconds']}",
+                "dedup_capacity": f"{config['dedupCapacity']}",
+                "dedup_false_positive_rate": f"{config['dedupFalsePositiveRate']}",
+                "late_event_policy": config["lateEventPolicy"],
+                "event_aggregation_mode": config["eventAggregationMode"],
+                "max_event_lateness_seconds": f"{config['maxEventLatenessSeconds']}",
+                "dead_letter_queue_url": self.dead_letter_queue.queue_url,
+            },
+        )
+        if config["putEventsEnhancedFanOut"]:
+            self.put_events_role.attach_inline_policy(self.kinesis_consumer_policy)
+            self.kinesis_event_source_mapping = _lambda.EventSourceMapping(
+                self,
+                "Recommender Put Events Consumer Mapping",
+                target=self.put_events_lambda,
+                event_source_arn=self.kinesis_stream_consumer.attr_consumer_arn,
+                starting_position=_lambda.StartingPosition.LATEST,
+                batch_size=config["putEventsBatchSize"],
+                max_batching_window=Duration.seconds(
+                    config["putEventsMaxBatchingWindowSeconds"]
+                ),
+                parallelization_factor=config["putEventsParallelizationFactor"],
+                report_batch_item_failures=True,
+                bisect_batch_on_error=True,
+                retry_attempts=config["putEventsRetryAttempts"],
+                max_record_age=Duration.seconds(config["putEventsMaxRecordAgeSeconds"]),
+                on_failure=event_sources.SqsDlq(self.dead_letter_queue),
+            )
+            self.kinesis_event_source_mapping.node.add_dependency(
+                self.kinesis_consumer_policy
+            )
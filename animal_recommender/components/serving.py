@@ -0,0 +1,259 @@
+## Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+## SPDX-License-Identifier: MIT-0
+from aws_cdk import (
+    Duration,
+    aws_lambda as _lambda,
+    aws_applicationautoscaling as appscaling,
+)
+from animal_recommender.components.assets import function_bundle
+from animal_recommender.components.component import Component
+from animal_recommender.utils.constants import *
+
+config = get_config()
+
+ARCHITECTURES = {
+    "arm64": _lambda.Architecture.ARM_64,
+    "x86_64": _lambda.Architecture.X86_64,
+}
+# alias the serving traffic is sent to
+LIVE_ALIAS = "live"
+
+
+class Serving(Component):
+    """Recommendation and reranking api lambdas."""
+
+    def __init__(
+        self,
+        scope,
+        construct_id,
+        *,
+        kms_key,
+        seed_bucket,
+        availability_table,
+        get_recommendations_role,
+    ):
+        super().__init__(scope, construct_id)
+        self.kms_key = kms_key
+        self.availability_table = availability_table
+        self.seed_bucket = seed_bucket
+        self.get_recommendations_role = get_recommendations_role
+
+        self.create_dynamodb_tables()
+        self.create_lambdas()
+
+    def create_dynamodb_tables(self):
+        # Ranked orderings cached for reranking pagination cursors
+        self.rerank_cursor_table = dynamodb.Table(
+            self,
+            resource_name(dynamodb.Table, "recommender-rerank-cursor"),
+            table_name=resource_name(dynamodb.Table, "recommender-rerank-cursor"),
+            partition_key=dynamodb.Attribute(
+                name="cursor", type=dynamodb.AttributeType.STRING
+            ),
+            billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,
+            encryption=dynamodb.TableEncryption.CUSTOMER_MANAGED,
+            encryption_key=self.kms_key,
+            time_to_live_attribute="expires_at",
+            removal_policy=cdk.RemovalPolicy.DESTROY,
+        )
+        # Leases and shared responses of coalesced recommendation requests
+        self.request_coalescing_table = dynamodb.Table(
+            self,
+            resource_name(dynamodb.Table, "recommender-request-coalescing"),
+            table_name=resource_name(dynamodb.Table, "recommender-request-coalescing"),
+            partition_key=dynamodb.Attribute(
+                name="key", type=dynamodb.AttributeType.STRING
+            ),
+            billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,
+            encryption=dynamodb.TableEncryption.CUSTOMER_MANAGED,
+            encryption_key=self.kms_key,
+            time_to_live_attribute="ttl",
+            removal_policy=cdk.RemovalPolicy.DESTROY,
+        )
+
+    def serving_environment(self):
+        return {
+            "campaign_arn_refresh_seconds": f"{config['campaignArnRefreshSeconds']}",
+            "prewarm_on_init": config["servingPrewarmOnInit"],
+            "personalize_connect_timeout_seconds": f"{config['personalizeConnectTimeoutSeconds']}",
+            "personalize_read_timeout_seconds": f"{config['personalizeReadTimeoutSeconds']}",
+            "personalize_retry_mode": config["personalizeRetryMode"],
+            "personalize_max_attempts": f"{config['personalizeMaxAttempts']}",
+            "personalize_hedging": f"{config['personalizeHedging']}",
+            "hedge_percentile": f"{config['hedgePercentile']}",
+            "hedge_initial_delay_ms": f"{config['hedgeInitialDelayMs']}",
+            "request_deadline_ms": f"{config['requestDeadlineMs']}",
+        }
+
+    def recommendation_environment(self):
+        return dict(
+            self.serving_environment(),
+            campaign_arn_ssm_path=config["recommendationCampaignArnSsmPath"],
+            response_cache_ttl_seconds=f"{config['responseCacheTtlSeconds']}",
+            response_cache_max_entries=f"{config['responseCacheMaxEntries']}",
+            availability_table_name=self.availability_table.table_name,
+            availability_overfetch_factor=f"{config['availabilityOverfetchFactor']}",
+            availability_refresh_seconds=f"{config['availabilityRefreshSeconds']}",
+            coalescing_table_name=self.request_coalescing_table.table_name,
+            request_coalescing=config["requestCoalescing"],
+            request_coalescing_wait_ms=f"{config['requestCoalescingWaitMs']}",
+            request_coalescing_share_seconds=f"{config['requestCoalescingShareSeconds']}",
+            popularity_bucket_name=self.seed_bucket.bucket_name,
+            popularity_index_key=config["popularityIndexKey"],
+            recommendation_latency_budget_ms=f"{config['recommendationLatencyBudgetMs']}",
+            circuit_breaker_failure_threshold=f"{config['circuitBreakerFailureThreshold']}",
+            circuit_breaker_open_seconds=f"{config['circuitBreakerOpenSeconds']}",
+        )
+
+    def reranking_environment(self):
+        return dict(
+            self.serving_environment(),
+            reranking_campaign_arn_ssm_path=config["rerankingCampaignArnSsmPath"],
+            post_ranking_enabled=f"{config['postRankingEnabled']}",
+            post_ranking_personalize_weight=f"{config['postRankingPersonalizeWeight']}",
+            post_ranking_item_value_weight=f"{config['postRankingItemValueWeight']}",
+            post_ranking_waiting_weight=f"{config['postRankingWaitingWeight']}",
+            post_ranking_max_waiting_days=f"{config['postRankingMaxWaitingDays']}",
+            post_ranking_max_per_breed=f"{config['postRankingMaxPerBreed']}",
+            catalog_bucket_name=self.seed_bucket.bucket_name,
+            catalog_items_key=config["catalogItemsKey"],
+            group_expansion_strategy=config["groupExpansionStrategy"],
+            group_expansion_signal=config["groupExpansionSignal"],
+            group_expansion_signal_descending=f"{config['groupExpansionSignalDescending']}",
+            cursor_table_name=self.rerank_cursor_table.table_name,
+            cursor_ttl_seconds=f"{config['rerankCursorTtlSeconds']}",
+        )
+
+    def create_lambdas(self):
+        # Get Recs api lambda
+        self.get_recommendation_lambda = _lambda.Function(
+            self,
+            resource_name(_lambda.Function, "recommender-get-recommendation-lambda"),
+            function_name=resource_name(
+                _lambda.Function, "recommender-get-recommendation-lambda"
+            ),
+            handler="get_recommendation.lambda_handler",
+            runtime=_lambda.Runtime.PYTHON_3_9,
+            code=function_bundle("api", "get_recommendation"),
+            role=self.get_recommendations_role,
+            environment_encryption=self.kms_key,
+            timeout=Duration.seconds(30),
+            memory_size=config["getRecommendationMemorySize"],
+            architecture=ARCHITECTURES[config["servingArchitecture"]],
+            environment=self.recommendation_environment(),
+        )
+        self.get_recommendation_alias = self.create_live_alias(
+            self.get_recommendation_lambda,
+            "recommender-get-recommendation-alias",
+            "getRecommendation",
+        )
+
+        ssm_recommendation_lambda_name = ssm.StringParameter(
+            self,
+            resource_name(ssm.StringParameter, "recommender-get-recommender-ssm"),
+            string_value=self.get_recommendation_alias.function_name,
+            parameter_name=config["getRecommendationNamePath"],
+        )
+        # Get reranking lambda
+        self.get_reranking_lambda = _lambda.Function(
+            self,
+            resource_name(_lambda.Function, "recommender-get-reranking-lambda"),
+            function_name=resource_name(
+                _lambda.Function, "recommender-get-reranking-lambda"
+            ),
+            handler="get_reranking.lambda_handler",
+            runtime=_lambda.Runtime.PYTHON_3_9,
+            code=function_bundle("api", "get_reranking"),
+            role=self.get_recommendations_role,
+            environment_encryption=self.kms_key,
+            timeout=Duration.seconds(30),
+            memory_size=config["getRerankingMemorySize"],
+            architecture=ARCHITECTURES[config["servingArchitecture"]],
+            environment=self.reranking_environment(),
+        )
+
+        self.get_reranking_alias = self.create_live_alias(
+            self.get_reranking_lambda,
+            "recommender-get-reranking-alias",
+            "getReranking",
+        )
+
+        self.get_reranking_lambda.add_permission(
+            "Api-Gateway Invocation",
+            principal=iam.ServicePrincipal("apigateway.amazonaws.com"),
+        )
+        self.get_reranking_alias.add_permission(
+            "Api-Gateway Invocation",
+            principal=iam.ServicePrincipal("apigateway.amazonaws.com"),
+        )
+
+        ssm_reranking_lambda_name = ssm.StringParameter(
+            self,
+            resource_name(ssm.StringParameter, "recommender-get-reranking-ssm"),
+            string_value=self.get_reranking_alias.function_name,
+            parameter_name=config["getRerankingNamePath"],
+        )
+        # Recommendations and reranking of a candidate page in one request
+        self.recommend_and_rerank_lambda = _lambda.Function(
+            self,
+            resource_name(_lambda.Function, "recommender-recommend-rerank-lambda"),
+            function_name=resource_name(
+                _lambda.Function, "recommender-recommend-rerank-lambda"
+            ),
+            handler="recommend_and_rerank.lambda_handler",
+            runtime=_lambda.Runtime.PYTHON_3_9,
+            code=function_bundle("api", "recommend_and_rerank"),
+            role=self.get_recommendations_role,
+            environment_encryption=self.kms_key,
+            timeout=Duration.seconds(30),
+            memory_size=config["recommendAndRerankMemorySize"],
+            architecture=ARCHITECTURES[config["servingArchitecture"]],
+            environment=dict(
+                self.recommendation_environment(), **self.reranking_environment()
+            ),
+        )
+        self.recommend_and_rerank_alias = self.create_live_alias(
+            self.recommend_and_rerank_lambda,
+            "recommender-recommend-rerank-alias",
+            "recommendAndRerank",
+        )
+
+        ssm_recommend_and_rerank_lambda_name = ssm.StringParameter(
+            self,
+            resource_name(ssm.StringParameter, "recommender-recommend-rerank-ssm"),
+            string_value=self.recommend_and_rerank_alias.function_name,
+            parameter_name=config["recommendAndRerankNamePath"],
+        )
+
+    def create_live_alias(self, function, context, config_prefix):
+        # Each deploy publishes a new version of the function and moves the
+        # alias to it, provisioned concurrency is initialized on the new
+        # version before traffic moves over
+        provisioned_concurrency = config[f"{config_prefix}ProvisionedConcurrency"]
+        alias = _lambda.Alias(
+            self,
+            resource_name(_lambda.Alias, context),
+            alias_name=LIVE_ALIAS,
+            version=function.current_version,
+            provisioned_concurrent_executions=provisioned_concurrency or None,
+        )
+        schedule = config[f"{config_prefix}ConcurrencySchedule"]
+        if schedule:
+            scaling = alias.add_auto_scaling(
+                min_capacity=provisioned_concurrency,
+                max_capacity=max(
+                    [provisioned_concurrency]
+                    + [window["maxCapacity"] for window in schedule]
+                ),
+            )
+            scaling.scale_on_utilization(
+                utilization_target=config["servingConcurrencyUtilizationTarget"]
+            )
+            for window in schedule:
+                scaling.scale_on_schedule(
+                    window["name"],
+                    schedule=appscaling.Schedule.expression(window["schedule"]),
+                    min_capacity=window["minCapacity"],
+                    max_capacity=window["maxCapacity"],
+                )
+        return alias
@@ -0,0 +1,725 @@
+## Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+## SPDX-License-Identifier: MIT-0
+from aws_cdk import Duration, aws_events_targets as targets, aws_lambda as _lambda
+from animal_recommender.components.assets import function_bundle
+from animal_recommender.components.component import Component
+from animal_recommender.utils.constants import *
+
+config = get_config()
+from _version import __version__ as VERSION
+
+
+class TrainingPipeline(Component):
+    """Solutions, their campaigns and the daily retraining state machine."""
+
+    def __init__(
+        self,
+        scope,
+        construct_id,
+        *,
+        datasets,
+        kms_key,
+        sns_topic,
+        seed_bucket,
+        personalize_role,
+        codebuild_role,
+        ssm_policy,
+        personalize_policy,
+        kms_logs_policy,
+        lambda_invoke_policy,
+    ):
+        super().__init__(scope, construct_id)
+        self.personalize_dataset_group = datasets.personalize_dataset_group
+        self.personalize_items_dataset = datasets.personalize_items_dataset
+        self.personalize_interaction_dataset = datasets.personalize_interaction_dataset
+        self.kms_key = kms_key
+        self.sns_topic = sns_topic
+        self.seed_bucket = seed_bucket
+        self.personalize_role = personalize_role
+        self.codebuild_role = codebuild_role
+        self.ssm_policy = ssm_policy
+        self.personalize_policy = personalize_policy
+        self.kms_logs_policy = kms_logs_policy
+        self.lambda_invoke_policy = lambda_invoke_policy
+
+        self.create_solution()
+        self.create_solution_version_cr()
+        self.create_campaign_cr()
+        self.create_reranking_solution()
+        self.create_reranking_solution_version()
+        self.create_reranking_campaign_cr()
+        self.create_state_machine_tasks()
+        self.create_state_machine_definition()
+
+    def create_solution(self):
+        # Recommender Solution
+        self.personalize_solution = personalize.CfnSolution(
+            self,
+            resource_name(personalize.CfnSolution, "recommender-solution"),
+            dataset_group_arn=self.personalize_dataset_group.attr_dataset_group_arn,
+            name=resource_name(personalize.CfnSolution, "recommender-solution"),
+            recipe_arn="arn:aws:personalize:::recipe/aws-user-personalization",
+            solution_config=personalize.CfnSolution.SolutionConfigProperty(
+                algorithm_hyper_parameters={
+                    "bptt": "29",
+                    "hidden_dimension": "239",
+                    "recency_mask": "true",
+                },
+            ),
+        )
+        self.personalize_solution.node.add_dependency(self.personalize_items_dataset)
+        self.personalize_solution.node.add_dependency(
+            self.personalize_interaction_dataset
+        )
+
+        ssm_personalize_solution_arn = ssm.StringParameter(
+            self,
+            resource_name(ssm.StringParameter, "recommender-solution-ssm"),
+            string_value=self.personalize_solution.attr_solution_arn,
+            parameter_name="/animal-recommender/solution/arn",
+        )
+
+    def create_reranking_solution(self):
+        # Reranking solution
+        self.personalize_reranking_solution = personalize.CfnSolution(
+            self,
+            resource_name(personalize.CfnSolution, "reranking-solution"),
+            dataset_group_arn=self.personalize_dataset_group.attr_dataset_group_arn,
+            name=resource_name(personalize.CfnSolution, "reranking-solution"),
+            recipe_arn="arn:aws:personalize:::recipe/aws-personalized-ranking",
+            solution_config=personalize.CfnSolution.SolutionConfigProperty(
+                algorithm_hyper_parameters={
+                    "bptt": "29",
+                    "hidden_dimension": "239",
+                    "recency_mask": "true",
+                },
+            ),
+        )
+        self.personalize_reranking_solution.node.add_dependency(
+            self.personalize_items_dataset
+        )
+        self.personalize_reranking_solution.node.add_dependency(
+            self.personalize_interaction_dataset
+        )
+
+    def create_solution_version_cr(self):
+        # Create recommender solution version lambda
+        self.create_personalize_solution_version_cr_lambda = _lambda.Function(
+            self,
+            resource_name(_lambda.Function, "recommender-create-solution-version"),
+            function_name=resource_name(
+                _lambda.Function, "recommender-create-solution-version"
+            ),
+            handler="create_solution_version.lambda_handler",
+            runtime=_lambda.Runtime.PYTHON_3_9,
+            code=function_bundle("custom_resources", "create_solution_version"),
+            role=self.personalize_role,
+            environment_encryption=self.kms_key,
+            environment={
+                "solution_arn": self.personalize_solution.attr_solution_arn,
+                "solution_version_arn_ssm_path": config[
+                    "recommendationSolutionVersionSsmPath"
+                ],
+            },
+            timeout=Duration.seconds(30),
+            memory_size=256,
+        )
+        # Create recommender solution version custom resource which calls above lambda
+        self.create_personalize_solution_version_cr = cr.AwsCustomResource(
+            self,
+            resource_name(cr.AwsCustomResource, "recommender-solution-version-cr"),
+            function_name=resource_name(
+                cr.AwsCustomResource, "recommender-solution-version-cr"
+            ),
+            role=self.personalize_role,
+            install_latest_aws_sdk=False,
+            on_create=cr.AwsSdkCall(
+                service="Lambda",
+                action="invoke",
+                parameters={
+                    "FunctionName": self.create_personalize_solution_version_cr_lambda.function_name,
+                },
+                physical_resource_id=cr.PhysicalResourceId.of(
+                    resource_name(personalize.CfnSolution, "recommender-solution"),
+                ),
+                assumed_role_arn=self.personalize_role.role_arn,
+            ),
+            policy=cr.AwsCustomResourcePolicy.from_sdk_calls(
+                resources=[f"arn:aws:personalize:{DEPLOY_REGION}:{ACCOUNT_ID}:*"]
+            ),
+        )
+
+        self.create_personalize_solution_version_cr.node.add_dependency(
+            self.personalize_solution
+        )
+
+    def create_reranking_solution_version(self):
+        # Reranking solution version lambda
+        self.create_reranking_solution_version_cr_lambda = _lambda.Function(
+            self,
+            resource_name(_lambda.Function, "reranking-create-solution-version"),
+            function_name=resource_name(
+                _lambda.Function, "reranking-create-solution-version"
+            ),
+            handler="create_solution_version.lambda_handler",
+            runtime=_lambda.Runtime.PYTHON_3_9,
+            code=function_bundle("custom_resources", "create_solution_version"),
+            role=self.personalize_role,
+            environment_encryption=self.kms_key,
+            environment={
+                "solution_arn": self.personalize_reranking_solution.attr_solution_arn,
+                "solution_version_arn_ssm_path": config[
+                    "rerankingSolutionVersionSsmPath"
+                ],
+            },
+            timeout=Duration.seconds(30),
+            memory_size=256,
+        )
+        # Reranking custom resource which calls the above lambda
+        self.create_reranking_solution_version_cr = cr.AwsCustomResource(
+            self,
+            resource_name(cr.AwsCustomResource, "recommender-rerank-version-cr"),
+            function_name=resource_name(
+                cr.AwsCustomResource, "recommender-rerank-version-cr"
+            ),
+            role=self.personalize_role,
+            install_latest_aws_sdk=False,
+            on_create=cr.AwsSdkCall(
+                service="Lambda",
+                action="invoke",
+                parameters={
+                    "FunctionName": self.create_reranking_solution_version_cr_lambda.function_name,
+                },
+                physical_resource_id=cr.PhysicalResourceId.of(
+                    resource_name(personalize.CfnSolution, "reranking-solution"),
+                ),
+                assumed_role_arn=self.personalize_role.role_arn,
+            ),
+            policy=cr.AwsCustomResourcePolicy.from_sdk_calls(
+                resources=[f"arn:aws:personalize:{DEPLOY_REGION}:{ACCOUNT_ID}:*"]
+            ),
+        )
+
+        self.create_reranking_solution_version_cr.node.add_dependency(
+            self.personalize_reranking_solution
+        )
+
+    def create_campaign_cr(self):
+        # Wait condition for recommender campaign
+        self.cfn_wait_campaign_create_handle = cloudformation.CfnWaitConditionHandle(
+            self,
+            resource_name(
+                cloudformation.CfnWaitConditionHandle, "campaign-wait-handle"
+            ),
+        )
+
+        self.cfn_wait_campaign_creation = cloudformation.CfnWaitCondition(
+            self,
+            resource_name(cloudformation.CfnWaitCondition, "campaign-waiter"),
+            count=1,
+            handle=self.cfn_wait_campaign_create_handle.ref,
+            timeout="28800",
+        )
+
+        # Codebuild project used for creating recommender and rerank campaign
+        self.create_campaign_project = codebuild.Project(
+            self,
+            resource_name(codebuild.Project, "recommender-create-campaign"),
+            project_name=resource_name(
+                codebuild.Project, "recommender-create-campaign"
+            ),
+            source=codebuild.Source.s3(
+                bucket=self.seed_bucket,
+                path=f"{VERSION}/scripts.zip",
+            ),
+            role=self.codebuild_role,
+            timeout=Duration.minutes(480),
+            build_spec=codebuild.BuildSpec.from_source_filename(
+                filename="animal_recommender/code_build/create_campaign_spec.yml"
+            ),
+            environment=codebuild.BuildEnvironment(
+                compute_type=codebuild.ComputeType.LARGE,
+                build_image=codebuild.LinuxBuildImage.STANDARD_4_0,
+            ),
+            environment_variables={
+                "min_tps": codebuild.BuildEnvironmentVariable(
+                    type=codebuild.BuildEnvironmentVariableType.PLAINTEXT,
+                    value=config["minProvisionedTPS"],
+                ),
+                "exploration_weight": codebuild.BuildEnvironmentVariable(
+                    type=codebuild.BuildEnvironmentVariableType.PLAINTEXT,
+                    value=config["explorationWeight"],
+                ),
+                "exploration_item_age_cut_off": codebuild.BuildEnvironmentVariable(
+                    type=codebuild.BuildEnvironmentVariableType.PLAINTEXT,
+                    value=config["explorationItemAgeCutOff"],
+                ),
+                "campaign_arn_ssm_path": codebuild.BuildEnvironmentVariable(
+                    type=codebuild.BuildEnvironmentVariableType.PLAINTEXT,
+                    value=config["recommendationCampaignArnSsmPath"],
+                ),
+                "solution_version_ssm_path": codebuild.BuildEnvironmentVariable(
+                    type=codebuild.BuildEnvironmentVariableType.PLAINTEXT,
+                    value=config["recommendationSolutionVersionSsmPath"],
+                ),
+                "env": codebuild.BuildEnvironmentVariable(
+                    type=codebuild.BuildEnvironmentVariableType.PLAINTEXT,
+                    value=ENV_PREFIX,
+                ),
+                "campaign_type": codebuild.BuildEnvironmentVariable(
+                    type=codebuild.BuildEnvironmentVariableType.PLAINTEXT,
+                    value="recommender",
+                ),
+                "cfn_signal_url": codebuild.BuildEnvironmentVariable(
+                    type=codebuild.BuildEnvironmentVariableType.PLAINTEXT,
+                    value=self.cfn_wait_campaign_create_handle.ref,
+                ),
+            },
+            encryption_key=self.kms_key,
+        )
+        # Custom resource which calls above codebuild project, creates recommender campaign after waiting for solution version to be ready
+        self.create_campaign_codebuild = cr.AwsCustomResource(
+            self,
+            "create-campaign",
+            function_name=resource_name(
+                cr.AwsCustomResource, "recommender-campaign-cr"
+            ),
+            log_retention=logs.RetentionDays.INFINITE,
+            on_create=cr.AwsSdkCall(
+                service="CodeBuild",
+                action="startBuild",
+                parameters={
+                    "projectName": self.create_campaign_project.project_name,
+                },
+                physical_resource_id=cr.PhysicalResourceId.of(
+                    resource_name(
+                        personalize.CfnSolution, "recommender-solution-version-cr"
+                    ),
+                ),
+                assumed_role_arn=self.personalize_role.role_arn,
+                output_paths=["build.buildStatus"],
+            ),
+            policy=cr.AwsCustomResourcePolicy.from_sdk_calls(
+                resources=[
+                    f"arn:aws:codebuild:{DEPLOY_REGION}:{ACCOUNT_ID}:project/{ENV_PREFIX}-recommender-create-campaign-cbp",
+                    f"arn:aws:codebuild:{DEPLOY_REGION}:{ACCOUNT_ID}:build/{ENV_PREFIX}-recommender-create-campaign*",
+                ]
+            ),
+            role=self.personalize_role,
+        )
+
+        self.create_campaign_codebuild.node.add_dependency(
+            self.create_personalize_solution_version_cr
+        )
+
+        self.cfn_wait_campaign_creation.node.add_dependency(
+            self.create_campaign_project
+        )
+
+    def create_reranking_campaign_cr(self):
+        # Waiter for reranking campaign
+        self.cfn_wait_rerank_campaign_create_handle = (
+            cloudformation.CfnWaitConditionHandle(
+                self,
+                resource_name(
+                    cloudformation.CfnWaitConditionHandle, "campaign-rerank-wait-handle"
+                ),
+            )
+        )
+
+        self.cfn_wait_rerank_campaign_creation = cloudformation.CfnWaitCondition(
+            self,
+            resource_name(cloudformation.CfnWaitCondition, "campaign-rerank-waiter"),
+            count=1,
+            handle=self.cfn_wait_rerank_campaign_create_handle.ref,
+            timeout="28800",
+        )
+        # Custom resource which calls the codebuild project, creates rerank campaign after waiting for rerank solution version to be ready
+        # overwrites things like campaign_type so that we create rerank campaign instead of recommender campaign
+        self.create_reranking_campaign_codebuild = cr.AwsCustomResource(
+            self,
+            "create-reranking-campaign",
+            function_name=resource_name(
+                cr.AwsCustomResource, "recommender-reraking-campaign-cr"
+            ),
+            log_retention=logs.RetentionDays.INFINITE,
+            on_create=cr.AwsSdkCall(
+                service="CodeBuild",
+                action="startBuild",
+                parameters={
+                    "projectName": self.create_campaign_project.project_name,
+                    "environmentVariablesOverride": [
+                        {
+                            "name": "campaign_arn_ssm_path",
+                            "value": config["rerankingCampaignArnSsmPath"],
+                            "type": "PLAINTEXT",
+                        },
+                        {
+                            "name": "solution_version_ssm_path",
+                            "value": config["rerankingSolutionVersionSsmPath"],
+                            "type": "PLAINTEXT",
+                        },
+                        {
+                            "name": "campaign_type",
+                            "value": "reranking",
+                            "type": "PLAINTEXT",
+                        },
+                        {
+                            "name": "cfn_signal_url",
+                            "value": self.cfn_wait_rerank_campaign_create_handle.ref,
+                            "type": "PLAINTEXT",
+                        },
+                    ],
+                },
+                physical_resource_id=cr.PhysicalResourceId.of(
+                    resource_name(
+                        personalize.CfnSolution, "recommender-solution-version-cr"
+                    ),
+                ),
+                assumed_role_arn=self.personalize_role.role_arn,
+                output_paths=["build.buildStatus"],
+            ),
+            policy=cr.AwsCustomResourcePolicy.from_sdk_calls(
+                resources=[
+                    f"arn:aws:codebuild:{DEPLOY_REGION}:{ACCOUNT_ID}:project/{ENV_PREFIX}-recommender-create-campaign-cbp",
+                    f"arn:aws:codebuild:{DEPLOY_REGION}:{ACCOUNT_ID}:build/{ENV_PREFIX}-recommender-create-campaign*",
+                ]
+            ),
+            role=self.personalize_role,
+        )
+
+        self.create_reranking_campaign_codebuild.node.add_dependency(
+            self.create_reranking_solution_version_cr
+        )
+
+        self.create_reranking_campaign_codebuild.node.add_dependency(
+            self.create_campaign_project
+        )
+
+    def create_state_machine_tasks(self):
+        # Statemachine role for underlying lambdas
+        self.state_machine_execution_role = iam.Role(
+            self,
+            resource_name(iam.Role, "recommender-statemachine-execution-role"),
+            role_name=resource_name(
+                iam.Role, "recommender-statemachine-execution-role"
+            ),
+            assumed_by=iam.ServicePrincipal("lambda.amazonaws.com"),
+            managed_policies=[
+                iam.ManagedPolicy.from_managed_policy_arn(
+                    self,
+                    resource_name(
+                        iam.Policy, "recommender-statemachine-execution-policy"
+                    ),
+                    "arn:aws:iam::aws:policy/service-role/AWSLambdaVPCAccessExecutionRole",
+                ),
+            ],
+            inline_policies={
+                "LambdaPermission": iam.PolicyDocument(
+                    statements=[
+                        iam.PolicyStatement(
+                            actions=["sns:Publish*"],
+                            resources=[self.sns_topic.topic_arn],
+                        ),
+                    ]
+                )
+            },
+        )
+        self.state_machine_execution_role.attach_inline_policy(self.ssm_policy)
+        self.state_machine_execution_role.attach_inline_policy(self.personalize_policy)
+        self.state_machine_execution_role.attach_inline_policy(self.kms_logs_policy)
+
+        # statemachine role for kicing off machine
+        self.state_machine_role = iam.Role(
+            self,
+            resource_name(iam.Role, "recommender-statemachine-role"),
+            role_name=resource_name(iam.Role, "recommender-statemachine-role"),
+            assumed_by=iam.ServicePrincipal("states.amazonaws.com"),
+            inline_policies={
+                "StateMachine": iam.PolicyDocument(
+                    statements=[
+                        iam.PolicyStatement(
+                            actions=[
+                                "kms:Encrypt*",
+                                "kms:Decrypt*",
+                                "kms:ReEncrypt*",
+                                "kms:GenerateDataKey*",
+                                "kms:Describe*",
+                            ],
+                            resources=[
+                                self.kms_key.key_arn,
+                                f"arn:aws:kinesis:{DEPLOY_REGION}:{ACCOUNT_ID}:stream/{ENV_PREFIX}-recommender-stream-kss",
+                                f"arn:aws:logs:{DEPLOY_REGION}:{ACCOUNT_ID}:log-group:{ENV_PREFIX}-recommender-state-machine-logs-log",
+                            ],
+                        ),
+                        iam.PolicyStatement(
+                            actions=["sns:Publish*"],
+                            resources=[self.sns_topic.topic_arn],
+                        ),
+                    ]
+                )
+            },
+        )
+        self.state_machine_role.attach_inline_policy(self.lambda_invoke_policy)
+        self.state_machine_role.add_managed_policy(
+            iam.ManagedPolicy.from_aws_managed_policy_name("CloudWatchLogsFullAccess")
+        )
+        # skip state
+        self.job_pass = stepfunctions.Succeed(
+            self,
+            "Skip Training",
+            comment=f"No New Users",
+        )
+
+        self.skip_training_message = tasks.SnsPublish(
+            self,
+            "Notify Skip Training",
+            topic=self.sns_topic,
+            message=stepfunctions.TaskInput.from_object(
+                {"default": {"Status": "Skipping Recommender Training"}}
+            ),
+            subject=f"Recommender {ENV_PREFIX} Skipping Recommender Training",
+        )
+
+        # Create solution version
+        self.create_solution_version_lambda = _lambda.Function(
+            self,
+            resource_name(_lambda.Function, "recommender-sm-create-version"),
+            function_name=resource_name(
+                _lambda.Function, "recommender-sm-create-version"
+            ),
+            handler="create_solution_version.lambda_handler",
+            runtime=_lambda.Runtime.PYTHON_3_9,
+            code=function_bundle("state_machine", "create_solution_version"),
+            role=self.state_machine_execution_role,
+            environment_encryption=self.kms_key,
+            environment={
+                "solution_arn": self.personalize_solution.attr_solution_arn,
+                "sns_arn": self.sns_topic.topic_arn,
+                "rerank_solution_arn": self.personalize_reranking_solution.attr_solution_arn,
+                "rerank_enabled": f"{config['rerankingEnabled']}",
+            },
+        )
+
+        self.create_solution_version_job = tasks.LambdaInvoke(
+            self,
+            "Create Solution Version",
+            lambda_function=self.create_solution_version_lambda,
+            output_path="$.Payload",
+        )
+        # check if solution version is finished training
+        self.describe_solution_version_lambda = _lambda.Function(
+            self,
+            resource_name(_lambda.Function, "recommender-sm-describe-version"),
+            function_name=resource_name(
+                _lambda.Function, "recommender-sm-describe-version"
+            ),
+            handler="describe_solution_version.lambda_handler",
+            runtime=_lambda.Runtime.PYTHON_3_9,
+            code=function_bundle("state_machine", "describe_solution_version"),
+            role=self.state_machine_execution_role,
+            environment_encryption=self.kms_key,
+            environment={
+                "sns_arn": self.sns_topic.topic_arn,
+                "rerank_enabled": f"{config['rerankingEnabled']}",
+            },
+        )
+
+        self.describe_solution_version_job = tasks.LambdaInvoke(
+            self,
+            "Wait For Solution Version Active",
+            lambda_function=self.describe_solution_version_lambda,
+            output_path="$.Payload",
+        )
+        # Retries for waiting for solution version to finish training
+        self.describe_solution_version_job.add_retry(
+            backoff_rate=1.0,
+            interval=Duration.minutes(5),
+            # check every 5 minutes for 24 hours
+            max_attempts=288,
+        )
+        # Check solution version metrics
+        self.evaluate_solution_version_lambda = _lambda.Function(
+            self,
+            resource_name(_lambda.Function, "recommender-sm-evaluate-solution"),
+            function_name=resource_name(
+                _lambda.Function, "recommender-sm-evaluate-solution"
+            ),
+            handler="evaluate_solution_version.lambda_handler",
+            runtime=_lambda.Runtime.PYTHON_3_9,
+            code=function_bundle("state_machine", "evaluate_solution_version"),
+            role=self.state_machine_execution_role,
+            environment_encryption=self.kms_key,
+            environment={
+                "sns_arn": self.sns_topic.topic_arn,
+                "promotion_threshold": f"{config['promotionThreshold']}",
+                "rerank_enabled": f"{config['rerankingEnabled']}",
+            },
+        )
+
+        self.evalute_solution_version_job = tasks.LambdaInvoke(
+            self,
+            "Evaluate Solution Version",
+            lambda_function=self.evaluate_solution_version_lambda,
+            output_path="$.Payload",
+        )
+
+        self.do_not_promote = stepfunctions.Succeed(
+            self,
+            "Do Not Promote Model",
+            comment="Check Model Performance",
+        )
+
+        self.do_promote = stepfunctions.Succeed(
+            self,
+            "Do Promote Model",
+            comment="Model promoted",
+        )
+        # Update campaign with new solution version
+        self.update_campaign_lambda = _lambda.Function(
+            self,
+            resource_name(_lambda.Function, "recommender-sm-update-campaign"),
+            function_name=resource_name(
+                _lambda.Function, "recommender-sm-update-campaign"
+            ),
+            handler="update_campaign.lambda_handler",
+            runtime=_lambda.Runtime.PYTHON_3_9,
+            code=function_bundle("state_machine", "update_campaign"),
+            role=self.state_machine_execution_role,
+            environment_encryption=self.kms_key,
+            environment={
+                "sns_arn": self.sns_topic.topic_arn,
+                "campaign_arn_ssm_path": config["recommendationCampaignArnSsmPath"],
+                "rerank_campaign_arn_ssm_path": config["rerankingCampaignArnSsmPath"],
+                "rerank_min_tps": f"{config['reRankMinProvisionedTPS']}",
+                "rerank_enabled": f"{config['rerankingEnabled']}",
+                "min_tps": f"{config['minProvisionedTPS']}",
+                "exploration_weight": f"{config['explorationWeight']}",
+                "exploration_item_age_cut_off": f"{config['explorationItemAgeCutOff']}",
+            },
+        )
+
+        self.update_campaign_job = tasks.LambdaInvoke(
+            self,
+            "Update Campaign with new Solution Version",
+            lambda_function=self.update_campaign_lambda,
+            output_path="$.Payload",
+        )
+        # Wait till campaign is finished updating
+        self.describe_campaign_lambda = _lambda.Function(
+            self,
+            resource_name(_lambda.Function, "recommender-sm-describe-campaign"),
+            function_name=resource_name(
+                _lambda.Function, "recommender-sm-describe-campaign"
+            ),
+            handler="describe_campaign.lambda_handler",
+            runtime=_lambda.Runtime.PYTHON_3_9,
+            code=function_bundle("state_machine", "describe_campaign"),
+            role=self.state_machine_execution_role,
+            environment_encryption=self.kms_key,
+            environment={
+                "sns_arn": self.sns_topic.topic_arn,
+                "campaign_arn_ssm": config["recommendationCampaignArnSsmPath"],
+                "rerank_enabled": f"{config['rerankingEnabled']}",
+                "rerank_campaign_arn_ssm_path": config["rerankingCampaignArnSsmPath"],
+            },
+        )
+
+        self.describe_campaign_job = tasks.LambdaInvoke(
+            self,
+            "Wait For Campaign Update to Complete",
+            lambda_function=self.describe_campaign_lambda,
+            output_path="$.Payload",
+        )
+
+        self.describe_campaign_job.add_retry(
+            backoff_rate=1.0,
+            interval=Duration.minutes(1),
+            max_attempts=30,
+        )
+
+    def create_state_machine_definition(self):
+        # This defines how the tasks and lambdas are orchestrated
+        self.state_machine_definition = self.create_solution_version_job.next(
+            self.describe_solution_version_job.next(
+                self.evalute_solution_version_job.next(
+                    stepfunctions.Choice(self, "Promote Model Choice")
+                    .when(
+                        stepfunctions.Condition.boolean_equals("$.promote", False),
+                        self.do_not_promote,
+                    )
+                    .when(
+                        stepfunctions.Condition.boolean_equals("$.promote", True),
+                        self.update_campaign_job.next(
+                            self.describe_campaign_job.next(self.do_promote)
+                        ),
+                    )
+                )
+            )
+        )
+
+        self.state_machine_log_group = logs.LogGroup(
+            self,
+            "Recommender State Machine Log Group",
+            log_group_name=resource_name(
+                logs.LogGroup, "recommender-state-machine-logs"
+            ),
+            encryption_key=self.kms_key,
+            removal_policy=cdk.RemovalPolicy.DESTROY,
+        )
+        # Create state machine using above definition
+        self.training_state_machine = stepfunctions.StateMachine(
+            self,
+            "Recommender Training State Machine",
+            state_machine_name=resource_name(
+                stepfunctions.StateMachine, "recommender-state-machine"
+            ),
+            definition=self.state_machine_definition,
+            logs=stepfunctions.LogOptions(
+                destination=self.state_machine_log_group,
+                level=stepfunctions.LogLevel.ALL,
+            ),
+            timeout=Duration.hours(24),
+            role=self.state_machine_role.without_policy_updates(),
+        )
+
+        self.training_state_machine.node.add_dependency(self.state_machine_role)
+
+        self.trigger_role = iam.Role(
+            self,
+            "recommender-trigger-role",
+            role_name=resource_name(iam.Role, "recommender-trigger-role"),
+            assumed_by=iam.ServicePrincipal("events.amazonaws.com"),
+        )
+
+        # Send notificatino for FAILED, ABORTED, or timedout machine execution
+        self.failure_notification = events.Rule(
+            self,
+            "recommender-failure-notification",
+            rule_name=resource_name(events.Rule, "recommender-failure-notification"),
+            event_pattern=events.EventPattern(
+                source=["aws.states"],
+                detail={
+                    "stateMachineArn": [self.training_state_machine.state_machine_arn],
+                    "status": ["FAILED", "ABORTED", "TIMED_OUT"],
+                },
+                detail_type=["Step Functions Execution Status Change"],
+            ),
+        )
+
+        self.failure_notification.add_target(targets.SnsTopic(self.sns_topic))
+
+        # Trigger machine once a day
+        self.event_trigger = events.Rule(
+            self,
+            "recommender-statemachine-trigger",
+            rule_name=resource_name(events.Rule, "recommender-statemachine-trigger"),
+            schedule=events.Schedule.rate(cdk.Duration.days(1)),
+        )
+        self.event_trigger.add_target(
+            targets.SfnStateMachine(
+                self.training_state_machine,
+                input=events.RuleTargetInput.from_object({"": ""}),
+                role=self.trigger_role,
+            )
+        )
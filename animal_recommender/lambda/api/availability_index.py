@@ -0,0 +1,134 @@
+## Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+## SPDX-License-Identifier: MIT-0
+
+# eventType used on the kinesis stream for adoption / availability changes,
+# these events update the index and are not forwarded to personalize
+AVAILABILITY_EVENT_TYPE = "AvailabilityChange"
+
+
+class AvailabilityIndex:
+    """Bitset over catalog ordinals, a set bit means the animal group is available.
+
+    Items that are not in the catalog are not tracked and are treated as available.
+    """
+
+    def __init__(self, catalog=None, bitmap=None):
+        self.catalog = list(catalog or [])
+        self.ordinals = {item_id: i for i, item_id in enumerate(self.catalog)}
+        self.bitmap = bytearray(bitmap or b"")
+        # new catalog entries default to available
+        missing_bytes = (len(self.catalog) + 7) // 8 - len(self.bitmap)
+        if missing_bytes > 0:
+            self.bitmap.extend(b"\xff" * missing_bytes)
+        self._unavailable = None
+
+    def __len__(self):
+        return len(self.catalog)
+
+    def is_available(self, item_id):
+        ordinal = self.ordinals.get(item_id)
+        if ordinal is None:
+            return True
+        return bool(self.bitmap[ordinal >> 3] & (1 << (ordinal & 7)))
+
+    def set_available(self, item_id, available):
+        ordinal = self.ordinals.get(item_id)
+        if ordinal is None:
+            ordinal = len(self.catalog)
+            self.catalog.append(item_id)
+            self.ordinals[item_id] = ordinal
+            if ordinal >> 3 >= len(self.bitmap):
+                self.bitmap.append(0xFF)
+        if available:
+            self.bitmap[ordinal >> 3] |= 1 << (ordinal & 7)
+        else:
+            self.bitmap[ordinal >> 3] &= ~(1 << (ordinal & 7)) & 0xFF
+        self._unavailable = None
+
+    def unavailable(self):
+        # Decode the bitmap once into a set so filtering a candidate list is a
+        # single membership test per item
+        if self._unavailable is None:
+            bits = int.from_bytes(self.bitmap, "little")
+            self._unavailable = frozenset(
+                item_id
+                for ordinal, item_id in enumerate(self.catalog)
+                if not (bits >> ordinal) & 1
+            )
+        return self._unavailable
+
+    def filter_available(self, item_ids):
+        unavailable = self.unavailable()
+        if not unavailable:
+            return list(item_ids)
+        return [item_id for item_id in item_ids if item_id not in unavailable]
+
+
+def load_index(dynamodb_client, table_name):
+    """The index of the animal groups of the animals in the availability table.
+
+    A group is available while at least one of its animals is available.
+    """
+    available_groups = set()
+    groups = set()
+    request = {
+        "TableName": table_name,
+        "ProjectionExpression": "#group_id, #available",
+        "ExpressionAttributeNames": {
+            "#group_id": "group_id",
+            "#available": "available",
+        },
+    }
+    while True:
+        page = dynamodb_client.scan(**request)
+        for item in page["Items"]:
+            group_id = item["group_id"]["S"]
+            groups.add(group_id)
+            if item["available"]["BOOL"]:
+                available_groups.add(group_id)
+        if "LastEvaluatedKey" not in page:
+            break
+        request["ExclusiveStartKey"] = page["LastEvaluatedKey"]
+    index = AvailabilityIndex()
+    for group_id in sorted(groups):
+        index.set_available(group_id, group_id in available_groups)
+    return index
+
+
+def write_changes(dynamodb_client, table_name, changes):
+    """Writes changes, (group_id, available, changed_at) by animal id.
+
+    Every animal is its own item, so consumers of different shards never
+    overwrite each others changes and an adoption only hides its own animal.
+    A change older than the one stored for the animal is dropped, the latest
+    change wins whatever order the consumers write in, and a replayed batch
+    writes the same items again. Returns the number of animals that changed.
+    """
+    written = 0
+    for animal_id, (group_id, available, changed_at) in changes.items():
+        try:
+            dynamodb_client.update_item(
+                TableName=table_name,
+                Key={"animal_id": {"S": animal_id}},
+                UpdateExpression=(
+                    "SET #group_id = :group_id, #available = :available,"
+                    " #changed_at = :changed_at"
+                ),
+                ConditionExpression=(
+                    "attribute_not_exists(#changed_at) OR #changed_at <= :changed_at"
+                ),
+                ExpressionAttributeNames={
+                    "#group_id": "group_id",
+                    "#available": "available",
+                    "#changed_at": "changed_at",
+                },
+                ExpressionAttributeValues={
+                    ":group_id": {"S": group_id},
+                    ":available": {"BOOL": available},
+                    ":changed_at": {"N": f"{changed_at}"},
+                },
+            )
+            written += 1
+        except dynamodb_client.exceptions.ConditionalCheckFailedException:
+            print(f"Skipping availability of {animal_id}, a later change is stored")
+    return written
@@ -0,0 +1,40 @@
+## Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+## SPDX-License-Identifier: MIT-0
+import time
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half-open"
+
+
+class CircuitBreaker:
+    """Stops calling a dependency after failure_threshold consecutive failures.
+
+    A call fails when it raises or takes longer than its latency budget. The
+    open breaker rejects calls for open_seconds, then lets one trial call
+    through: it closes the breaker when it succeeds and opens it again when it
+    fails. Each lambda environment keeps its own breaker.
+    """
+
+    def __init__(self, failure_threshold=5, open_seconds=30, clock=time.monotonic):
+        self.failure_threshold = int(failure_threshold)
+        self.open_seconds = float(open_seconds)
+        self.clock = clock
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+
+    def allows(self):
+        """True when the next call may go to the dependency."""
+        if self.state == OPEN and self.clock() - self.opened_at >= self.open_seconds:
+            self.state = HALF_OPEN
+            return True
+        return self.state == CLOSED
+
+    def record_success(self):
+        self.state = CLOSED
+        self.failures = 0
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = OPEN
+            self.opened_at = self.clock()
@@ -0,0 +1,153 @@
+## Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+## SPDX-License-Identifier: MIT-0
+import datetime, json, threading, uuid
+
+from botocore.exceptions import (
+    ClientError,
+    ConnectionClosedError,
+    ConnectTimeoutError,
+    EndpointConnectionError,
+    ReadTimeoutError,
+)
+
+# errors a retry of the same record can fix, everything else is dead lettered
+RETRYABLE_ERROR_CODES = {
+    "InternalFailure",
+    "InternalServerError",
+    "ProvisionedThroughputExceededException",
+    "RequestLimitExceeded",
+    "ServiceUnavailable",
+    "ServiceUnavailableException",
+    "ThrottledException",
+    "Throttling",
+    "ThrottlingException",
+    "TooManyRequestsException",
+}
+RETRYABLE_ERRORS = (
+    ConnectionClosedError,
+    ConnectTimeoutError,
+    EndpointConnectionError,
+    ReadTimeoutError,
+)
+
+# errors about the event itself, putting it back on the stream fails again
+INVALID_INPUT_ERROR_CODES = {"InvalidInputException", "ValidationException"}
+
+# send_message_batch and delete_message_batch limit
+SQS_BATCH_SIZE = 10
+
+
+def is_retryable(error):
+    if isinstance(error, ClientError):
+        return error.response.get("Error", {}).get("Code") in RETRYABLE_ERROR_CODES
+    return isinstance(error, RETRYABLE_ERRORS)
+
+
+def is_invalid_input(error):
+    if isinstance(error, ClientError):
+        return error.response.get("Error", {}).get("Code") in INVALID_INPUT_ERROR_CODES
+    return False
+
+
+def dead_letter_entry(record, error, reprocessable=True, now=None):
+    """Failure reason and original payload of a kinesis lambda record.
+
+    Records that could not be decoded or that personalize rejected as invalid
+    are not reprocessable, the reprocessor leaves them in the queue.
+    """
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    kinesis_record = record["kinesis"]
+    return {
+        "reason": f"{type(error).__name__}: {error}",
+        "reprocessable": reprocessable,
+        "failedAt": now.isoformat(),
+        "eventSourceARN": record.get("eventSourceARN"),
+        "partitionKey": kinesis_record.get("partitionKey"),
+        "sequenceNumber": kinesis_record.get("sequenceNumber"),
+        "approximateArrivalTimestamp": kinesis_record.get(
+            "approximateArrivalTimestamp"
+        ),
+        # base64 as received, envelope or json
+        "data": kinesis_record["data"],
+    }
+
+
+class SqsDeadLetterQueue:
+    """Dead letter entries stored as json messages in an SQS queue."""
+
+    def __init__(self, sqs_client, queue_url, wait_seconds=1):
+        self.sqs_client = sqs_client
+        self.queue_url = queue_url
+        self.wait_seconds = wait_seconds
+
+    def put(self, entries):
+        for start in range(0, len(entries), SQS_BATCH_SIZE):
+            batch = entries[start : start + SQS_BATCH_SIZE]
+            response = self.sqs_client.send_message_batch(
+                QueueUrl=self.queue_url,
+                Entries=[
+                    {"Id": str(i), "MessageBody": json.dumps(entry)}
+                    for i, entry in enumerate(batch)
+                ],
+            )
+            if response.get("Failed"):
+                # raise so the records are retried instead of lost
+                raise RuntimeError(
+                    f"Could not dead letter {len(response['Failed'])} records: {response['Failed']}"
+                )
+
+    def receive(self, max_messages=SQS_BATCH_SIZE):
+        """Return (handle, entry) pairs, an empty list once the queue is drained."""
+        response = self.sqs_client.receive_message(
+            QueueUrl=self.queue_url,
+            MaxNumberOfMessages=min(max_messages, SQS_BATCH_SIZE),
+            WaitTimeSeconds=self.wait_seconds,
+        )
+        return [
+            (message["ReceiptHandle"], json.loads(message["Body"]))
+            for message in response.get("Messages", [])
+        ]
+
+    def delete(self, handles):
+        for start in range(0, len(handles), SQS_BATCH_SIZE):
+            self.sqs_client.delete_message_batch(
+                QueueUrl=self.queue_url,
+                Entries=[
+                    {"Id": str(i), "ReceiptHandle": handle}
+                    for i, handle in enumerate(handles[start : start + SQS_BATCH_SIZE])
+                ],
+            )
+
+
+class LocalDeadLetterQueue:
+    """In memory stand-in for SqsDeadLetterQueue, for tests and local runs.
+
+    Received entries stay in flight until deleted, like an SQS message
+    within its visibility timeout.
+    """
+
+    def __init__(self, entries=None):
+        self.lock = threading.Lock()
+        self.pending = list(entries or [])
+        self.inflight = {}
+
+    def __len__(self):
+        with self.lock:
+            return len(self.pending) + len(self.inflight)
+
+    def put(self, entries):
+        with self.lock:
+            self.pending.extend(json.loads(json.dumps(entry)) for entry in entries)
+
+    def receive(self, max_messages=SQS_BATCH_SIZE):
+        with self.lock:
+            received = self.pending[:max_messages]
+            del self.pending[:max_messages]
+            messages = [(uuid.uuid4().hex, entry) for entry in received]
+            self.inflight.update(messages)
+        return messages
+
+    def delete(self, handles):
+        with self.lock:
+            for handle in handles:
+                self.inflight.pop(handle, None)
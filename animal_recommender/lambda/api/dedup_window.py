@@ -0,0 +1,115 @@
+## Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+## SPDX-License-Identifier: MIT-0
+import hashlib, math, time
+
+
+class BloomFilter:
+    def __init__(self, capacity, false_positive_rate):
+        self.num_bits = max(
+            8, int(-capacity * math.log(false_positive_rate) / (math.log(2) ** 2))
+        )
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key, digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def __contains__(self, key):
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(key)
+        )
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def add_new(self, key):
+        """Add the key, returns False if it was already in the filter."""
+        new = False
+        for position in self._positions(key):
+            mask = 1 << (position & 7)
+            if not self.bits[position >> 3] & mask:
+                self.bits[position >> 3] |= mask
+                new = True
+        if new:
+            self.count += 1
+        return new
+
+
+class DedupWindow:
+    """Remembers event fingerprints for window_seconds in bounded memory.
+
+    The window is split into generations of bloom filters, a fingerprint is a
+    duplicate if any live generation has seen it and expired generations are
+    dropped as a whole. Memory is fixed by capacity, the number of events a
+    generation can hold at the given false positive rate; a false positive
+    drops a unique event, so keep the rate low.
+    """
+
+    def __init__(
+        self,
+        window_seconds,
+        capacity=100000,
+        false_positive_rate=0.001,
+        generations=2,
+        clock=time.monotonic,
+    ):
+        self.generation_seconds = window_seconds / generations
+        self.capacity = capacity
+        self.false_positive_rate = false_positive_rate
+        self.num_generations = generations
+        self.clock = clock
+        self.generations = []
+        self.duplicates = 0
+
+    def _rotate(self, now):
+        # a generation also rotates early when it is full so the rate holds
+        if (
+            not self.generations
+            or now - self.generations[-1][0] >= self.generation_seconds
+            or self.generations[-1][1].count >= self.capacity
+        ):
+            self.generations.append(
+                (now, BloomFilter(self.capacity, self.false_positive_rate))
+            )
+        # inserts after start + generation_seconds go to a new generation, so
+        # that bounds the age of everything a generation holds
+        oldest_live = now - self.generation_seconds * self.num_generations
+        while (
+            self.generations[0][0] + self.generation_seconds <= oldest_live
+            or len(self.generations) > self.num_generations + 1
+        ):
+            self.generations.pop(0)
+
+    @staticmethod
+    def _key(fields):
+        key = "\x1f".join("" if field is None else str(field) for field in fields)
+        return key.encode("utf-8")
+
+    def contains(self, *fields):
+        """Return True if the fingerprint is in the window."""
+        key = self._key(fields)
+        self._rotate(self.clock())
+        if any(key in bloom for _, bloom in self.generations):
+            self.duplicates += 1
+            return True
+        return False
+
+    def add(self, *fields):
+        """Remember the fingerprint, call it once the event was handled."""
+        self._rotate(self.clock())
+        self.generations[-1][1].add(self._key(fields))
+
+    def seen(self, *fields):
+        """Return True if the fingerprint is in the window, otherwise remember it."""
+        if self.contains(*fields):
+            return True
+        self.add(*fields)
+        return False
@@ -0,0 +1,57 @@
+## Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+## SPDX-License-Identifier: MIT-0
+import json, os, time
+
+NAMESPACE = "AnimalRecommender"
+
+
+class Metrics:
+    """Counters of an invocation, logged in the CloudWatch embedded metric format.
+
+    CloudWatch extracts the metrics from the log line, so recording them needs
+    no API call and no extra permission.
+    """
+
+    def __init__(self, function_name=None, namespace=NAMESPACE):
+        self.function_name = function_name or os.environ.get(
+            "AWS_LAMBDA_FUNCTION_NAME", "local"
+        )
+        self.namespace = namespace
+        self.counts = {}
+        self.units = {}
+
+    def count(self, name, value=1):
+        self.counts[name] = self.counts.get(name, 0) + value
+
+    def set(self, name, value, unit="None"):
+        """A metric that is not a count, like a rate, the last value is logged."""
+        self.counts[name] = value
+        self.units[name] = unit
+
+    def flush(self):
+        """Log the counters of the invocation and reset them."""
+        if not self.counts:
+            return None
+        line = json.dumps(
+            {
+                "_aws": {
+                    "Timestamp": int(time.time() * 1000),
+                    "CloudWatchMetrics": [
+                        {
+                            "Namespace": self.namespace,
+                            "Dimensions": [["FunctionName"]],
+                            "Metrics": [
+                                {"Name": name, "Unit": self.units.get(name, "Count")}
+                                for name in self.counts
+                            ],
+                        }
+                    ],
+                },
+                "FunctionName": self.function_name,
+                **self.counts,
+            }
+        )
+        self.counts = {}
+        self.units = {}
+        print(line)
+        return line
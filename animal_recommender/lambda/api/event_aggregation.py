@@ -0,0 +1,51 @@
+## Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+## SPDX-License-Identifier: MIT-0
+
+NONE = "none"
+COUNT = "count"
+RANKED = "ranked"
+MODES = (NONE, COUNT, RANKED)
+
+# stronger intent first, adopt (AIF) over favorite over detail view
+EVENT_TYPE_RANKS = {"aif": 3, "favorite": 2, "detailview": 1}
+
+
+def event_type_rank(event_type):
+    return EVENT_TYPE_RANKS.get(str(event_type).casefold(), 0)
+
+
+def aggregate_events(prepared, mode=COUNT):
+    """Collapse repeated interactions of a kinesis batch.
+
+    prepared is a list of (position, event) in batch order, where event has
+    userId, sessionId, itemId, eventType and sentAt. Returns a list of
+    (positions, event) in the order of the first collapsed event.
+
+    count collapses events with the same (userId, sessionId, itemId, eventType),
+    ranked also combines the ranked event types of an item into the strongest
+    one. The collapsed event has the latest sentAt and the number of events it
+    stands for as eventValue.
+    """
+    if mode not in MODES:
+        raise ValueError(f"Invalid aggregation mode: {mode}")
+    if mode == NONE:
+        return [([position], event) for position, event in prepared]
+
+    aggregates = {}
+    for position, event in prepared:
+        key = (event["userId"], event["sessionId"], event["itemId"])
+        rank = event_type_rank(event["eventType"])
+        if mode == COUNT or rank == 0:
+            key += (event["eventType"],)
+        aggregate = aggregates.get(key)
+        if aggregate is None:
+            aggregates[key] = ([position], dict(event, eventValue=1.0))
+            continue
+        positions, combined = aggregate
+        positions.append(position)
+        combined["eventValue"] += 1
+        combined["sentAt"] = max(combined["sentAt"], event["sentAt"])
+        if rank > event_type_rank(combined["eventType"]):
+            combined["eventType"] = event["eventType"]
+    # dicts keep insertion order, the order of the first event of each key
+    return list(aggregates.values())
@@ -0,0 +1,233 @@
+## Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+## SPDX-License-Identifier: MIT-0
+# Compact binary envelope for kinesis interaction events.
+#
+# Layout, all integers big endian:
+#   magic            1 byte   0xA5, never the first byte of a json record
+#   format version   1 byte   selects this layout
+#   dictionary       2 bytes  version of the event type / breed dictionaries
+#   flags            1 byte   optional fields that are present
+#   event type       1 byte   dictionary code
+#   species          1 byte   small id, LITERAL means the value is in the strings
+#   breed            2 bytes  dictionary code, LITERAL_BREED means in the strings
+#   size             1 byte   small id or LITERAL
+#   age              1 byte   small id or LITERAL
+#   timestamp        8 bytes  float epoch seconds, if FLAG_TIMESTAMP
+#   strings          1 byte length + utf-8, in order: sessionId, userId,
+#                    animal_id, then literal species, breed, size and age
+import json, struct
+
+from availability_index import AVAILABILITY_EVENT_TYPE
+
+MAGIC = 0xA5
+FORMAT_VERSION = 1
+
+FLAG_USER_ID = 0x01
+FLAG_TIMESTAMP = 0x02
+FLAG_AVAILABLE = 0x04
+FLAG_ANIMAL_ID = 0x08
+FLAG_SESSION_ID = 0x10
+
+LITERAL = 0xFF
+LITERAL_BREED = 0xFFFF
+
+HEADER = struct.Struct(">BBHBBBHBB")
+TIMESTAMP = struct.Struct(">d")
+
+# Dictionaries are append only, a dictionary version is the number of entries
+# of each list it covers so older producers stay decodable after new entries
+EVENT_TYPES = ["DetailView", "favorite", "AIF", AVAILABILITY_EVENT_TYPE]
+BREEDS = [
+    "Abyssinian",
+    "American_Bulldog",
+    "American_Pit_Bull_Terrier",
+    "Basset_Hound",
+    "Beagle",
+    "Bengal",
+    "Birman",
+    "Bombay",
+    "Boxer",
+    "British_Shorthair",
+    "Chihuahua",
+    "Egyptian_Mau",
+    "English_Cocker_Spaniel",
+    "English_Setter",
+    "German_Shorthaired",
+    "Great_Pyrenees",
+    "Havanese",
+    "Japanese_Chin",
+    "Keeshond",
+    "Leonberger",
+    "Maine_Coon",
+    "Miniature_Pinscher",
+    "Newfoundland",
+    "Persian",
+    "Pomeranian",
+    "Pug",
+    "Ragdoll",
+    "Russian_Blue",
+    "Saint_Bernard",
+    "Samoyed",
+    "Scottish_Terrier",
+    "Shiba_Inu",
+    "Siamese",
+    "Sphynx",
+    "Staffordshire_Bull_Terrier",
+    "Wheaten_Terrier",
+    "Yorkshire_Terrier",
+]
+DICTIONARIES = {1: (4, 37)}
+DICTIONARY_VERSION = max(DICTIONARIES)
+
+EVENT_TYPE_CODES = {name: code for code, name in enumerate(EVENT_TYPES)}
+BREED_CODES = {name: code for code, name in enumerate(BREEDS)}
+
+
+class EnvelopeError(ValueError):
+    pass
+
+
+def is_envelope(data):
+    return len(data) > 0 and data[0] == MAGIC
+
+
+def _small_id(value, literals):
+    value = str(value)
+    if value.isdigit() and int(value) < LITERAL and str(int(value)) == value:
+        return int(value)
+    literals.append(value)
+    return LITERAL
+
+
+def _pack_string(value):
+    encoded = str(value).encode("utf-8")
+    if len(encoded) > 255:
+        raise EnvelopeError(f"String too long for envelope: {value}")
+    return bytes((len(encoded),)) + encoded
+
+
+def encode_event(event):
+    """Encode an event dict in the kinesis record format as an envelope."""
+    event_type = EVENT_TYPE_CODES.get(event["eventType"])
+    if event_type is None:
+        raise EnvelopeError(f"Event type not in dictionary: {event['eventType']}")
+    animal_metadata = event["animalMetadata"]
+
+    flags = 0
+    strings = []
+    if event.get("sessionId") is not None:
+        flags |= FLAG_SESSION_ID
+        strings.append(event["sessionId"])
+    if event.get("userId") is not None:
+        flags |= FLAG_USER_ID
+        strings.append(event["userId"])
+    if event.get("animal_id") is not None:
+        flags |= FLAG_ANIMAL_ID
+        strings.append(event["animal_id"])
+    if event.get("timestamp") is not None:
+        flags |= FLAG_TIMESTAMP
+    if event.get("available"):
+        flags |= FLAG_AVAILABLE
+
+    literals = []
+    species = _small_id(animal_metadata["animal_species_id"], literals)
+    breed = BREED_CODES.get(animal_metadata["animal_primary_breed_id"], LITERAL_BREED)
+    if breed == LITERAL_BREED:
+        literals.append(animal_metadata["animal_primary_breed_id"])
+    size = _small_id(animal_metadata["animal_size_id"], literals)
+    age = _small_id(animal_metadata["animal_age_id"], literals)
+
+    parts = [
+        HEADER.pack(
+            MAGIC,
+            FORMAT_VERSION,
+            DICTIONARY_VERSION,
+            flags,
+            event_type,
+            species,
+            breed,
+            size,
+            age,
+        )
+    ]
+    if flags & FLAG_TIMESTAMP:
+        parts.append(TIMESTAMP.pack(float(event["timestamp"])))
+    parts.extend(_pack_string(value) for value in strings + literals)
+    return b"".join(parts)
+
+
+def decode_event(data):
+    """Decode an envelope into the same dict a json record deserializes to."""
+    return decode_envelope(data)[0]
+
+
+def decode_envelope(data, offset=0):
+    """Decode the envelope that starts at offset, returns it with its end offset.
+
+    Envelopes delimit themselves, so concatenated envelopes, like the records
+    of a firehose archive object, can be decoded one after the other.
+    """
+    if len(data) - offset < HEADER.size:
+        raise EnvelopeError("Truncated envelope")
+    (
+        magic,
+        version,
+        dictionary,
+        flags,
+        event_type,
+        species,
+        breed,
+        size,
+        age,
+    ) = HEADER.unpack_from(data, offset)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        raise EnvelopeError(f"Unsupported envelope format version: {version}")
+    sizes = DICTIONARIES.get(dictionary)
+    if sizes is None:
+        raise EnvelopeError(f"Unknown envelope dictionary version: {dictionary}")
+    if event_type >= sizes[0] or (breed != LITERAL_BREED and breed >= sizes[1]):
+        raise EnvelopeError("Dictionary code out of range")
+
+    offset += HEADER.size
+    event = {}
+
+    def next_string():
+        nonlocal offset
+        length = data[offset]
+        value = data[offset + 1 : offset + 1 + length]
+        if len(value) != length:
+            raise EnvelopeError("Truncated envelope")
+        offset += 1 + length
+        return value.decode("utf-8")
+
+    try:
+        if flags & FLAG_TIMESTAMP:
+            event["timestamp"] = TIMESTAMP.unpack_from(data, offset)[0]
+            offset += TIMESTAMP.size
+        if flags & FLAG_SESSION_ID:
+            event["sessionId"] = next_string()
+        if flags & FLAG_USER_ID:
+            event["userId"] = next_string()
+        if flags & FLAG_ANIMAL_ID:
+            event["animal_id"] = next_string()
+        event["eventType"] = EVENT_TYPES[event_type]
+        event["animalMetadata"] = {
+            "animal_species_id": next_string() if species == LITERAL else str(species),
+            "animal_primary_breed_id": (
+                next_string() if breed == LITERAL_BREED else BREEDS[breed]
+            ),
+            "animal_size_id": next_string() if size == LITERAL else str(size),
+            "animal_age_id": next_string() if age == LITERAL else str(age),
+        }
+    except (IndexError, struct.error):
+        raise EnvelopeError("Truncated envelope")
+    if event["eventType"] == AVAILABILITY_EVENT_TYPE:
+        event["available"] = bool(flags & FLAG_AVAILABLE)
+    return event, offset
+
+
+def deserialize_record(data):
+    """Accept both envelopes and legacy json records while producers migrate."""
+    if is_envelope(data):
+        return decode_event(data)
+    return json.loads(data)
@@ -0,0 +1,68 @@
+## Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+## SPDX-License-Identifier: MIT-0
+import datetime, math
+
+ACCEPT = "accept"
+CLAMP = "clamp"
+ARCHIVE = "archive"
+POLICIES = (ACCEPT, CLAMP, ARCHIVE)
+
+# epoch values above this are milliseconds
+MILLISECONDS_THRESHOLD = 1e11
+
+
+def event_timestamp(deserialized_data, kinesis_record, now):
+    """Epoch seconds the event happened at.
+
+    Uses the producer timestamp, then the time kinesis received the record, and
+    the consume time only if neither is present.
+    """
+    timestamp = deserialized_data.get("timestamp")
+    if timestamp is not None:
+        try:
+            timestamp = float(timestamp)
+        except (TypeError, ValueError):
+            print(f"Invalid timestamp, could not parse: {timestamp}")
+            timestamp = None
+        else:
+            # nan and inf parse but are not a point in time
+            if not math.isfinite(timestamp):
+                print(f"Invalid timestamp, not finite: {timestamp}")
+                timestamp = None
+    if timestamp is None:
+        timestamp = kinesis_record.get("approximateArrivalTimestamp")
+    if timestamp is None:
+        return now
+    timestamp = float(timestamp)
+    if timestamp > MILLISECONDS_THRESHOLD:
+        timestamp /= 1000.0
+    return timestamp
+
+
+class LatenessPolicy:
+    """Decides the sentAt of an event from its timestamp.
+
+    Events older than max_lateness_seconds are sent with their own time
+    (accept), sent at now - max_lateness_seconds (clamp) or not sent to
+    personalize at all (archive), firehose keeps the raw event in s3 either way.
+    Timestamps in the future are always clamped to now.
+    """
+
+    def __init__(self, policy=ACCEPT, max_lateness_seconds=3600):
+        if policy not in POLICIES:
+            raise ValueError(f"Invalid late event policy: {policy}")
+        self.policy = policy
+        self.max_lateness_seconds = float(max_lateness_seconds)
+        self.late_events = 0
+
+    def sent_at(self, timestamp, now):
+        """Return the sentAt datetime, or None if the event should only be archived."""
+        if timestamp > now:
+            timestamp = now
+        elif now - timestamp > self.max_lateness_seconds:
+            self.late_events += 1
+            if self.policy == ARCHIVE:
+                return None
+            if self.policy == CLAMP:
+                timestamp = now - self.max_lateness_seconds
+        return datetime.datetime.fromtimestamp(timestamp, tz=datetime.timezone.utc)
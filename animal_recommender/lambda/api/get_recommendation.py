@@ -1,70 +1,37 @@
 ## Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
 ## SPDX-License-Identifier: MIT-0
-import boto3, base64, datetime, json, os
-
-ssm = boto3.client("ssm")
-
-
-campaign_arn_ssm_path = os.environ.get("campaign_arn_ssm_path")
+import boto3, os
+
+from embedded_metrics import Metrics
+from hedging import Hedger
+from init_hook import run_init_hook
+from personalize_client import client_config
+from recommendation import RecommendOperation
+from request_coalescing import RequestCoalescer
+from serving_engine import CampaignResolver, ResponseCache, ServingEngine
+
+metrics = Metrics()
+engine = ServingEngine(
+    CampaignResolver(
+        boto3.client("ssm"), os.environ.get("campaign_arn_refresh_seconds", "300")
+    ),
+    ResponseCache(
+        os.environ.get("response_cache_ttl_seconds", "0"),
+        os.environ.get("response_cache_max_entries", "1000"),
+    ),
+    RequestCoalescer.from_environment(metrics),
+    metrics,
+    client_config=client_config(),
+    hedger=Hedger.from_environment(metrics),
+    deadline_seconds=float(os.environ.get("request_deadline_ms", "2500")) / 1000,
+)
+recommend = RecommendOperation.from_environment()
+
+run_init_hook(*engine.init_steps(recommend))
 
 
 def lambda_handler(event, context):
 
     print(f"Event: {event}")
 
-    body = event["body"]
-
-    campaign_arn = str(
-        ssm.get_parameter(Name=campaign_arn_ssm_path)["Parameter"]["Value"]
-    )
-
-    personalizeClient = boto3.client(service_name="personalize-runtime")
-
-    itemLimit = 10
-    itemId = None
-    userId = "unknown"
-    response = []
-
-    if "limit" in body:
-        try:
-            paramLimit = body["limit"]
-            if paramLimit > 0 and paramLimit < 500:
-                itemLimit = paramLimit
-        except:
-            print(
-                "Invalid limit, could not parse or not in bounds: ",
-                body["limit"],
-            )
-
-    if "userId" in body:
-        try:
-            userId = body["userId"]
-        except:
-            print(
-                "Invalid userId, could not parse: ",
-                body["userId"],
-            )
-
-    response = personalizeClient.get_recommendations(
-        campaignArn=campaign_arn,
-        userId=userId,
-        numResults=itemLimit,
-    )
-
-    print(f"response {response}")
-
-    responseItems = buildResponse(response["itemList"])
-    return {"statusCode": 200, "body": json.dumps(responseItems)}
-
-
-def buildResponse(recommendedItems):
-    responseItems = []
-    for item in recommendedItems:
-        if "itemId" in item:
-            responseItem = {
-                "id": item["itemId"],
-            }
-            responseItems.append(responseItem)
-        else:
-            print("Found malformed item, discarding: ", item)
-    return responseItems
+    return engine.handle(recommend, event, context)
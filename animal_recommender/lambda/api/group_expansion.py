@@ -0,0 +1,88 @@
+## Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+## SPDX-License-Identifier: MIT-0
+# Strategies for expanding a ranked list of animal groups back into item ids.
+# Every strategy is a generator so callers only pay for the items they consume.
+import heapq
+
+
+def order_by_signal(members, signal_key, descending=False):
+    """Order (item_id, animal_metadata) pairs of a group by a per item signal.
+
+    Items without the signal keep their input order after the ones that have it.
+    """
+    with_signal = []
+    without_signal = []
+    for position, (item_id, animal_metadata) in enumerate(members):
+        value = animal_metadata.get(signal_key)
+        if value is None or value == "":
+            without_signal.append(item_id)
+            continue
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            without_signal.append(item_id)
+            continue
+        with_signal.append((-value if descending else value, position, item_id))
+    with_signal.sort()
+    return [entry[2] for entry in with_signal] + without_signal
+
+
+class GroupExpander:
+    def __init__(self, strategy="concatenate", signal_key=None, descending=False):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Invalid group expansion strategy: {strategy}")
+        self.strategy = strategy
+        self.signal_key = signal_key
+        self.descending = descending
+
+    def group_items(self, members):
+        if self.signal_key:
+            return order_by_signal(members, self.signal_key, self.descending)
+        return [item_id for item_id, _ in members]
+
+    def expand(self, ranked_groups, inverse_mapping, group_scores=None):
+        """Yield item ids for groups ranked best first.
+
+        inverse_mapping maps an animal group to its (item_id, animal_metadata) pairs
+        """
+        return STRATEGIES[self.strategy](
+            self, ranked_groups, inverse_mapping, group_scores or {}
+        )
+
+
+def concatenate(expander, ranked_groups, inverse_mapping, group_scores):
+    for animal_group in ranked_groups:
+        members = inverse_mapping.get(animal_group)
+        if members:
+            yield from expander.group_items(members)
+
+
+def round_robin(expander, ranked_groups, inverse_mapping, group_scores):
+    # Weighted fair interleave, the k-th item of a group is emitted at virtual
+    # time k / score, so a group with twice the score gets twice the slots.
+    # A group's items are only ordered once the merge reaches that group.
+    heap = []
+    for rank, animal_group in enumerate(ranked_groups):
+        if not inverse_mapping.get(animal_group):
+            continue
+        score = group_scores.get(animal_group, 0.0)
+        weight = score if score > 0 else 1e-9
+        heapq.heappush(heap, (0.0, rank, weight, animal_group, None, 0))
+
+    while heap:
+        virtual_time, rank, weight, animal_group, items, position = heapq.heappop(heap)
+        if items is None:
+            items = expander.group_items(inverse_mapping[animal_group])
+        yield items[position]
+        position += 1
+        if position < len(items):
+            heapq.heappush(
+                heap,
+                (position / weight, rank, weight, animal_group, items, position),
+            )
+
+
+STRATEGIES = {
+    "concatenate": concatenate,
+    "round_robin": round_robin,
+}
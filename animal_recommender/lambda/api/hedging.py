@@ -0,0 +1,96 @@
+## Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+## SPDX-License-Identifier: MIT-0
+import os, threading, time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+class LatencyWindow:
+    """Latencies of the last size calls."""
+
+    def __init__(self, size=200):
+        self.samples = deque(maxlen=size)
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.samples)
+
+    def record(self, seconds):
+        with self.lock:
+            self.samples.append(seconds)
+
+    def percentile(self, percentile):
+        with self.lock:
+            ordered = sorted(self.samples)
+        return ordered[int(percentile / 100 * (len(ordered) - 1))]
+
+
+class Hedger:
+    """Sends a duplicate of a call that has not returned after the recent p95
+    latency of its kind of call, and answers with whichever returns first.
+
+    Only the slowest few percent of the calls are duplicated. The latencies
+    of the first calls are recorded even when their duplicate answered, so
+    the delay follows the latency of the service and not the hedged latency.
+    Until min_samples calls are recorded the delay is initial_delay_seconds.
+    """
+
+    def __init__(
+        self,
+        metrics,
+        initial_delay_seconds=0.15,
+        percentile=95,
+        min_samples=20,
+        window_size=200,
+        max_workers=8,
+    ):
+        self.metrics = metrics
+        self.initial_delay_seconds = float(initial_delay_seconds)
+        self.percentile = float(percentile)
+        self.min_samples = int(min_samples)
+        self.window_size = int(window_size)
+        self.max_workers = int(max_workers)
+        self.executor = ThreadPoolExecutor(max_workers)
+        self.windows = {}
+
+    @classmethod
+    def from_environment(cls, metrics):
+        """The hedger of the lambda, None when hedging is turned off."""
+        if os.environ.get("personalize_hedging") != "True":
+            return None
+        return cls(
+            metrics,
+            initial_delay_seconds=float(os.environ.get("hedge_initial_delay_ms", "150"))
+            / 1000,
+            percentile=os.environ.get("hedge_percentile", "95"),
+        )
+
+    def delay(self, name):
+        window = self.windows.setdefault(name, LatencyWindow(self.window_size))
+        if len(window) < self.min_samples:
+            return self.initial_delay_seconds
+        return window.percentile(self.percentile)
+
+    def call(self, name, function, *args):
+        """Result of function(*args), name keys the latencies of the call."""
+        delay = self.delay(name)
+        window = self.windows[name]
+        start = time.monotonic()
+        first = self.executor.submit(function, *args)
+        first.add_done_callback(lambda _: window.record(time.monotonic() - start))
+        done, _ = wait([first], timeout=delay)
+        if done:
+            return first.result()
+        self.metrics.count("HedgedCalls")
+        hedge = self.executor.submit(function, *args)
+        pending = {first, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        self.metrics.count("HedgeWins")
+                    return future.result()
+                error = future.exception()
+        raise error
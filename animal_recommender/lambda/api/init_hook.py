@@ -0,0 +1,44 @@
+## Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+## SPDX-License-Identifier: MIT-0
+import os, time
+
+# value of AWS_LAMBDA_INITIALIZATION_TYPE when lambda initializes an
+# environment for provisioned concurrency, ahead of the requests it serves
+PROVISIONED_CONCURRENCY = "provisioned-concurrency"
+PREWARM_MODES = ("always", "provisioned", "never")
+
+
+def should_prewarm(mode, initialization_type):
+    """always, provisioned (only in provisioned concurrency inits) or never."""
+    if mode not in PREWARM_MODES:
+        raise ValueError(f"Unknown prewarm mode {mode}, use one of {PREWARM_MODES}")
+    if mode == "provisioned":
+        return initialization_type == PROVISIONED_CONCURRENCY
+    return mode == "always"
+
+
+def run_init_hook(*steps, mode=None):
+    """Run the warm up steps of a handler while the lambda initializes.
+
+    The steps fill the caches the first request would otherwise fill. A step
+    that fails is logged and left to the first request, so a missing
+    parameter does not fail the initialization. Returns the names of the
+    steps that ran.
+    """
+    if mode is None:
+        mode = os.environ.get("prewarm_on_init", "never")
+    if not should_prewarm(mode, os.environ.get("AWS_LAMBDA_INITIALIZATION_TYPE")):
+        return []
+    warmed = []
+    for step in steps:
+        start = time.perf_counter()
+        try:
+            step()
+        except Exception as e:
+            print(f"Init hook {step.__name__} failed, left to the first request: {e}")
+            continue
+        print(
+            f"Init hook {step.__name__} {(time.perf_counter() - start) * 1000:.1f} ms"
+        )
+        warmed.append(step.__name__)
+    return warmed
@@ -0,0 +1,86 @@
+## Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+## SPDX-License-Identifier: MIT-0
+import os
+
+from botocore.client import BaseClient
+from botocore.config import Config
+
+RETRY_MODES = ("legacy", "standard", "adaptive")
+# older botocore versions do not have the option, their sockets keep the os default
+TCP_KEEPALIVE = "tcp_keepalive" in Config.OPTION_DEFAULTS
+
+
+def client_config(max_pool_connections=10):
+    """Timeouts, retries and connection pool of the personalize clients.
+
+    The botocore defaults (60 s read timeout, legacy retries) let one slow
+    call outlast the api gateway timeout many times over. The pool needs a
+    connection for every call that can run at the same time, or the calls
+    beyond it open and drop a connection each.
+    """
+    retry_mode = os.environ.get("personalize_retry_mode", "adaptive")
+    if retry_mode not in RETRY_MODES:
+        raise ValueError(f"Unknown retry mode {retry_mode}")
+    options = dict(
+        connect_timeout=float(
+            os.environ.get("personalize_connect_timeout_seconds", "1")
+        ),
+        read_timeout=float(os.environ.get("personalize_read_timeout_seconds", "2")),
+        retries={
+            "mode": retry_mode,
+            "total_max_attempts": int(os.environ.get("personalize_max_attempts", "3")),
+        },
+        max_pool_connections=int(max_pool_connections),
+    )
+    if TCP_KEEPALIVE:
+        options["tcp_keepalive"] = True
+    return Config(**options)
+
+
+class ConnectionStats:
+    """Requests and new connections of the connection pools of a client.
+
+    Read from the counters of the urllib3 pools behind the botocore session,
+    a request that did not open a connection reused one.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.connections = 0
+        self.requests = 0
+
+    def totals(self):
+        session = self.client._endpoint.http_session
+        managers = [session._manager] + list(session._proxy_managers.values())
+        connections = requests = 0
+        for manager in managers:
+            for key in manager.pools.keys():
+                pool = manager.pools.get(key)
+                if pool is not None:
+                    connections += pool.num_connections
+                    requests += pool.num_requests
+        return connections, requests
+
+    def record(self, metrics, prefix="Personalize"):
+        """Counts the requests and connections since the last record."""
+        if not isinstance(self.client, BaseClient):
+            # stand-in clients of tests and benchmarks have no connection pools
+            return
+        try:
+            connections, requests = self.totals()
+        except AttributeError as e:
+            # the pool internals of another botocore or urllib3 version
+            print(f"Could not read the connection pool counters: {e}")
+            return
+        new_connections = connections - self.connections
+        new_requests = requests - self.requests
+        self.connections, self.requests = connections, requests
+        if not new_requests:
+            return
+        metrics.count(f"{prefix}Requests", new_requests)
+        metrics.count(f"{prefix}NewConnections", new_connections)
+        metrics.set(
+            f"{prefix}ConnectionReuseRate",
+            round(100 * max(new_requests - new_connections, 0) / new_requests, 1),
+            "Percent",
+        )
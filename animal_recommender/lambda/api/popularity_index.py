@@ -0,0 +1,66 @@
+## Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+## SPDX-License-Identifier: MIT-0
+import json
+from collections import Counter, defaultdict
+
+INDEX_VERSION = 1
+# segment with the most popular animal groups of every species
+ALL_SEGMENT = "all"
+
+
+def segment_of(item_id):
+    """Segment of an animal group, its species id."""
+    return item_id.split("-", 1)[0]
+
+
+class PopularityIndex:
+    """Most interacted animal groups, the top_k of each segment.
+
+    Recommendations are served from it when personalize can not answer in time.
+    """
+
+    def __init__(self, segments=None):
+        self.segments = segments or {}
+
+    def __len__(self):
+        return len(self.segments.get(ALL_SEGMENT, []))
+
+    def top(self, limit, segment=ALL_SEGMENT):
+        """The limit most popular groups of segment, of all segments when it is unknown."""
+        items = self.segments.get(segment)
+        if items is None:
+            items = self.segments.get(ALL_SEGMENT, [])
+        return items[:limit]
+
+    @classmethod
+    def from_interactions(cls, item_ids, top_k=100):
+        """Index of an iterable of interacted item ids, ties ordered by item id."""
+        counts = Counter(item_ids)
+        ranked = sorted(counts, key=lambda item_id: (-counts[item_id], item_id))
+        segments = defaultdict(list)
+        for item_id in ranked:
+            segment = segments[segment_of(item_id)]
+            if len(segment) < top_k:
+                segment.append(item_id)
+        segments = dict(segments)
+        segments[ALL_SEGMENT] = ranked[:top_k]
+        return cls(segments)
+
+    def to_json(self):
+        return json.dumps({"version": INDEX_VERSION, "segments": self.segments})
+
+    @classmethod
+    def from_json(cls, data):
+        index = json.loads(data)
+        if index.get("version") != INDEX_VERSION:
+            raise ValueError(f"Unsupported popularity index version: {index}")
+        return cls(index["segments"])
+
+
+def load_index(s3_client, bucket_name, key):
+    try:
+        response = s3_client.get_object(Bucket=bucket_name, Key=key)
+    except s3_client.exceptions.NoSuchKey:
+        print(f"No popularity index at s3://{bucket_name}/{key}, no fallback")
+        return PopularityIndex()
+    return PopularityIndex.from_json(response["Body"].read())
@@ -0,0 +1,113 @@
+## Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+## SPDX-License-Identifier: MIT-0
+import csv, io, time
+
+SECONDS_PER_DAY = 86400.0
+
+
+class PostRanker:
+    """Blends personalize group scores with catalog features and applies diversity rules.
+
+    score = personalize_weight * personalize score of the animal group
+          + item_value_weight * ITEM_VALUE of the animal group
+          + waiting_weight * days waiting / max_waiting_days (capped at 1)
+    """
+
+    def __init__(
+        self,
+        personalize_weight=1.0,
+        item_value_weight=0.0,
+        waiting_weight=0.0,
+        max_waiting_days=365,
+        max_per_breed=0,
+        item_values=None,
+    ):
+        self.personalize_weight = float(personalize_weight)
+        self.item_value_weight = float(item_value_weight)
+        self.waiting_weight = float(waiting_weight)
+        self.max_waiting_days = float(max_waiting_days)
+        self.max_per_breed = int(max_per_breed)
+        self.item_values = item_values or {}
+
+    def rank(self, items, group_scores, now=None):
+        """Rank items given as (item_id, animal_group_id, animal_metadata) tuples.
+
+        Items whose animal group has no personalize score are ranked after all scored items.
+        """
+        if now is None:
+            now = time.time()
+        personalize_weight = self.personalize_weight
+        item_value_weight = self.item_value_weight
+        waiting_per_second = (
+            self.waiting_weight / (self.max_waiting_days * SECONDS_PER_DAY)
+            if self.max_waiting_days > 0
+            else 0.0
+        )
+        waiting_weight = self.waiting_weight
+        item_values = self.item_values
+
+        # the score of an animal group is shared by all items in it, compute once per group
+        group_base = {
+            group_id: personalize_weight * score
+            + item_value_weight * item_values.get(group_id, 0.0)
+            for group_id, score in group_scores.items()
+        }
+
+        scored = []
+        unscored = []
+        for position, (item_id, group_id, animal_metadata) in enumerate(items):
+            base = group_base.get(group_id)
+            if base is None:
+                unscored.append(item_id)
+                continue
+            intake_timestamp = animal_metadata.get("intake_timestamp")
+            if intake_timestamp and waiting_per_second:
+                try:
+                    waited = now - float(intake_timestamp)
+                except (TypeError, ValueError):
+                    # like order_by_signal, an unparseable value counts as missing
+                    waited = 0.0
+                if waited > 0:
+                    base += min(waited * waiting_per_second, waiting_weight)
+            # position keeps the sort stable and avoids comparing metadata
+            scored.append(
+                (
+                    -base,
+                    position,
+                    item_id,
+                    animal_metadata.get("animal_primary_breed_id"),
+                )
+            )
+        scored.sort()
+
+        if self.max_per_breed <= 0:
+            return [entry[2] for entry in scored] + unscored
+
+        # greedy diversity pass, items over the per breed cap keep their order at the end
+        breed_counts = {}
+        ranked = []
+        deferred = []
+        for _, _, item_id, breed in scored:
+            count = breed_counts.get(breed, 0)
+            if count < self.max_per_breed:
+                breed_counts[breed] = count + 1
+                ranked.append(item_id)
+            else:
+                deferred.append(item_id)
+        return ranked + deferred + unscored
+
+
+def parse_item_values(items_csv):
+    """Map ITEM_ID to ITEM_VALUE from an items dataset csv."""
+    item_values = {}
+    for row in csv.DictReader(io.StringIO(items_csv)):
+        try:
+            item_values[row["ITEM_ID"]] = float(row["ITEM_VALUE"])
+        except (KeyError, TypeError, ValueError):
+            print("Found malformed item row, discarding: ", row)
+    return item_values
+
+
+def load_item_values(s3_client, bucket_name, key):
+    response = s3_client.get_object(Bucket=bucket_name, Key=key)
+    return parse_item_values(response["Body"].read().decode("utf-8"))
@@ -1,10 +1,81 @@
 ## Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
 ## SPDX-License-Identifier: MIT-0
-import boto3, base64, datetime, json, os
+import boto3, base64, os, time
 
+from availability_index import AVAILABILITY_EVENT_TYPE, write_changes
+from dead_letter import (
+    SqsDeadLetterQueue,
+    dead_letter_entry,
+    is_invalid_input,
+    is_retryable,
+)
+from dedup_window import DedupWindow
+from embedded_metrics import Metrics
+from event_aggregation import aggregate_events
+from event_envelope import deserialize_record
+from event_time import LatenessPolicy, event_timestamp
+from personalize_client import ConnectionStats, client_config
+
+# the dynamodb and sqs clients are only needed for availability changes and
+# dead letters, they are created on first use to keep them out of the cold start
 ssm = boto3.client("ssm")
+dynamodb = None
+# one client per container instead of one per event, events are sent one at
+# a time so a single pooled connection is reused for the whole batch
+personalize_events = None
+connections = None
+metrics = Metrics()
 
 event_tracker_ssm_path = os.environ.get("event_tracker_ssm_path")
+availability_table_name = os.environ.get("availability_table_name")
+dedup_window_seconds = float(os.environ.get("dedup_window_seconds", "0"))
+dead_letter_queue_url = os.environ.get("dead_letter_queue_url")
+aggregation_mode = os.environ.get("event_aggregation_mode", "none")
+
+lateness_policy = LatenessPolicy(
+    os.environ.get("late_event_policy", "accept"),
+    os.environ.get("max_event_lateness_seconds", "3600"),
+)
+
+# module scope so the window spans kinesis batches handled by this container
+dedup_window = None
+if dedup_window_seconds > 0:
+    dedup_window = DedupWindow(
+        dedup_window_seconds,
+        capacity=int(os.environ.get("dedup_capacity", "100000")),
+        false_positive_rate=float(os.environ.get("dedup_false_positive_rate", "0.001")),
+    )
+
+# records that fail for a reason a retry does not fix, tests can swap in a
+# LocalDeadLetterQueue
+dead_letter_queue = None
+
+
+def get_dead_letter_queue():
+    global dead_letter_queue
+    if dead_letter_queue is None and dead_letter_queue_url:
+        dead_letter_queue = SqsDeadLetterQueue(
+            boto3.client("sqs"), dead_letter_queue_url
+        )
+    return dead_letter_queue
+
+
+def get_dynamodb():
+    global dynamodb
+    if dynamodb is None:
+        dynamodb = boto3.client("dynamodb")
+    return dynamodb
+
+
+def get_personalize_events():
+    global personalize_events, connections
+    if personalize_events is None:
+        personalize_events = boto3.client(
+            service_name="personalize-events",
+            config=client_config(max_pool_connections=1),
+        )
+        connections = ConnectionStats(personalize_events)
+    return personalize_events
 
 
 def lambda_handler(event, context):
@@ -16,81 +87,184 @@ def lambda_handler(event, context):
     # sessionid,
     # animalid,
     # animal_metadata, # for testing at least, and maybe in prod also
-    # eventtype (AIF, favorite, detailview)
+    # eventtype (AIF, favorite, detailview, AvailabilityChange)
+    # available (only for AvailabilityChange events)
     records = event["Records"]
     tracking_id = str(
         ssm.get_parameter(Name=event_tracker_ssm_path)["Parameter"]["Value"]
     )
 
-    for record in records:
+    availability_changes = {}
+    dead_letters = []
+    batch_item_failures = []
+    now = time.time()
 
-        data = record["kinesis"]["data"]
-        decoded_data = base64.b64decode(data)
+    def record_failed(error, positions, reprocessable=True):
+        # returns True when the rest of the batch must be retried
+        if get_dead_letter_queue() is None or is_retryable(error):
+            # lambda retries the batch from this record, bisecting and
+            # sending it to the on-failure queue once retries run out
+            sequence_number = records[positions[0]]["kinesis"]["sequenceNumber"]
+            print(f"Retrying from record {sequence_number}: {error}")
+            batch_item_failures.append({"itemIdentifier": sequence_number})
+            return True
+        for position in positions:
+            record = records[position]
+            print(
+                f"Dead lettering record {record['kinesis']['sequenceNumber']}: {error}"
+            )
+            dead_letters.append(dead_letter_entry(record, error, reprocessable))
+        return False
 
-        deserialized_data = json.loads(decoded_data)
+    prepared = []
+    for position, record in enumerate(records):
+        try:
+            personalize_event = prepare_event(record, now, availability_changes)
+        except Exception as error:
+            # the record cannot be decoded, it fails the same way on every retry
+            if record_failed(error, [position], reprocessable=False):
+                break
+            continue
+        if personalize_event is not None:
+            prepared.append((position, personalize_event))
 
-        print(f"\ndeserialized_data: {deserialized_data}")
+    # in batch order of the first event, so a retry from a failed event also
+    # covers every event after it, lambda retries from the lowest reported one
+    for positions, personalize_event in aggregate_events(prepared, aggregation_mode):
+        try:
+            send_event(tracking_id, personalize_event)
+        except Exception as error:
+            if record_failed(error, positions, not is_invalid_input(error)):
+                break
 
-        timestamp = datetime.datetime.now()
-        userId = None
-        response = []
-        session_id = deserialized_data["sessionId"]
-        event_type = deserialized_data["eventType"]
+    if dead_letters:
+        get_dead_letter_queue().put(dead_letters)
 
-        # expect at least breed, age
-        animal_metadata = deserialized_data["animalMetadata"]
+    if availability_changes:
+        update_availability_index(availability_changes)
 
-        # convert to animal group here
-        # these are properties of the legacy animals table
-        animal_group_id = (
-            str(animal_metadata["animal_species_id"])
-            + "-"
-            + str(animal_metadata["animal_primary_breed_id"])
+    if connections is not None:
+        connections.record(metrics, prefix="PutEvents")
+        metrics.flush()
+
+    return {"batchItemFailures": batch_item_failures}
+
+
+def prepare_event(record, now, availability_changes):
+    """The personalize event of a kinesis record, None if it is not sent."""
+    data = record["kinesis"]["data"]
+    decoded_data = base64.b64decode(data)
+
+    # compact envelope or legacy json
+    deserialized_data = deserialize_record(decoded_data)
+
+    print(f"\ndeserialized_data: {deserialized_data}")
+
+    # honor the producer time so consumer lag and replays keep recency
+    timestamp = event_timestamp(deserialized_data, record["kinesis"], now)
+    userId = None
+    session_id = deserialized_data.get("sessionId")
+    event_type = deserialized_data["eventType"]
+
+    # expect at least breed, age
+    animal_metadata = deserialized_data["animalMetadata"]
+
+    # convert to animal group here
+    # these are properties of the legacy animals table
+    animal_group_id = (
+        str(animal_metadata["animal_species_id"])
+        + "-"
+        + str(animal_metadata["animal_primary_breed_id"])
+        + "-"
+        + str(
+            animal_metadata["animal_size_id"]
             + "-"
-            + str(
-                animal_metadata["animal_size_id"]
-                + "-"
-                + str(animal_metadata["animal_age_id"])
-            )
+            + str(animal_metadata["animal_age_id"])
         )
+    )
 
-        if "userId" in deserialized_data:
-            try:
-                userId = deserialized_data["userId"]
-            except:
-                print(
-                    "Invalid userId, could not parse: ",
-                    deserialized_data["userId"],
-                )
-
-        personalize_events = boto3.client(service_name="personalize-events")
-
-        if userId is not None:
-            response = personalize_events.put_events(
-                trackingId=tracking_id,
-                userId=userId,
-                sessionId=session_id,
-                eventList=[
-                    {
-                        "sentAt": timestamp,
-                        "eventType": event_type,
-                        "itemId": animal_group_id,
-                    }
-                ],
-            )
-            print(f"Authenticated user: {response}")
-        else:
-            response = personalize_events.put_events(
-                trackingId=tracking_id,
-                sessionId=session_id,
-                eventList=[
-                    {
-                        "sentAt": timestamp,
-                        "eventType": event_type,
-                        "itemId": animal_group_id,
-                    }
-                ],
+    if event_type == AVAILABILITY_EVENT_TYPE:
+        # last change in the batch wins, the time orders it against the
+        # changes other shards write. A change without an animal id stands for
+        # the whole animal group
+        animal_id = str(deserialized_data.get("animal_id") or animal_group_id)
+        availability_changes[animal_id] = (
+            animal_group_id,
+            bool(deserialized_data["available"]),
+            timestamp,
+        )
+        return None
+
+    if "userId" in deserialized_data:
+        try:
+            userId = deserialized_data["userId"]
+        except:
+            print(
+                "Invalid userId, could not parse: ",
+                deserialized_data["userId"],
             )
-            print(f"Authenticated user: {response}")
 
-        # print(f"Response: {response}")
+    sent_at = lateness_policy.sent_at(timestamp, now)
+    if sent_at is None:
+        print(f"Late event kept in the archive only: {deserialized_data}")
+        return None
+
+    return {
+        "userId": userId,
+        "sessionId": session_id,
+        "eventType": event_type,
+        "itemId": animal_group_id,
+        "sentAt": sent_at,
+    }
+
+
+def send_event(tracking_id, personalize_event):
+    fingerprint = (
+        personalize_event["sessionId"],
+        personalize_event["userId"],
+        personalize_event["itemId"],
+        personalize_event["eventType"],
+    )
+    if dedup_window is not None and dedup_window.contains(*fingerprint):
+        print(f"Dropping duplicate event: {personalize_event}")
+        return
+
+    personalize_events = get_personalize_events()
+
+    event_entry = {
+        "sentAt": personalize_event["sentAt"],
+        "eventType": personalize_event["eventType"],
+        "itemId": personalize_event["itemId"],
+    }
+    if "eventValue" in personalize_event:
+        event_entry["eventValue"] = personalize_event["eventValue"]
+
+    if personalize_event["userId"] is not None:
+        response = personalize_events.put_events(
+            trackingId=tracking_id,
+            userId=personalize_event["userId"],
+            sessionId=personalize_event["sessionId"],
+            eventList=[event_entry],
+        )
+        print(f"Authenticated user: {response}")
+    else:
+        response = personalize_events.put_events(
+            trackingId=tracking_id,
+            sessionId=personalize_event["sessionId"],
+            eventList=[event_entry],
+        )
+        print(f"Authenticated user: {response}")
+
+    # only remember sent events, a retried record is not a duplicate
+    if dedup_window is not None:
+        dedup_window.add(*fingerprint)
+
+
+def update_availability_index(availability_changes):
+    if not availability_table_name:
+        print("Availability table not configured, dropping availability changes")
+        return
+    written = write_changes(
+        get_dynamodb(), availability_table_name, availability_changes
+    )
+    print(f"Updated availability for {written} animals")
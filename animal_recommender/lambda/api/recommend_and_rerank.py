@@ -0,0 +1,43 @@
+## Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+## SPDX-License-Identifier: MIT-0
+import boto3, os
+
+from embedded_metrics import Metrics
+from hedging import Hedger
+from init_hook import run_init_hook
+from personalize_client import client_config
+from recommendation import RecommendOperation
+from request_coalescing import RequestCoalescer
+from reranking import RerankOperation
+from serving_engine import CampaignResolver, ResponseCache, ServingEngine
+
+metrics = Metrics()
+engine = ServingEngine(
+    CampaignResolver(
+        boto3.client("ssm"), os.environ.get("campaign_arn_refresh_seconds", "300")
+    ),
+    ResponseCache(
+        os.environ.get("response_cache_ttl_seconds", "0"),
+        os.environ.get("response_cache_max_entries", "1000"),
+    ),
+    RequestCoalescer.from_environment(metrics),
+    metrics,
+    client_config=client_config(),
+    hedger=Hedger.from_environment(metrics),
+    deadline_seconds=float(os.environ.get("request_deadline_ms", "2500")) / 1000,
+)
+# recommendations and the reranking of a candidate page in one round trip,
+# both personalize calls run at the same time
+operations = {
+    "recommendations": RecommendOperation.from_environment(),
+    "reranking": RerankOperation.from_environment(),
+}
+
+run_init_hook(*engine.init_steps(*operations.values()))
+
+
+def lambda_handler(event, context):
+
+    print(f"Event: {event}")
+
+    return engine.handle_all(operations, event, context)
@@ -0,0 +1,182 @@
+## Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+## SPDX-License-Identifier: MIT-0
+import os, time
+
+import boto3
+
+from availability_index import load_index
+from circuit_breaker import CircuitBreaker
+from popularity_index import (
+    ALL_SEGMENT,
+    PopularityIndex,
+    load_index as load_popularity_index,
+)
+from request_schema import compile_schema
+from serving_engine import Operation
+
+# personalize caps numResults at 500
+MAX_RESULTS = 500
+DEFAULT_LIMIT = 10
+
+validate_body = compile_schema(
+    {
+        "type": "object",
+        "properties": {
+            "userId": {"type": "string", "minLength": 1, "maxLength": 256},
+            "limit": {"type": "integer", "minimum": 1, "maximum": MAX_RESULTS},
+            "segment": {"type": ["string", "integer"]},
+        },
+    },
+    "recommendation request",
+)
+
+
+class RecommendOperation(Operation):
+    """Recommended animal groups of a user, without the unavailable ones.
+
+    With a breaker the most popular groups of the popularity index are served
+    when personalize throttles, fails or does not answer within
+    latency_budget_seconds.
+    """
+
+    def __init__(
+        self,
+        campaign_ssm_path,
+        s3_client=None,
+        dynamodb_client=None,
+        availability_table_name=None,
+        overfetch_factor=3,
+        refresh_seconds=60,
+        coalescing="none",
+        popularity_bucket_name=None,
+        popularity_index_key=None,
+        breaker=None,
+        latency_budget_seconds=None,
+    ):
+        self.campaign_ssm_path = campaign_ssm_path
+        self.s3 = s3_client
+        self.dynamodb = dynamodb_client
+        self.availability_table_name = availability_table_name
+        self.overfetch_factor = int(overfetch_factor)
+        self.refresh_seconds = float(refresh_seconds)
+        self.coalescing = coalescing
+        self.popularity_bucket_name = popularity_bucket_name
+        self.popularity_index_key = popularity_index_key
+        self.popularity_index = None
+        self.breaker = breaker
+        self.latency_budget_seconds = latency_budget_seconds
+        self.availability_index = None
+        self.availability_loaded_at = 0.0
+
+    @classmethod
+    def from_environment(cls):
+        # the availability index is read by the first request
+        latency_budget_ms = float(
+            os.environ.get("recommendation_latency_budget_ms", "0")
+        )
+        breaker = None
+        if latency_budget_ms:
+            breaker = CircuitBreaker(
+                os.environ.get("circuit_breaker_failure_threshold", "5"),
+                os.environ.get("circuit_breaker_open_seconds", "30"),
+            )
+        return cls(
+            os.environ.get("campaign_arn_ssm_path"),
+            s3_client=boto3.client("s3"),
+            dynamodb_client=boto3.client("dynamodb"),
+            availability_table_name=os.environ.get("availability_table_name"),
+            overfetch_factor=os.environ.get("availability_overfetch_factor", "3"),
+            refresh_seconds=os.environ.get("availability_refresh_seconds", "60"),
+            coalescing=os.environ.get("request_coalescing", "anonymous"),
+            popularity_bucket_name=os.environ.get("popularity_bucket_name"),
+            popularity_index_key=os.environ.get("popularity_index_key"),
+            breaker=breaker,
+            # 0 always waits for personalize, up to the request deadline
+            latency_budget_seconds=(
+                latency_budget_ms / 1000 if latency_budget_ms else None
+            ),
+        )
+
+    def get_availability_index(self):
+        if not self.availability_table_name:
+            return None
+        now = time.monotonic()
+        if (
+            self.availability_index is None
+            or now - self.availability_loaded_at > self.refresh_seconds
+        ):
+            self.availability_index = load_index(
+                self.dynamodb, self.availability_table_name
+            )
+            self.availability_loaded_at = now
+        return self.availability_index
+
+    def get_popularity_index(self):
+        # read once, it only changes with a deploy
+        if self.popularity_index is None:
+            if self.popularity_bucket_name and self.popularity_index_key:
+                self.popularity_index = load_popularity_index(
+                    self.s3, self.popularity_bucket_name, self.popularity_index_key
+                )
+            else:
+                self.popularity_index = PopularityIndex()
+        return self.popularity_index
+
+    def warm_up(self):
+        self.get_availability_index()
+        if self.breaker is not None:
+            self.get_popularity_index()
+
+    def validate(self, body):
+        validate_body(body)
+        # general recommendations without a userId, the segment only picks
+        # the popularity fallback
+        return {
+            "userId": body.get("userId", "unknown"),
+            "limit": body.get("limit", DEFAULT_LIMIT),
+            "segment": str(body.get("segment", ALL_SEGMENT)),
+        }
+
+    def cache_key(self, campaign_arn, request):
+        return ("recommend", campaign_arn, request["userId"], request["limit"])
+
+    def coalesces(self, request):
+        # anonymous requests are the ones that arrive in bursts, like a home page
+        if self.coalescing == "anonymous":
+            return request["userId"] == "unknown"
+        return self.coalescing == "all"
+
+    def num_results(self, request):
+        index = self.get_availability_index()
+        if index is not None and index.unavailable():
+            # over-fetch once so that filtered results can still fill the limit
+            return min(request["limit"] * self.overfetch_factor, MAX_RESULTS)
+        return request["limit"]
+
+    def call(self, personalize_runtime, campaign_arn, request):
+        num_results = self.num_results(request)
+        response = personalize_runtime.get_recommendations(
+            campaignArn=campaign_arn,
+            userId=request["userId"],
+            numResults=num_results,
+        )
+        print(f"response {response}")
+        return response
+
+    def fallback(self, request):
+        item_ids = self.get_popularity_index().top(
+            self.num_results(request), request["segment"]
+        )
+        return {"itemList": [{"itemId": item_id} for item_id in item_ids]}
+
+    def post_process(self, request, response):
+        item_ids = []
+        for item in response["itemList"]:
+            if "itemId" in item:
+                item_ids.append(item["itemId"])
+            else:
+                print("Found malformed item, discarding: ", item)
+        index = self.get_availability_index()
+        if index is not None:
+            item_ids = index.filter_available(item_ids)
+        return [{"id": item_id} for item_id in item_ids[: request["limit"]]]
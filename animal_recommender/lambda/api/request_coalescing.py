@@ -0,0 +1,179 @@
+## Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+## SPDX-License-Identifier: MIT-0
+import json, os, time
+
+import boto3
+from botocore.exceptions import BotoCoreError, ClientError
+
+# a leader that has not written its response after this long is presumed
+# failed, the next request takes the key over
+LEASE_SECONDS = 3
+# expired items are removed by the table ttl, the expiry is also checked on read
+CLEANUP_SECONDS = 60
+COALESCING_MODES = ("anonymous", "all", "none")
+
+
+class RequestCoalescer:
+    """Concurrent identical requests of different lambda environments share one
+    personalize call.
+
+    A lambda environment serves one request at a time, so identical requests
+    that arrive together run in different environments. The first one takes a
+    lease on the request key with a conditional put and calls personalize; the
+    others poll the table for the response it writes, for up to wait_seconds,
+    and call personalize themselves if it does not come. A written response is
+    shared for share_seconds. When the table cannot be read or written the
+    request calls personalize without coalescing.
+    """
+
+    def __init__(
+        self,
+        table_name,
+        metrics,
+        wait_seconds=0.3,
+        share_seconds=1,
+        poll_seconds=0.02,
+        dynamodb_client=None,
+    ):
+        self.table_name = table_name
+        self.metrics = metrics
+        self.wait_seconds = float(wait_seconds)
+        self.share_seconds = float(share_seconds)
+        self.poll_seconds = float(poll_seconds)
+        self.dynamodb = dynamodb_client
+
+    @classmethod
+    def from_environment(cls, metrics):
+        """The coalescer of the lambda, None when coalescing is turned off."""
+        table_name = os.environ.get("coalescing_table_name")
+        mode = os.environ.get("request_coalescing", "anonymous")
+        if mode not in COALESCING_MODES:
+            raise ValueError(f"Unknown request coalescing mode {mode}")
+        if not table_name or mode == "none":
+            return None
+        return cls(
+            table_name,
+            metrics,
+            wait_seconds=float(os.environ.get("request_coalescing_wait_ms", "300"))
+            / 1000,
+            share_seconds=os.environ.get("request_coalescing_share_seconds", "1"),
+        )
+
+    def client(self):
+        # created on first use, only requests that coalesce need it
+        if self.dynamodb is None:
+            self.dynamodb = boto3.client("dynamodb")
+        return self.dynamodb
+
+    def fetch(self, key, call):
+        """The response of call() for key, from the environment that calls it."""
+        key = json.dumps(key)
+        try:
+            response = self.shared_response(key)
+            leader = response is None and self.take_lease(key)
+        except (BotoCoreError, ClientError) as e:
+            return self.call_uncoalesced(call, e)
+        if response is not None:
+            self.metrics.count("CoalescedRequests")
+            return response
+        if leader:
+            self.metrics.count("CoalescingLeaderCalls")
+            try:
+                response = call()
+            except Exception:
+                self.release(key)
+                raise
+            try:
+                self.share(key, response)
+            except (BotoCoreError, ClientError) as e:
+                # the waiters call personalize themselves when their wait ends
+                print(f"Could not share coalesced response {key}: {e}")
+            return response
+        try:
+            response = self.wait(key)
+        except (BotoCoreError, ClientError) as e:
+            return self.call_uncoalesced(call, e)
+        if response is not None:
+            self.metrics.count("CoalescedRequests")
+            return response
+        self.metrics.count("CoalescingWaitTimeouts")
+        return call()
+
+    def call_uncoalesced(self, call, error):
+        # the table only saves personalize calls, its errors must not fail
+        # the request
+        print(f"Request coalescing failed, calling personalize: {error}")
+        self.metrics.count("CoalescingErrors")
+        return call()
+
+    def read(self, key):
+        return (
+            self.client()
+            .get_item(
+                TableName=self.table_name,
+                Key={"key": {"S": key}},
+                ConsistentRead=True,
+            )
+            .get("Item")
+        )
+
+    def shared_response(self, key):
+        item = self.read(key)
+        if item is None or "response" not in item:
+            return None
+        if float(item["expires_at"]["N"]) < time.time():
+            return None
+        return json.loads(item["response"]["S"])
+
+    def take_lease(self, key):
+        now = time.time()
+        try:
+            self.client().put_item(
+                TableName=self.table_name,
+                Item={
+                    "key": {"S": key},
+                    "expires_at": {"N": f"{now + LEASE_SECONDS}"},
+                    "ttl": {"N": f"{int(now) + CLEANUP_SECONDS}"},
+                },
+                ConditionExpression="attribute_not_exists(#key) OR expires_at < :now",
+                ExpressionAttributeNames={"#key": "key"},
+                ExpressionAttributeValues={":now": {"N": f"{now}"}},
+            )
+        except ClientError as e:
+            if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
+                return False
+            raise
+        return True
+
+    def share(self, key, response):
+        now = time.time()
+        self.client().put_item(
+            TableName=self.table_name,
+            Item={
+                "key": {"S": key},
+                "response": {"S": json.dumps(response)},
+                "expires_at": {"N": f"{now + self.share_seconds}"},
+                "ttl": {"N": f"{int(now) + CLEANUP_SECONDS}"},
+            },
+        )
+
+    def release(self, key):
+        # waiters stop waiting for a leader that failed
+        try:
+            self.client().delete_item(
+                TableName=self.table_name, Key={"key": {"S": key}}
+            )
+        except (BotoCoreError, ClientError) as e:
+            print(f"Could not release coalescing lease {key}: {e}")
+
+    def wait(self, key):
+        deadline = time.monotonic() + self.wait_seconds
+        while time.monotonic() < deadline:
+            time.sleep(self.poll_seconds)
+            item = self.read(key)
+            if item is None:
+                # the leader failed
+                return None
+            if "response" in item:
+                return json.loads(item["response"]["S"])
+        return None
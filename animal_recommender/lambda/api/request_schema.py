@@ -0,0 +1,113 @@
+## Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+## SPDX-License-Identifier: MIT-0
+from serving_engine import RequestError
+
+# checks of the json schema types, bool is not an integer here
+TYPE_CHECKS = {
+    "string": "type({value}) is str",
+    "integer": "type({value}) is int",
+    "number": "type({value}) in (int, float)",
+    "boolean": "type({value}) is bool",
+    "object": "type({value}) is dict",
+    "array": "type({value}) is list",
+}
+TYPE_NAMES = {
+    "string": "a string",
+    "integer": "an integer",
+    "number": "a number",
+    "boolean": "a boolean",
+    "object": "an object",
+    "array": "an array",
+}
+
+
+def compile_schema(schema, name):
+    """A function that raises RequestError for bodies that do not match schema.
+
+    The schema is a subset of json schema: type (one or a list of them),
+    properties, required, items, minimum, maximum, minItems, maxItems,
+    minLength and maxLength. It is compiled to the python source of one
+    function when the module is imported, so validating a request runs
+    straight-line checks instead of walking the schema for every item.
+    """
+    compiler = SchemaCompiler(name)
+    compiler.emit(schema, "body", [], 1)
+    lines = compiler.lines or ["    pass"]
+    source = "def validate(body):\n" + "\n".join(lines) + "\n"
+    namespace = {"RequestError": RequestError}
+    exec(compile(source, f"<{name} schema>", "exec"), namespace)
+    validate = namespace["validate"]
+    validate.source = source
+    return validate
+
+
+class SchemaCompiler:
+    def __init__(self, name):
+        self.name = name
+        self.lines = []
+        self.variables = 0
+
+    def variable(self, prefix):
+        self.variables += 1
+        return f"{prefix}{self.variables}"
+
+    def line(self, indent, text):
+        self.lines.append("    " * indent + text)
+
+    def fail(self, indent, path, problem):
+        """Raise with the path of the value, array indexes are filled in."""
+        where = "".join(
+            part if isinstance(part, str) else f"[{{{part[0]}}}]" for part in path
+        ).lstrip(".")
+        message = f"Invalid {self.name}, {where or 'body'} {problem}"
+        self.line(indent, f"raise RequestError(f{message!r})")
+
+    def emit(self, schema, value, path, indent):
+        types = schema.get("type")
+        if types is not None:
+            types = [types] if isinstance(types, str) else types
+            check = " or ".join(TYPE_CHECKS[t].format(value=value) for t in types)
+            self.line(indent, f"if not ({check}):")
+            self.fail(
+                indent + 1, path, "must be " + " or ".join(TYPE_NAMES[t] for t in types)
+            )
+        for keyword, operator, problem in (
+            ("minimum", "<", "must be at least"),
+            ("maximum", ">", "must be at most"),
+        ):
+            if keyword in schema:
+                self.line(indent, f"if {value} {operator} {schema[keyword]!r}:")
+                self.fail(indent + 1, path, f"{problem} {schema[keyword]}")
+        for keyword, operator, problem in (
+            ("minItems", "<", "needs at least {} items"),
+            ("maxItems", ">", "allows at most {} items"),
+            ("minLength", "<", "needs at least {} characters"),
+            ("maxLength", ">", "allows at most {} characters"),
+        ):
+            if keyword in schema:
+                self.line(indent, f"if len({value}) {operator} {schema[keyword]}:")
+                self.fail(indent + 1, path, problem.format(schema[keyword]))
+        required = schema.get("required", [])
+        for key, property_schema in schema.get("properties", {}).items():
+            property_path = path + [f".{key}"]
+            property_value = self.variable("v")
+            if key in required:
+                self.line(indent, f"if {key!r} not in {value}:")
+                self.fail(indent + 1, property_path, "is missing")
+                self.line(indent, f"{property_value} = {value}[{key!r}]")
+                self.emit(property_schema, property_value, property_path, indent)
+            else:
+                self.line(indent, f"if {key!r} in {value}:")
+                self.line(indent + 1, f"{property_value} = {value}[{key!r}]")
+                self.emit(property_schema, property_value, property_path, indent + 1)
+        for key in required:
+            if key not in schema.get("properties", {}):
+                self.line(indent, f"if {key!r} not in {value}:")
+                self.fail(indent + 1, path + [f".{key}"], "is missing")
+        if "items" in schema:
+            index, item = self.variable("i"), self.variable("v")
+            self.line(indent, f"for {index}, {item} in enumerate({value}):")
+            lines = len(self.lines)
+            self.emit(schema["items"], item, path + [(index,)], indent + 1)
+            if len(self.lines) == lines:
+                self.line(indent + 1, "pass")
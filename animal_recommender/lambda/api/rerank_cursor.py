@@ -0,0 +1,117 @@
+## Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+## SPDX-License-Identifier: MIT-0
+import base64, binascii, json, time, uuid, zlib
+
+# dynamodb items are at most 400 KB, with room for the other attributes
+MAX_PART_BYTES = 350 * 1024
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def encode_cursor(token, offset):
+    return base64.urlsafe_b64encode(f"{token}:{offset}".encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor):
+    try:
+        token, offset = (
+            base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split(":")
+        )
+        offset = int(offset)
+    except (AttributeError, ValueError, UnicodeError, binascii.Error):
+        raise InvalidCursor(f"Invalid cursor: {cursor}")
+    # a negative offset would slice from the end of the ranking
+    if offset < 0:
+        raise InvalidCursor(f"Invalid cursor: {cursor}")
+    return token, offset
+
+
+class CursorStore:
+    """Caches ranked orderings in dynamodb so later pages are served without personalize.
+
+    Items expire through the table ttl attribute, expires_at is also checked on read
+    because dynamodb deletes expired items lazily.
+
+    The ranking is stored zlib compressed. A ranking that is still larger than
+    max_part_bytes is split, the cursor item holds the first part and the
+    number of parts, the others are items of their own keyed token.1, token.2
+    and so on. They are written before the cursor item, so a cursor that can
+    be read has all of its parts.
+    """
+
+    def __init__(
+        self, dynamodb_client, table_name, ttl_seconds, max_part_bytes=MAX_PART_BYTES
+    ):
+        self.dynamodb = dynamodb_client
+        self.table_name = table_name
+        self.ttl_seconds = int(ttl_seconds)
+        self.max_part_bytes = int(max_part_bytes)
+
+    def put(self, user_id, ranking):
+        token = uuid.uuid4().hex
+        data = zlib.compress(json.dumps(ranking).encode("utf-8"))
+        parts = [
+            data[start : start + self.max_part_bytes]
+            for start in range(0, len(data), self.max_part_bytes)
+        ]
+        expires_at = {"N": str(int(time.time()) + self.ttl_seconds)}
+        for number, part in enumerate(parts[1:], start=1):
+            self.dynamodb.put_item(
+                TableName=self.table_name,
+                Item={
+                    "cursor": {"S": f"{token}.{number}"},
+                    "ranking": {"B": part},
+                    "expires_at": expires_at,
+                },
+            )
+        self.dynamodb.put_item(
+            TableName=self.table_name,
+            Item={
+                "cursor": {"S": token},
+                "user_id": {"S": str(user_id)},
+                "ranking": {"B": parts[0]},
+                "parts": {"N": str(len(parts))},
+                "expires_at": expires_at,
+            },
+        )
+        return token
+
+    def get(self, token, user_id):
+        response = self.dynamodb.get_item(
+            TableName=self.table_name,
+            Key={"cursor": {"S": token}},
+        )
+        item = response.get("Item")
+        if item is None or int(item["expires_at"]["N"]) < time.time():
+            raise InvalidCursor("Cursor expired")
+        # parts have no user, so they cannot be read as a cursor either
+        if item.get("user_id", {}).get("S") != str(user_id):
+            raise InvalidCursor("Cursor does not belong to user")
+        data = item["ranking"]["B"]
+        for number in range(1, int(item["parts"]["N"])):
+            part = self.dynamodb.get_item(
+                TableName=self.table_name,
+                Key={"cursor": {"S": f"{token}.{number}"}},
+            ).get("Item")
+            if part is None:
+                raise InvalidCursor("Cursor expired")
+            data += part["ranking"]["B"]
+        return json.loads(zlib.decompress(data))
+
+    def first_page(self, user_id, ranking, limit):
+        """Return the first page and the cursor of the next page, caching only if there is one."""
+        if len(ranking) <= limit:
+            return ranking, None
+        token = self.put(user_id, ranking)
+        return ranking[:limit], encode_cursor(token, limit)
+
+    def next_page(self, cursor, user_id, limit):
+        token, offset = decode_cursor(cursor)
+        ranking = self.get(token, user_id)
+        page = ranking[offset : offset + limit]
+        next_cursor = None
+        if offset + limit < len(ranking):
+            next_cursor = encode_cursor(token, offset + limit)
+        return page, next_cursor
@@ -0,0 +1,248 @@
+## Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+## SPDX-License-Identifier: MIT-0
+from collections import defaultdict
+from itertools import islice
+import os
+
+import boto3
+
+from group_expansion import GroupExpander
+from request_schema import compile_schema
+from rerank_cursor import CursorStore, InvalidCursor
+from serving_engine import Operation, RequestError
+
+# page size for cursor requests that leave out limit
+DEFAULT_PAGE_SIZE = 25
+MAX_CANDIDATES = 10000
+GROUP_FIELDS = (
+    "animal_species_id",
+    "animal_primary_breed_id",
+    "animal_size_id",
+    "animal_age_id",
+)
+USER_ID = {"type": "string", "minLength": 1, "maxLength": 256}
+PAGE_SIZE = {"type": "integer", "minimum": 1}
+
+validate_list_body = compile_schema(
+    {
+        "type": "object",
+        "required": ["userId", "itemMetadataList"],
+        "properties": {
+            "userId": USER_ID,
+            "limit": PAGE_SIZE,
+            "itemMetadataList": {
+                "type": "array",
+                "maxItems": MAX_CANDIDATES,
+                "items": {
+                    "type": "object",
+                    "required": ["itemId", "animalMetadata"],
+                    "properties": {
+                        "itemId": {"type": ["string", "integer"]},
+                        "animalMetadata": {
+                            "type": "object",
+                            "required": list(GROUP_FIELDS),
+                            "properties": {
+                                field: {"type": ["string", "integer"]}
+                                for field in GROUP_FIELDS
+                            },
+                        },
+                    },
+                },
+            },
+        },
+    },
+    "reranking request",
+)
+validate_cursor_body = compile_schema(
+    {
+        "type": "object",
+        "required": ["userId", "cursor"],
+        "properties": {
+            "userId": USER_ID,
+            "limit": PAGE_SIZE,
+            "cursor": {"type": "string", "maxLength": 1024},
+        },
+    },
+    "reranking request",
+)
+
+
+def group_id_from_metadata(animal_metadata):
+    # the schema allows integer ids, formatting turns them into strings
+    return (
+        f"{animal_metadata['animal_species_id']}-"
+        f"{animal_metadata['animal_primary_breed_id']}-"
+        f"{animal_metadata['animal_size_id']}-"
+        f"{animal_metadata['animal_age_id']}"
+    )
+
+
+class RerankOperation(Operation):
+    """Items of a user ordered by the personalize ranking of their animal groups.
+
+    The post ranking and cursor clients are created on first use, so they do
+    not add to the cold start of containers that never run those stages.
+    """
+
+    def __init__(
+        self,
+        campaign_ssm_path,
+        group_expander,
+        post_ranking_enabled=False,
+        post_ranking_settings=None,
+        catalog_bucket_name=None,
+        catalog_items_key=None,
+        cursor_table_name=None,
+        cursor_ttl_seconds=900,
+    ):
+        self.campaign_ssm_path = campaign_ssm_path
+        self.group_expander = group_expander
+        self.post_ranking_enabled = post_ranking_enabled
+        self.post_ranking_settings = post_ranking_settings or {}
+        self.catalog_bucket_name = catalog_bucket_name
+        self.catalog_items_key = catalog_items_key
+        self.cursor_table_name = cursor_table_name
+        self.cursor_ttl_seconds = cursor_ttl_seconds
+        self.cursor_store = None
+        self.post_ranker = None
+
+    @classmethod
+    def from_environment(cls):
+        return cls(
+            os.environ.get("reranking_campaign_arn_ssm_path"),
+            GroupExpander(
+                strategy=os.environ.get("group_expansion_strategy", "concatenate"),
+                signal_key=os.environ.get("group_expansion_signal"),
+                descending=os.environ.get("group_expansion_signal_descending")
+                == "True",
+            ),
+            post_ranking_enabled=os.environ.get("post_ranking_enabled") == "True",
+            post_ranking_settings=dict(
+                personalize_weight=os.environ.get(
+                    "post_ranking_personalize_weight", "1.0"
+                ),
+                item_value_weight=os.environ.get(
+                    "post_ranking_item_value_weight", "0.0"
+                ),
+                waiting_weight=os.environ.get("post_ranking_waiting_weight", "0.0"),
+                max_waiting_days=os.environ.get("post_ranking_max_waiting_days", "365"),
+                max_per_breed=os.environ.get("post_ranking_max_per_breed", "0"),
+            ),
+            catalog_bucket_name=os.environ.get("catalog_bucket_name"),
+            catalog_items_key=os.environ.get("catalog_items_key"),
+            cursor_table_name=os.environ.get("cursor_table_name"),
+            cursor_ttl_seconds=os.environ.get("cursor_ttl_seconds", "900"),
+        )
+
+    def get_cursor_store(self):
+        if self.cursor_store is None and self.cursor_table_name:
+            self.cursor_store = CursorStore(
+                boto3.client("dynamodb"),
+                self.cursor_table_name,
+                self.cursor_ttl_seconds,
+            )
+        return self.cursor_store
+
+    def get_post_ranker(self):
+        if self.post_ranker is None:
+            from post_ranking import PostRanker, load_item_values
+
+            item_values = {}
+            if self.catalog_bucket_name and self.catalog_items_key:
+                item_values = load_item_values(
+                    boto3.client("s3"), self.catalog_bucket_name, self.catalog_items_key
+                )
+            self.post_ranker = PostRanker(
+                item_values=item_values, **self.post_ranking_settings
+            )
+        return self.post_ranker
+
+    def warm_up(self):
+        # the catalog of the post ranker is loaded before the first request
+        if self.post_ranking_enabled:
+            self.get_post_ranker()
+        self.get_cursor_store()
+
+    def validate(self, body):
+        # optional page size, only the first page of the expansion is
+        # materialized unless a cursor is issued for the following pages
+        if isinstance(body, dict) and "cursor" in body:
+            validate_cursor_body(body)
+            return {
+                "cursor": body["cursor"],
+                "userId": body["userId"],
+                "limit": body.get("limit"),
+            }
+        validate_list_body(body)
+        id_group_pairs = [
+            (
+                item_meta["itemId"],
+                group_id_from_metadata(item_meta["animalMetadata"]),
+                item_meta["animalMetadata"],
+            )
+            for item_meta in body["itemMetadataList"]
+        ]
+        return {
+            "userId": body["userId"],
+            "limit": body.get("limit"),
+            "id_group_pairs": id_group_pairs,
+        }
+
+    def answers_locally(self, request):
+        return "cursor" in request
+
+    def answer_locally(self, request):
+        # later pages are sliced from the cached ordering, personalize is not called
+        store = self.get_cursor_store()
+        if store is None:
+            raise RequestError("Cursors disabled")
+        try:
+            page, next_cursor = store.next_page(
+                request["cursor"],
+                request["userId"],
+                request["limit"] or DEFAULT_PAGE_SIZE,
+            )
+        except InvalidCursor as e:
+            raise RequestError(str(e))
+        return {"ranking": page, "cursor": next_cursor}
+
+    def call(self, personalize_runtime, campaign_arn, request):
+        input_list = list(set(pair[1] for pair in request["id_group_pairs"]))
+        return personalize_runtime.get_personalized_ranking(
+            campaignArn=campaign_arn, inputList=input_list, userId=request["userId"]
+        )
+
+    def post_process(self, request, response):
+        id_group_pairs = request["id_group_pairs"]
+        limit = request["limit"]
+        store = self.get_cursor_store() if limit else None
+        paginate = store is not None
+
+        group_scores = {
+            item_dict["itemId"]: item_dict.get("score", 0.0)
+            for item_dict in response["personalizedRanking"]
+        }
+        if self.post_ranking_enabled:
+            ranked_items = self.get_post_ranker().rank(id_group_pairs, group_scores)
+            if limit and not paginate:
+                ranked_items = ranked_items[:limit]
+        else:
+            inverse_mapping = defaultdict(list)
+            for item_id, group_id, animal_metadata in id_group_pairs:
+                inverse_mapping[group_id].append((item_id, animal_metadata))
+            reranking = [
+                item_dict["itemId"] for item_dict in response["personalizedRanking"]
+            ]
+            expansion = self.group_expander.expand(
+                reranking, inverse_mapping, group_scores
+            )
+            if limit and not paginate:
+                expansion = islice(expansion, limit)
+            ranked_items = list(expansion)
+
+        result = {"ranking": ranked_items, "personalizeResponse": response}
+        if paginate:
+            result["ranking"], result["cursor"] = store.first_page(
+                request["userId"], ranked_items, limit
+            )
+        return result
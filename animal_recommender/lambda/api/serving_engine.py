@@ -0,0 +1,396 @@
+## Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+## SPDX-License-Identifier: MIT-0
+import asyncio, json, time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+import boto3
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError
+
+from embedded_metrics import Metrics
+from personalize_client import ConnectionStats
+
+
+class RequestError(Exception):
+    """A request the pipeline rejects, answered with a 400."""
+
+
+class DeadlineExceeded(Exception):
+    """A request that ran out of time, answered with a 504."""
+
+
+class Deadline:
+    """Time left for a request, None without a deadline."""
+
+    def __init__(self, seconds=None, clock=time.monotonic):
+        self.clock = clock
+        self.expires_at = None if seconds is None else clock() + seconds
+
+    @classmethod
+    def of(cls, seconds=None, context=None, margin_seconds=0.1):
+        """The deadline of a request, at most seconds and never later than
+        margin_seconds before the lambda times out."""
+        if context is not None:
+            remaining = context.get_remaining_time_in_millis() / 1000 - margin_seconds
+            seconds = remaining if seconds is None else min(seconds, remaining)
+        return cls(seconds)
+
+    def remaining(self):
+        if self.expires_at is None:
+            return None
+        return max(self.expires_at - self.clock(), 0.0)
+
+    def cap(self, seconds):
+        """The shorter of seconds and the remaining time, None when both are."""
+        remaining = self.remaining()
+        if seconds is None or remaining is None:
+            return remaining if seconds is None else seconds
+        return min(seconds, remaining)
+
+    def check(self, stage):
+        if self.remaining() == 0.0:
+            raise DeadlineExceeded(f"Deadline exceeded before {stage}")
+
+
+class CampaignResolver:
+    """Campaign arns read from ssm, read again after refresh_seconds.
+
+    The campaign arn only changes when the campaign is created again.
+    """
+
+    def __init__(self, ssm_client, refresh_seconds=300):
+        self.ssm = ssm_client
+        self.refresh_seconds = float(refresh_seconds)
+        self.arns = {}
+
+    def resolve(self, ssm_path):
+        now = time.monotonic()
+        cached = self.arns.get(ssm_path)
+        if cached is None or now - cached[1] > self.refresh_seconds:
+            arn = str(self.ssm.get_parameter(Name=ssm_path)["Parameter"]["Value"])
+            cached = self.arns[ssm_path] = (arn, now)
+        return cached[0]
+
+
+class ResponseCache:
+    """Personalize responses kept by the container for ttl_seconds, 0 disables it.
+
+    The least recently used entry is evicted once max_entries is reached.
+    Only the event loop thread uses the cache, so it needs no lock.
+    """
+
+    def __init__(self, ttl_seconds=0, max_entries=1000):
+        self.ttl_seconds = float(ttl_seconds)
+        self.max_entries = int(max_entries)
+        self.entries = OrderedDict()
+
+    def get(self, key):
+        if not self.ttl_seconds:
+            return None
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at < time.monotonic():
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        if not self.ttl_seconds:
+            return
+        self.entries[key] = (value, time.monotonic() + self.ttl_seconds)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+
+class Operation:
+    """A serving call, the stages of the pipeline that differ between calls."""
+
+    # ssm parameter with the arn of the campaign the operation calls
+    campaign_ssm_path = None
+    # circuit breaker of the personalize call, None to always wait for it
+    breaker = None
+    latency_budget_seconds = None
+
+    def validate(self, body):
+        """The request of a body, raises RequestError for malformed bodies."""
+        return body
+
+    def answers_locally(self, request):
+        """True for requests answered without personalize, like a cursor page."""
+        return False
+
+    def answer_locally(self, request):
+        raise NotImplementedError
+
+    def cache_key(self, campaign_arn, request):
+        """Key of the response in the response cache, None to not cache it."""
+        return None
+
+    def coalesces(self, request):
+        """True to share the personalize call of the request with identical
+        requests that other containers serve at the same time."""
+        return False
+
+    def call(self, personalize_runtime, campaign_arn, request):
+        raise NotImplementedError
+
+    def fallback(self, request):
+        """Response served instead of the personalize response when the call
+        fails, runs over the latency budget or the breaker is open."""
+        raise NotImplementedError
+
+    def post_process(self, request, response):
+        return response
+
+    def warm_up(self):
+        """Load what the operation caches, run by the init hook."""
+
+
+class ServingEngine:
+    """Runs requests through validate, resolve campaign, cache lookup,
+    personalize call, post-process and serialize.
+
+    The stages that block on AWS calls run in a thread pool, so several
+    operations of one request run concurrently on the event loop. Operations
+    with a circuit breaker are answered with their fallback when personalize
+    fails or runs over the latency budget, fallbacks are not cached.
+
+    Every stage checks the deadline of the request, deadline_seconds and the
+    remaining time of the lambda, and the personalize call is waited for until
+    the deadline at most. A hedger duplicates slow personalize calls.
+    """
+
+    def __init__(
+        self,
+        campaigns,
+        cache=None,
+        coalescer=None,
+        metrics=None,
+        max_workers=4,
+        client_config=None,
+        hedger=None,
+        deadline_seconds=None,
+    ):
+        self.campaigns = campaigns
+        self.cache = cache or ResponseCache()
+        self.coalescer = coalescer
+        self.metrics = metrics or Metrics()
+        self.max_workers = max_workers
+        self.client_config = client_config
+        self.hedger = hedger
+        self.deadline_seconds = (
+            None if deadline_seconds is None else float(deadline_seconds)
+        )
+        self.executor = ThreadPoolExecutor(max_workers)
+        # personalize calls waited for with a latency budget, a call that runs
+        # over it finishes in the background
+        self.budgeted_calls = ThreadPoolExecutor(max_workers)
+        self.loop = asyncio.new_event_loop()
+        self.runtime = None
+        self.connections = None
+
+    def personalize_runtime(self):
+        # one client for the life of the container, its pool keeps the
+        # connections to personalize open between invocations
+        if self.runtime is None:
+            config = Config(max_pool_connections=self.max_concurrent_calls())
+            if self.client_config is not None:
+                config = self.client_config.merge(config)
+            self.runtime = boto3.client(
+                service_name="personalize-runtime", config=config
+            )
+            self.connections = ConnectionStats(self.runtime)
+        return self.runtime
+
+    def max_concurrent_calls(self):
+        """Personalize calls that can run at the same time, the size of the
+        connection pool."""
+        if self.hedger is not None:
+            return self.hedger.max_workers
+        return self.max_workers
+
+    def init_steps(self, *operations):
+        """Steps for the init hook that fill the caches of the operations."""
+
+        def resolve_campaigns():
+            for operation in operations:
+                self.campaigns.resolve(operation.campaign_ssm_path)
+
+        return [resolve_campaigns, self.personalize_runtime] + [
+            operation.warm_up for operation in operations
+        ]
+
+    def call(self, operation, campaign_arn, request):
+        if self.hedger is None:
+            return operation.call(self.personalize_runtime(), campaign_arn, request)
+        return self.hedger.call(
+            operation.campaign_ssm_path,
+            operation.call,
+            self.personalize_runtime(),
+            campaign_arn,
+            request,
+        )
+
+    def fetch(self, operation, campaign_arn, request, key):
+        """Personalize response of a request that is not in the response cache,
+        coalesced with the other containers when the operation allows it."""
+        if self.coalescer is None or key is None or not operation.coalesces(request):
+            return self.call(operation, campaign_arn, request)
+        return self.coalescer.fetch(
+            key, lambda: self.call(operation, campaign_arn, request)
+        )
+
+    def fetch_within_budget(self, operation, campaign_arn, request, key, deadline):
+        """(response, degraded), the fallback response is degraded."""
+        breaker = operation.breaker
+        if breaker is not None and not breaker.allows():
+            return self.degrade(operation, request, "CircuitOpenFallbacks")
+        budget = deadline.cap(operation.latency_budget_seconds)
+        try:
+            if budget is None:
+                response = self.fetch(operation, campaign_arn, request, key)
+            else:
+                response = self.budgeted_calls.submit(
+                    self.fetch, operation, campaign_arn, request, key
+                ).result(timeout=budget)
+        except TimeoutError:
+            if breaker is None:
+                self.metrics.count("DeadlineExceeded")
+                raise DeadlineExceeded("Personalize did not answer before the deadline")
+            breaker.record_failure()
+            return self.degrade(operation, request, "LatencyBudgetFallbacks")
+        except (BotoCoreError, ClientError) as e:
+            if breaker is None:
+                raise
+            print(f"Personalize call failed, serving the fallback: {e}")
+            breaker.record_failure()
+            return self.degrade(operation, request, "ErrorFallbacks")
+        except Exception:
+            # any other error still ends the call as a failure, a half open
+            # breaker would otherwise wait for its trial call forever
+            if breaker is not None:
+                breaker.record_failure()
+            raise
+        if breaker is not None:
+            breaker.record_success()
+        return response, False
+
+    def degrade(self, operation, request, reason):
+        self.metrics.count(reason)
+        return operation.fallback(request), True
+
+    async def offloaded(self, function, *args):
+        return await self.loop.run_in_executor(self.executor, function, *args)
+
+    async def inline(self, function, *args):
+        return function(*args)
+
+    async def run(self, operation, body, deadline=None, offload=False):
+        """Result of one operation. The blocking stages are offloaded to the
+        thread pool when other operations run at the same time, a single
+        operation runs them inline to save the thread hand-offs."""
+        blocking = self.offloaded if offload else self.inline
+        deadline = deadline or Deadline()
+        request = operation.validate(body)
+        if operation.answers_locally(request):
+            deadline.check("answer locally")
+            return await blocking(operation.answer_locally, request)
+        deadline.check("resolve campaign")
+        campaign_arn = await blocking(
+            self.campaigns.resolve, operation.campaign_ssm_path
+        )
+        key = operation.cache_key(campaign_arn, request)
+        response = None if key is None else self.cache.get(key)
+        if response is None:
+            deadline.check("personalize call")
+            response, degraded = await blocking(
+                self.fetch_within_budget,
+                operation,
+                campaign_arn,
+                request,
+                key,
+                deadline,
+            )
+            if key is not None and not degraded:
+                self.cache.put(key, response)
+        else:
+            self.metrics.count("ResponseCacheHits")
+        deadline.check("post process")
+        return await blocking(operation.post_process, request, response)
+
+    async def run_all(self, operations, bodies, deadline=None):
+        results = await asyncio.gather(
+            *(
+                self.run(operation, bodies[name], deadline, offload=True)
+                for name, operation in operations.items()
+            )
+        )
+        return dict(zip(operations, results))
+
+    def deadline(self, context):
+        return Deadline.of(self.deadline_seconds, context)
+
+    def handle(self, operation, event, context=None):
+        """Lambda response of a request for one operation."""
+        try:
+            body = body_of(event)
+        except RequestError as e:
+            return error_response(str(e))
+        return self.respond(self.run(operation, body, self.deadline(context)))
+
+    def handle_all(self, operations, event, context=None):
+        """Lambda response of a request for several operations, keyed by their
+        names. The body of each operation is the field of the request body
+        with its name, the userId of the request is used when it has none."""
+        try:
+            body = body_of(event)
+        except RequestError as e:
+            return error_response(str(e))
+        bodies = {}
+        for name in operations:
+            operation_body = body.get(name)
+            if not isinstance(operation_body, dict):
+                return error_response(f"Missing {name} request")
+            bodies[name] = dict(operation_body)
+            if "userId" in body:
+                bodies[name].setdefault("userId", body["userId"])
+        return self.respond(self.run_all(operations, bodies, self.deadline(context)))
+
+    def respond(self, coroutine):
+        try:
+            result = self.loop.run_until_complete(coroutine)
+        except RequestError as e:
+            print(e)
+            return error_response(str(e))
+        except DeadlineExceeded as e:
+            print(e)
+            return error_response(str(e), 504)
+        finally:
+            if self.connections is not None:
+                self.connections.record(self.metrics)
+            self.metrics.flush()
+        data = json.dumps(result)
+        print(data)
+        return {"statusCode": 200, "body": data}
+
+
+def body_of(event):
+    """The request body, api gateway proxy integrations pass it as json text."""
+    body = event.get("body")
+    if isinstance(body, str):
+        try:
+            body = json.loads(body)
+        except ValueError:
+            raise RequestError("Request body is not json")
+    if not isinstance(body, dict):
+        raise RequestError("Request body must be an object")
+    return body
+
+
+def error_response(message, status_code=400):
+    return {"statusCode": status_code, "body": json.dumps({"error": message})}
@@ -0,0 +1,215 @@
+## Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+## SPDX-License-Identifier: MIT-0
+# Drains the put events dead letter queue back into the kinesis stream.
+# Entries captured by put_personalize_events carry the original payload, entries
+# written by the event source mapping on-failure destination only point at a
+# shard range, which is read back from the stream while it is still retained.
+# usage: python -m animal_recommender.producer.dead_letter_reprocessor queue_url stream_name [records_per_second] [workers]
+import base64, os, sys, threading, time
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+
+from animal_recommender.producer.kinesis_producer import (
+    MAX_BATCH_BYTES,
+    MAX_BATCH_RECORDS,
+    send_batch,
+)
+
+
+class RateLimiter:
+    """Token bucket shared by the workers, allows bursts of up to one second."""
+
+    def __init__(self, rate, clock=time.monotonic, sleep=time.sleep):
+        self.rate = float(rate)
+        self.clock = clock
+        self.sleep = sleep
+        self.tokens = self.rate
+        self.updated = clock()
+        self.lock = threading.Lock()
+
+    def acquire(self, count=1):
+        while True:
+            with self.lock:
+                now = self.clock()
+                self.tokens = min(
+                    self.rate, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+                # a batch larger than the bucket waits for a full bucket
+                needed = min(count, self.rate)
+                if self.tokens >= needed:
+                    self.tokens -= count
+                    return
+                wait = (needed - self.tokens) / self.rate
+            self.sleep(wait)
+
+
+def batch_info_records(kinesis_client, batch_info):
+    """Read the records of an on-failure batch back from the stream."""
+    stream_name = batch_info["streamArn"].split("/")[-1]
+    iterator = kinesis_client.get_shard_iterator(
+        StreamName=stream_name,
+        ShardId=batch_info["shardId"],
+        ShardIteratorType="AT_SEQUENCE_NUMBER",
+        StartingSequenceNumber=batch_info["startSequenceNumber"],
+    )["ShardIterator"]
+    end = int(batch_info["endSequenceNumber"])
+    records = []
+    while iterator:
+        response = kinesis_client.get_records(
+            ShardIterator=iterator, Limit=batch_info["batchSize"]
+        )
+        for record in response["Records"]:
+            if int(record["SequenceNumber"]) > end:
+                return records
+            records.append(
+                {"Data": record["Data"], "PartitionKey": record["PartitionKey"]}
+            )
+        if not response["Records"] and not response.get("MillisBehindLatest"):
+            break
+        iterator = response.get("NextShardIterator")
+    return records
+
+
+def put_records_chunks(records):
+    """Consecutive chunks of records within the put_records limits."""
+    chunk = []
+    size = 0
+    for record in records:
+        record_size = len(record["Data"]) + len(record["PartitionKey"].encode("utf-8"))
+        if chunk and (
+            len(chunk) >= MAX_BATCH_RECORDS or size + record_size > MAX_BATCH_BYTES
+        ):
+            yield chunk
+            chunk = []
+            size = 0
+        chunk.append(record)
+        size += record_size
+    if chunk:
+        yield chunk
+
+
+def entry_records(kinesis_client, entry):
+    if "KinesisBatchInfo" in entry:
+        return batch_info_records(kinesis_client, entry["KinesisBatchInfo"])
+    return [
+        {
+            "Data": base64.b64decode(entry["data"]),
+            "PartitionKey": entry["partitionKey"],
+        }
+    ]
+
+
+class DeadLetterReprocessor:
+    """Sends dead lettered records back to the stream with the batched put path.
+
+    Workers drain the queue in parallel, the rate limiter caps the records per
+    second sent to the stream so reprocessing does not throttle live traffic.
+    An entry is deleted once all its records were put, failed entries stay
+    in the queue for the next run. Entries that are not reprocessable, records
+    that could not be decoded or that personalize rejected as invalid, are
+    left in the queue without being put back.
+    """
+
+    def __init__(
+        self,
+        queue,
+        kinesis_client,
+        stream_name,
+        records_per_second=500,
+        workers=4,
+        max_retries=3,
+        rate_limiter=None,
+    ):
+        self.queue = queue
+        self.kinesis_client = kinesis_client
+        self.stream_name = stream_name
+        self.workers = workers
+        self.max_retries = max_retries
+        self.rate_limiter = rate_limiter or RateLimiter(records_per_second)
+        self.lock = threading.Lock()
+        self.reprocessed = 0
+        self.failed = 0
+        self.skipped = 0
+
+    def run(self):
+        with ThreadPoolExecutor(self.workers) as executor:
+            for future in [executor.submit(self._drain) for _ in range(self.workers)]:
+                future.result()
+        return {
+            "reprocessed": self.reprocessed,
+            "failed": self.failed,
+            "skipped": self.skipped,
+        }
+
+    def _drain(self):
+        while True:
+            messages = self.queue.receive()
+            if not messages:
+                return
+            self._reprocess(messages)
+
+    def _reprocess(self, messages):
+        records = []
+        owners = []
+        handles = []
+        skipped = 0
+        for handle, entry in messages:
+            if not entry.get("reprocessable", True):
+                skipped += 1
+                continue
+            entry_batch = entry_records(self.kinesis_client, entry)
+            records.extend(entry_batch)
+            owners.extend([handle] * len(entry_batch))
+            handles.append(handle)
+        failed_handles = set()
+        failed = 0
+        start = 0
+        for chunk in put_records_chunks(records):
+            self.rate_limiter.acquire(len(chunk))
+            failures = send_batch(
+                self.kinesis_client, self.stream_name, chunk, self.max_retries
+            )
+            # send_batch keeps the order of the records it could not put
+            position = 0
+            for failure in failures:
+                while (
+                    chunk[position]["Data"] != failure["Data"]
+                    or chunk[position]["PartitionKey"] != failure["PartitionKey"]
+                ):
+                    position += 1
+                failed_handles.add(owners[start + position])
+                position += 1
+            failed += len(failures)
+            start += len(chunk)
+        self.queue.delete(
+            [handle for handle in handles if handle not in failed_handles]
+        )
+        with self.lock:
+            self.reprocessed += len(records) - failed
+            self.failed += failed
+            self.skipped += skipped
+
+
+def main():
+    # the dead letter queue client ships with the put events lambda
+    script_dir = os.path.dirname(os.path.realpath(__file__))
+    sys.path.append(os.path.join(script_dir, "../lambda/api"))
+    from dead_letter import SqsDeadLetterQueue
+
+    queue_url, stream_name = sys.argv[1], sys.argv[2]
+    records_per_second = float(sys.argv[3]) if len(sys.argv) > 3 else 500
+    workers = int(sys.argv[4]) if len(sys.argv) > 4 else 4
+    reprocessor = DeadLetterReprocessor(
+        SqsDeadLetterQueue(boto3.client("sqs"), queue_url),
+        boto3.client("kinesis"),
+        stream_name,
+        records_per_second=records_per_second,
+        workers=workers,
+    )
+    print(reprocessor.run())
+
+
+if __name__ == "__main__":
+    main()
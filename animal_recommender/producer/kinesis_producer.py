@@ -0,0 +1,318 @@
+## Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+## SPDX-License-Identifier: MIT-0
+# Client library for sending interaction events to the recommender kinesis stream.
+# Events are buffered in the shape put_personalize_events expects and sent with
+# put_records in batches, only the entries kinesis rejects are retried.
+import asyncio, json, random, threading, time, uuid
+
+# put_records limits
+MAX_BATCH_RECORDS = 500
+MAX_BATCH_BYTES = 5 * 1024 * 1024
+MAX_RECORD_BYTES = 1024 * 1024
+
+
+def session_partition_key(event):
+    # keep the events of a session on one shard so they are consumed in order
+    for key in ("sessionId", "userId"):
+        if event.get(key):
+            return str(event[key])
+    return uuid.uuid4().hex
+
+
+def json_encoder(event):
+    return json.dumps(event, separators=(",", ":")).encode("utf-8")
+
+
+def envelope_encoder(event):
+    """Encode events in the compact binary envelope instead of json.
+
+    The codec ships with the put events lambda, callers put
+    animal_recommender/lambda/api on sys.path.
+    """
+    from event_envelope import encode_event
+
+    return encode_event(event)
+
+
+class AdaptiveLinger:
+    """Time to wait for more events once a batch has its first event.
+
+    Waits up to max_linger when the observed arrival rate can fill a batch
+    in that time, and only min_linger when traffic is too low to batch.
+    """
+
+    def __init__(self, min_linger=0.005, max_linger=0.2, smoothing=0.2):
+        self.min_linger = min_linger
+        self.max_linger = max_linger
+        self.smoothing = smoothing
+        self.rate = 0.0
+        self.last_arrival = None
+
+    def observe_arrival(self, now):
+        if self.last_arrival is not None:
+            elapsed = max(now - self.last_arrival, 1e-6)
+            self.rate += self.smoothing * (1.0 / elapsed - self.rate)
+        self.last_arrival = now
+
+    @property
+    def current(self):
+        if self.rate * self.max_linger < 2:
+            return self.min_linger
+        return min(self.max_linger, max(self.min_linger, MAX_BATCH_RECORDS / self.rate))
+
+
+class RecordBatcher:
+    def __init__(self, encoder=json_encoder, partition_key=session_partition_key):
+        self.encoder = encoder
+        self.partition_key = partition_key
+        self.records = []
+        self.size = 0
+        self.started_at = None
+
+    def __len__(self):
+        return len(self.records)
+
+    def add(self, event, now):
+        """Buffer an event, returns a full batch to send when the event does not fit."""
+        if event.get("timestamp") is None:
+            # stamp at put time so lingering and retries do not shift event time
+            event = dict(event, timestamp=round(time.time(), 3))
+        data = self.encoder(event)
+        partition_key = self.partition_key(event)
+        record_size = len(data) + len(partition_key.encode("utf-8"))
+        if record_size > MAX_RECORD_BYTES:
+            raise ValueError(f"Event of {record_size} bytes exceeds the record limit")
+
+        full = None
+        if (
+            len(self.records) >= MAX_BATCH_RECORDS
+            or self.size + record_size > MAX_BATCH_BYTES
+        ):
+            full = self.drain()
+        if not self.records:
+            self.started_at = now
+        self.records.append({"Data": data, "PartitionKey": partition_key})
+        self.size += record_size
+        if len(self.records) >= MAX_BATCH_RECORDS and full is None:
+            full = self.drain()
+        return full
+
+    def drain(self):
+        records = self.records
+        self.records = []
+        self.size = 0
+        self.started_at = None
+        return records
+
+
+def send_batch(kinesis_client, stream_name, records, max_retries=3, sleep=time.sleep):
+    """Send records with put_records, retrying only the failed entries.
+
+    A call that raises (throttling, network errors) fails every record and is
+    retried the same way. Returns the records that still failed after
+    max_retries with their error.
+    """
+    attempt = 0
+    while records:
+        try:
+            response = kinesis_client.put_records(
+                StreamName=stream_name, Records=records
+            )
+        except Exception as e:
+            print(f"put_records failed: {e}")
+            response = {
+                "FailedRecordCount": len(records),
+                "Records": [
+                    {"ErrorCode": type(e).__name__, "ErrorMessage": str(e)}
+                    for _ in records
+                ],
+            }
+        if not response.get("FailedRecordCount"):
+            return []
+        failed = [
+            (record, result)
+            for record, result in zip(records, response["Records"])
+            if "ErrorCode" in result
+        ]
+        if attempt >= max_retries:
+            return [
+                dict(
+                    record,
+                    ErrorCode=result["ErrorCode"],
+                    ErrorMessage=result.get("ErrorMessage"),
+                )
+                for record, result in failed
+            ]
+        attempt += 1
+        print(f"Retrying {len(failed)} of {len(records)} records, attempt {attempt}")
+        records = [record for record, _ in failed]
+        # exponential backoff with full jitter
+        sleep(random.uniform(0, 0.1 * 2**attempt))
+    return []
+
+
+class KinesisEventProducer:
+    """Thread safe producer that flushes a batch when it is full or its linger expired."""
+
+    def __init__(
+        self,
+        kinesis_client,
+        stream_name,
+        linger=None,
+        max_retries=3,
+        encoder=json_encoder,
+        partition_key=session_partition_key,
+        on_failure=None,
+    ):
+        self.kinesis_client = kinesis_client
+        self.stream_name = stream_name
+        self.linger = linger or AdaptiveLinger()
+        self.max_retries = max_retries
+        self.on_failure = on_failure
+        self.batcher = RecordBatcher(encoder, partition_key)
+        self.lock = threading.Lock()
+        self.wake = threading.Condition(self.lock)
+        self.closed = False
+        self.flusher = threading.Thread(target=self._linger_loop, daemon=True)
+        self.flusher.start()
+
+    def put(self, event):
+        with self.lock:
+            if self.closed:
+                raise RuntimeError("Producer is closed")
+            now = time.monotonic()
+            self.linger.observe_arrival(now)
+            full = self.batcher.add(event, now)
+            self.wake.notify()
+        if full:
+            self._send(full)
+
+    def flush(self):
+        with self.lock:
+            records = self.batcher.drain()
+        return self._send(records)
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+            self.wake.notify()
+        self.flusher.join()
+        return self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _send(self, records):
+        if not records:
+            return []
+        failed = send_batch(
+            self.kinesis_client, self.stream_name, records, self.max_retries
+        )
+        if failed and self.on_failure:
+            self.on_failure(failed)
+        return failed
+
+    def _linger_loop(self):
+        while True:
+            with self.lock:
+                while not self.closed and self.batcher.started_at is None:
+                    self.wake.wait()
+                if self.closed:
+                    return
+                deadline = self.batcher.started_at + self.linger.current
+                remaining = deadline - time.monotonic()
+                if remaining > 0:
+                    self.wake.wait(remaining)
+                    continue
+                records = self.batcher.drain()
+            try:
+                self._send(records)
+            except Exception as e:
+                # keep flushing the next batches, the failed records were
+                # already handed to on_failure
+                print(f"Flushing a batch of {len(records)} records failed: {e}")
+
+
+class AsyncKinesisEventProducer:
+    """asyncio producer, put_records runs in the default executor."""
+
+    def __init__(
+        self,
+        kinesis_client,
+        stream_name,
+        linger=None,
+        max_retries=3,
+        encoder=json_encoder,
+        partition_key=session_partition_key,
+        on_failure=None,
+    ):
+        self.kinesis_client = kinesis_client
+        self.stream_name = stream_name
+        self.linger = linger or AdaptiveLinger()
+        self.max_retries = max_retries
+        self.on_failure = on_failure
+        self.batcher = RecordBatcher(encoder, partition_key)
+        self.linger_task = None
+        self.pending = set()
+
+    async def put(self, event):
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        self.linger.observe_arrival(now)
+        full = self.batcher.add(event, now)
+        if full:
+            self._schedule(full)
+        if len(self.batcher) and self.linger_task is None:
+            self.linger_task = asyncio.create_task(self._linger(self.linger.current))
+
+    async def flush(self):
+        if self.linger_task is not None:
+            self.linger_task.cancel()
+            self.linger_task = None
+        self._schedule(self.batcher.drain())
+        failed = []
+        while self.pending:
+            for result in await asyncio.gather(*self.pending, return_exceptions=True):
+                if isinstance(result, Exception):
+                    print(f"Sending a batch failed: {result}")
+                else:
+                    failed.extend(result)
+        return failed
+
+    async def close(self):
+        return await self.flush()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def _schedule(self, records):
+        if not records:
+            return
+        task = asyncio.create_task(self._send(records))
+        self.pending.add(task)
+        task.add_done_callback(self.pending.discard)
+
+    async def _send(self, records):
+        loop = asyncio.get_running_loop()
+        failed = await loop.run_in_executor(
+            None,
+            send_batch,
+            self.kinesis_client,
+            self.stream_name,
+            records,
+            self.max_retries,
+        )
+        if failed and self.on_failure:
+            self.on_failure(failed)
+        return failed
+
+    async def _linger(self, delay):
+        await asyncio.sleep(delay)
+        self.linger_task = None
+        self._schedule(self.batcher.drain())
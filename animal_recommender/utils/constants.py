@@ -18,6 +18,7 @@ from aws_cdk import (
     aws_logs as logs,
     aws_kms as kms,
     aws_sns as sns,
+    aws_sqs as sqs,
     aws_events as events,
     aws_kinesis as kinesis,
     aws_kinesisfirehose as kinesisfirehose,
@@ -50,6 +51,8 @@ def resource_suffix(resourceType):
         suffix = "ssm"
     if resourceType is _lambda.Function:
         suffix = "lbd"
+    if resourceType is _lambda.Alias:
+        suffix = "als"
     if resourceType is stepfunctions.StateMachine:
         suffix = "stm"
     if resourceType is tasks.LambdaInvoke:
@@ -78,6 +81,8 @@ def resource_suffix(resourceType):
         suffix = "key"
     if resourceType is sns.Topic:
         suffix = "sns"
+    if resourceType is sqs.Queue:
+        suffix = "sqs"
     if resourceType is events.Rule:
         suffix = "evt"
     if resourceType is kinesis.Stream:
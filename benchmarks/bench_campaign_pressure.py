@@ -0,0 +1,125 @@
+## Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+## SPDX-License-Identifier: MIT-0
+# Serves recommendation requests through the serving engine against a stand-in
+# campaign under pressure, which throttles or stalls a share of the calls, with
+# and without the popularity fallback. Reports the latency percentiles, the
+# failed requests and the share of fallback responses.
+# usage: python benchmarks/bench_campaign_pressure.py [requests] [throttle_share] [stall_share]
+import contextlib, io, os, random, statistics, sys, time
+
+from botocore.exceptions import ClientError
+
+script_dir = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.join(script_dir, "../animal_recommender/lambda/api"))
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+from circuit_breaker import CircuitBreaker
+from embedded_metrics import Metrics
+from popularity_index import PopularityIndex
+from recommendation import RecommendOperation
+from serving_engine import CampaignResolver, ServingEngine
+
+CALL_MS = 60
+THROTTLE_MS = 20
+STALL_MS = 800
+LATENCY_BUDGET_MS = 300
+
+
+class Ssm:
+    def get_parameter(self, Name):
+        return {"Parameter": {"Value": f"arn:{Name}"}}
+
+
+class PressuredCampaign:
+    def __init__(self, throttle_share, stall_share, seed=7):
+        self.throttle_share = throttle_share
+        self.stall_share = stall_share
+        self.random = random.Random(seed)
+
+    def get_recommendations(self, campaignArn, userId, numResults):
+        draw = self.random.random()
+        if draw < self.throttle_share:
+            time.sleep(THROTTLE_MS / 1000)
+            raise ClientError(
+                {"Error": {"Code": "ThrottlingException"}}, "GetRecommendations"
+            )
+        if draw < self.throttle_share + self.stall_share:
+            time.sleep(STALL_MS / 1000)
+        else:
+            time.sleep(self.random.lognormvariate(0, 0.3) * CALL_MS / 1000)
+        return {"itemList": [{"itemId": f"2-Pug-{i}-1"} for i in range(numResults)]}
+
+
+class CountingMetrics(Metrics):
+    """Adds the counters up instead of logging them."""
+
+    def __init__(self):
+        super().__init__("bench")
+        self.totals = {}
+
+    def flush(self):
+        for name, value in self.counts.items():
+            self.totals[name] = self.totals.get(name, 0) + value
+        self.counts = {}
+
+
+def run(requests, throttle_share, stall_share, fallback):
+    metrics = CountingMetrics()
+    engine = ServingEngine(CampaignResolver(Ssm()), metrics=metrics)
+    engine.runtime = PressuredCampaign(throttle_share, stall_share)
+    recommend = RecommendOperation(
+        "/campaign",
+        breaker=CircuitBreaker(5, 1) if fallback else None,
+        # without the fallback the request waits for personalize
+        latency_budget_seconds=LATENCY_BUDGET_MS / 1000 if fallback else None,
+    )
+    recommend.popularity_index = PopularityIndex.from_interactions(
+        f"2-Beagle-{i % 5}-{i % 3}" for i in range(1000)
+    )
+    latencies, failures = [], 0
+    # the lambda logs every response
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(requests):
+            start = time.perf_counter()
+            try:
+                response = engine.handle(
+                    recommend, {"body": {"userId": str(i), "limit": 10}}
+                )
+                failures += response["statusCode"] >= 500
+            except ClientError:
+                failures += 1
+            latencies.append((time.perf_counter() - start) * 1000)
+            # a request every 10 ms, the open breaker lets a trial through after 1 s
+            time.sleep(0.01)
+        # calls that ran over the budget finish in the background
+        engine.budgeted_calls.shutdown()
+    fallbacks = sum(
+        v for name, v in metrics.totals.items() if name.endswith("Fallbacks")
+    )
+    return latencies, failures, fallbacks
+
+
+def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    throttle_share = float(sys.argv[2]) if len(sys.argv) > 2 else 0.2
+    stall_share = float(sys.argv[3]) if len(sys.argv) > 3 else 0.05
+    print(
+        f"{requests} requests, {throttle_share:.0%} throttled, "
+        f"{stall_share:.0%} stalled for {STALL_MS} ms"
+    )
+    print(
+        f"{'':>10} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} {'errors':>7} {'fallback':>9}"
+    )
+    for name, fallback in (("personalize", False), ("fallback", True)):
+        latencies, failures, fallbacks = run(
+            requests, throttle_share, stall_share, fallback
+        )
+        quantiles = statistics.quantiles(latencies, n=100)
+        print(
+            f"{name:>10} {quantiles[49]:8.1f} {quantiles[98]:8.1f} "
+            f"{max(latencies):8.1f} {failures:7d} {fallbacks / requests:9.0%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
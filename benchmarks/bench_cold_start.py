@@ -0,0 +1,125 @@
+## Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+## SPDX-License-Identifier: MIT-0
+# Measures the cold start init of the api lambdas: the time a new python
+# process takes to import each handler from its per function bundle, with the
+# environment the stack sets. Lambda runs the same imports in its init phase.
+# The time of the module body and of the slowest imports made by each handler
+# are listed from -X importtime.
+# usage: python benchmarks/bench_cold_start.py [runs]
+import os, shutil, subprocess, sys, tempfile
+
+script_dir = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.join(script_dir, ".."))
+
+from animal_recommender.components.assets import LAMBDA_DIR, handler_modules
+
+COMMON_ENV = {
+    "AWS_DEFAULT_REGION": "us-east-1",
+    "AWS_ACCESS_KEY_ID": "testing",
+    "AWS_SECRET_ACCESS_KEY": "testing",
+    "availability_table_name": "bench-availability-ddb",
+}
+HANDLERS = {
+    "get_recommendation": {
+        "campaign_arn_ssm_path": "/animal-recommender/campaign/arn",
+    },
+    "get_reranking": {
+        "reranking_campaign_arn_ssm_path": "/animal-recommender/rerank/arn",
+        "post_ranking_enabled": "False",
+        "catalog_bucket_name": "bench-seed-bucket",
+        "catalog_items_key": "seed_data/items/items_0.csv",
+        "cursor_table_name": "bench-rerank-cursor-ddb",
+    },
+    "recommend_and_rerank": {
+        "campaign_arn_ssm_path": "/animal-recommender/campaign/arn",
+        "reranking_campaign_arn_ssm_path": "/animal-recommender/rerank/arn",
+        "post_ranking_enabled": "False",
+        "cursor_table_name": "bench-rerank-cursor-ddb",
+    },
+    "put_personalize_events": {
+        "event_tracker_ssm_path": "/animal-recommender/event-tracker/id",
+        "dedup_window_seconds": "30",
+        "dead_letter_queue_url": "https://sqs.us-east-1.amazonaws.com/123456789012/bench-dlq",
+    },
+}
+IMPORT_HANDLER = (
+    "import importlib, sys, time\n"
+    "start = time.perf_counter()\n"
+    "importlib.import_module(sys.argv[1])\n"
+    "print(time.perf_counter() - start)\n"
+)
+
+
+def build_bundle(handler, target):
+    """Copy the modules of the handler bundle, returns their total bytes."""
+    size = 0
+    for module in handler_modules("api", handler):
+        source = os.path.join(LAMBDA_DIR, "api", f"{module}.py")
+        shutil.copy(source, target)
+        size += os.path.getsize(source)
+    return size
+
+
+def handler_env(handler, bundle_dir):
+    env = dict(os.environ, **COMMON_ENV, **HANDLERS[handler])
+    env["PYTHONPATH"] = bundle_dir
+    env["PYTHONDONTWRITEBYTECODE"] = "1"
+    return env
+
+
+def import_seconds(handler, bundle_dir):
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_HANDLER, handler],
+        env=handler_env(handler, bundle_dir),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return float(output.stdout.strip())
+
+
+def import_tree(handler, bundle_dir):
+    """Cumulative ms of the handler import and of the imports it makes itself."""
+    output = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {handler}"],
+        env=handler_env(handler, bundle_dir),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    total = 0.0
+    imports = []
+    for line in output.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        milliseconds = int(cumulative) / 1000.0
+        # nested imports are indented two spaces below their importer
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 0 and name.strip() == handler:
+            total = milliseconds
+        elif depth == 1:
+            imports.append((milliseconds, name.strip()))
+    return total, sorted(imports, reverse=True)
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    for handler in HANDLERS:
+        with tempfile.TemporaryDirectory() as bundle_dir:
+            size = build_bundle(handler, bundle_dir)
+            timings = sorted(import_seconds(handler, bundle_dir) for _ in range(runs))
+            print(
+                f"{handler}: {len(os.listdir(bundle_dir))} modules, {size / 1024:.1f} KB, "
+                f"init p50 {timings[len(timings) // 2] * 1000:.1f} ms, "
+                f"p99 {timings[min(int(len(timings) * 0.99), len(timings) - 1)] * 1000:.1f} ms"
+            )
+            total, imports = import_tree(handler, bundle_dir)
+            body = total - sum(milliseconds for milliseconds, _ in imports)
+            print(f"  {body:8.1f} ms  module body (clients, config)")
+            for milliseconds, module in imports[:5]:
+                print(f"  {milliseconds:8.1f} ms  import {module}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+## Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+## SPDX-License-Identifier: MIT-0
+# Compares record size and decode time of json records and compact envelopes
+# usage: python benchmarks/bench_event_envelope.py
+import json, os, sys, timeit
+
+script_dir = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.join(script_dir, "../animal_recommender/lambda/api"))
+
+from event_envelope import deserialize_record, encode_event
+
+
+def main():
+    with open(os.path.join(script_dir, "../tests/data/put_event.json")) as fr:
+        event = json.load(fr)["Data"]
+
+    records = {
+        "json": json.dumps(event).encode("utf-8"),
+        "envelope": encode_event(event),
+    }
+    for name, record in records.items():
+        runs = 100000
+        seconds = timeit.timeit(lambda: deserialize_record(record), number=runs)
+        print(
+            f"{name:9} {len(record):4} bytes, "
+            f"decode {seconds / runs * 1e6:.2f} us per record"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+## Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+## SPDX-License-Identifier: MIT-0
+# Serves recommendation requests through the serving engine against a jittery
+# stand-in campaign, where a few percent of the calls stall, with and without
+# hedged personalize calls. Reports the latency percentiles and the share of
+# calls that were duplicated.
+# usage: python benchmarks/bench_hedged_requests.py [requests] [stall_share]
+import contextlib, io, os, random, statistics, sys, threading, time
+
+script_dir = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.join(script_dir, "../animal_recommender/lambda/api"))
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+from embedded_metrics import Metrics
+from hedging import Hedger
+from recommendation import RecommendOperation
+from serving_engine import CampaignResolver, ServingEngine
+
+CALL_MS = 50
+STALL_MS = (400, 1000)
+
+
+class Ssm:
+    def get_parameter(self, Name):
+        return {"Parameter": {"Value": f"arn:{Name}"}}
+
+
+class JitteryCampaign:
+    def __init__(self, stall_share, seed=7):
+        self.stall_share = stall_share
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls = 0
+
+    def get_recommendations(self, campaignArn, userId, numResults):
+        with self.lock:
+            self.calls += 1
+            stalled = self.random.random() < self.stall_share
+            latency_ms = (
+                self.random.uniform(*STALL_MS)
+                if stalled
+                else self.random.lognormvariate(0, 0.25) * CALL_MS
+            )
+        time.sleep(latency_ms / 1000)
+        return {"itemList": [{"itemId": f"2-Pug-{i}-1"} for i in range(numResults)]}
+
+
+def run(requests, stall_share, hedged):
+    metrics = Metrics("bench")
+    hedger = Hedger(metrics) if hedged else None
+    engine = ServingEngine(CampaignResolver(Ssm()), metrics=metrics, hedger=hedger)
+    engine.runtime = campaign = JitteryCampaign(stall_share)
+    recommend = RecommendOperation("/campaign")
+    latencies = []
+    # the lambda logs every response
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(requests):
+            start = time.perf_counter()
+            engine.handle(recommend, {"body": {"userId": str(i), "limit": 10}})
+            latencies.append((time.perf_counter() - start) * 1000)
+        if hedger is not None:
+            # stalled calls answered by their hedge finish in the background
+            hedger.executor.shutdown()
+    return latencies, campaign.calls
+
+
+def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    stall_share = float(sys.argv[2]) if len(sys.argv) > 2 else 0.02
+    print(
+        f"{requests} requests, {stall_share:.0%} of the calls stall for {STALL_MS} ms"
+    )
+    print(f"{'':>12} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'extra calls':>12}")
+    for name, hedged in (("not hedged", False), ("hedged", True)):
+        latencies, calls = run(requests, stall_share, hedged)
+        quantiles = statistics.quantiles(latencies, n=100)
+        print(
+            f"{name:>12} {quantiles[49]:8.1f} {quantiles[94]:8.1f} "
+            f"{quantiles[98]:8.1f} {(calls - requests) / requests:12.1%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+## Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+## SPDX-License-Identifier: MIT-0
+# Compares one put_record per event with the batching producer against a stub
+# kinesis client that sleeps for a fixed round trip per request
+# usage: python benchmarks/bench_kinesis_producer.py [num_events] [round_trip_ms]
+import json, os, sys, time
+
+script_dir = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.join(script_dir, ".."))
+
+from animal_recommender.producer.kinesis_producer import KinesisEventProducer
+
+
+class SleepingKinesis:
+    def __init__(self, round_trip):
+        self.round_trip = round_trip
+        self.requests = 0
+
+    def put_record(self, StreamName, Data, PartitionKey):
+        self.requests += 1
+        time.sleep(self.round_trip)
+        return {"SequenceNumber": "1", "ShardId": "shardId-0"}
+
+    def put_records(self, StreamName, Records):
+        self.requests += 1
+        time.sleep(self.round_trip)
+        return {
+            "FailedRecordCount": 0,
+            "Records": [{"SequenceNumber": "1"} for _ in Records],
+        }
+
+
+def main():
+    num_events = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    round_trip = (float(sys.argv[2]) if len(sys.argv) > 2 else 5) / 1000
+    with open(os.path.join(script_dir, "../tests/data/put_event.json")) as fr:
+        event = json.load(fr)["Data"]
+
+    kinesis = SleepingKinesis(round_trip)
+    start = time.perf_counter()
+    for i in range(num_events):
+        kinesis.put_record(
+            StreamName="stream", Data=json.dumps(event), PartitionKey=str(i)
+        )
+    elapsed = time.perf_counter() - start
+    print(
+        f"put_record:  {kinesis.requests} requests, "
+        f"{elapsed / num_events * 1e6:.1f} us per event"
+    )
+
+    kinesis = SleepingKinesis(round_trip)
+    start = time.perf_counter()
+    with KinesisEventProducer(kinesis, "stream") as producer:
+        for _ in range(num_events):
+            producer.put(event)
+    elapsed = time.perf_counter() - start
+    print(
+        f"put_records: {kinesis.requests} requests, "
+        f"{elapsed / num_events * 1e6:.1f} us per event"
+    )
+
+
+if __name__ == "__main__":
+    main()
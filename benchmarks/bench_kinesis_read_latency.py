@@ -0,0 +1,108 @@
+## Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+## SPDX-License-Identifier: MIT-0
+# Sizing benchmark for the put events consumer, runs against a deployed stack.
+# Sends events at a fixed rate for a while, with firehose reading the same
+# stream, then reports the iterator age of the put events lambda (how far the
+# consumer lags behind the stream) and the firehose read throughput.
+# Compare runs with putEventsEnhancedFanOut True and False in config/{env}.yaml.
+# usage: python benchmarks/bench_kinesis_read_latency.py [events_per_second] [minutes]
+import datetime, json, os, sys, time
+
+import boto3
+
+script_dir = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.join(script_dir, ".."))
+sys.path.append(os.path.join(script_dir, "../animal_recommender/utils"))
+
+from constants import *
+from animal_recommender.producer.kinesis_producer import KinesisEventProducer
+
+config = get_config()
+
+
+def drive_load(kinesis, stream_name, event, events_per_second, seconds):
+    interval = 1.0 / events_per_second
+    deadline = time.monotonic() + seconds
+    sent = 0
+    with KinesisEventProducer(kinesis, stream_name) as producer:
+        next_send = time.monotonic()
+        while time.monotonic() < deadline:
+            producer.put(dict(event, sessionId=f"bench-{sent % 1000}"))
+            sent += 1
+            next_send += interval
+            pause = next_send - time.monotonic()
+            if pause > 0:
+                time.sleep(pause)
+    return sent
+
+
+def metric(cloudwatch, namespace, name, dimensions, start, end, statistics):
+    response = cloudwatch.get_metric_statistics(
+        Namespace=namespace,
+        MetricName=name,
+        Dimensions=dimensions,
+        StartTime=start,
+        EndTime=end,
+        Period=60,
+        **statistics,
+    )
+    return sorted(response["Datapoints"], key=lambda point: point["Timestamp"])
+
+
+def main():
+    events_per_second = float(sys.argv[1]) if len(sys.argv) > 1 else 200
+    minutes = float(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    session = boto3.Session(region_name=DEPLOY_REGION)
+    ssm = session.client("ssm")
+    stream_name = ssm.get_parameter(Name=config["kinesisStreamNameSsmPath"])[
+        "Parameter"
+    ]["Value"]
+    function_name = resource_name(_lambda.Function, "recommender-put-events-lambda")
+
+    with open(os.path.join(script_dir, "../tests/data/put_event.json")) as fr:
+        event = json.load(fr)["Data"]
+
+    start = datetime.datetime.utcnow()
+    sent = drive_load(
+        session.client("kinesis"), stream_name, event, events_per_second, minutes * 60
+    )
+    print(f"Sent {sent} events, waiting for metrics")
+    # metrics are published with a delay
+    time.sleep(180)
+    end = datetime.datetime.utcnow()
+
+    cloudwatch = session.client("cloudwatch")
+    iterator_age = metric(
+        cloudwatch,
+        "AWS/Lambda",
+        "IteratorAge",
+        [{"Name": "FunctionName", "Value": function_name}],
+        start,
+        end,
+        {"ExtendedStatistics": ["p50", "p99"], "Statistics": ["Maximum"]},
+    )
+    firehose_bytes = metric(
+        cloudwatch,
+        "AWS/Kinesis",
+        "GetRecords.Bytes",
+        [{"Name": "StreamName", "Value": stream_name}],
+        start,
+        end,
+        {"Statistics": ["Sum"]},
+    )
+
+    print(f"enhanced fan-out: {config['putEventsEnhancedFanOut']}")
+    print("minute                 iterator age p50 / p99 / max (ms)")
+    for point in iterator_age:
+        print(
+            f"{point['Timestamp']:%Y-%m-%d %H:%M}       "
+            f"{point['ExtendedStatistics']['p50']:.0f} / "
+            f"{point['ExtendedStatistics']['p99']:.0f} / {point['Maximum']:.0f}"
+        )
+    shared_reads = sum(point["Sum"] for point in firehose_bytes)
+    print(f"shared throughput GetRecords bytes (firehose): {shared_reads:.0f}")
+
+
+if __name__ == "__main__":
+    main()
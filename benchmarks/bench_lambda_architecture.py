@@ -0,0 +1,157 @@
+## Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+## SPDX-License-Identifier: MIT-0
+# Compares a serving lambda on x86_64 and arm64 at a few memory sizes, runs
+# against a deployed stack. For each architecture the deployed code is uploaded
+# again with that architecture to $LATEST (the live alias keeps serving its
+# published version), then for each memory size the lambda is invoked cold,
+# with a configuration change before every call so lambda starts a new
+# environment, and warm with the request in tests/data. Durations come from
+# the REPORT line of the invocation log. The cost of a million warm requests
+# uses the us-east-1 prices. The original configuration is restored at the end.
+# usage: python benchmarks/bench_lambda_architecture.py [get_recommendation|get_reranking] [memory_sizes] [invocations]
+import base64, os, re, sys, urllib.request, uuid
+
+import boto3
+
+script_dir = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.join(script_dir, ".."))
+sys.path.append(os.path.join(script_dir, "../animal_recommender/utils"))
+
+from aws_cdk import aws_lambda as _lambda
+from constants import *
+
+FUNCTIONS = {
+    "get_recommendation": "recommender-get-recommendation-lambda",
+    "get_reranking": "recommender-get-reranking-lambda",
+}
+ARCHITECTURES = ["x86_64", "arm64"]
+# price per GB-second of duration
+GB_SECOND_PRICE = {"x86_64": 0.0000166667, "arm64": 0.0000133334}
+REQUEST_PRICE = 0.20 / 1000000
+COLD_STARTS = 5
+
+REPORT_FIELDS = {
+    "duration": r"\tDuration: ([0-9.]+) ms",
+    "billed": r"Billed Duration: ([0-9.]+) ms",
+    "init": r"Init Duration: ([0-9.]+) ms",
+    "max_memory": r"Max Memory Used: ([0-9]+) MB",
+}
+
+
+def parse_report(log_tail):
+    """Fields of the REPORT line of a tailed invocation log."""
+    report = next(
+        line for line in reversed(log_tail.splitlines()) if line.startswith("REPORT")
+    )
+    values = {}
+    for field, pattern in REPORT_FIELDS.items():
+        match = re.search(pattern, report)
+        if match:
+            values[field] = float(match.group(1))
+    return values
+
+
+def invoke(lambda_client, function_name, payload):
+    response = lambda_client.invoke(
+        FunctionName=function_name, Payload=payload, LogType="Tail"
+    )
+    if "FunctionError" in response:
+        raise RuntimeError(response["Payload"].read().decode("utf-8"))
+    return parse_report(base64.b64decode(response["LogResult"]).decode("utf-8"))
+
+
+def configure(lambda_client, function_name, memory_size, environment):
+    lambda_client.update_function_configuration(
+        FunctionName=function_name,
+        MemorySize=memory_size,
+        Environment={"Variables": environment},
+    )
+    lambda_client.get_waiter("function_updated").wait(FunctionName=function_name)
+
+
+def deploy_architecture(lambda_client, function_name, code, architecture):
+    lambda_client.update_function_code(
+        FunctionName=function_name, ZipFile=code, Architectures=[architecture]
+    )
+    lambda_client.get_waiter("function_updated").wait(FunctionName=function_name)
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def measure(lambda_client, function_name, payload, memory_size, environment, runs):
+    cold = []
+    for _ in range(COLD_STARTS):
+        # a changed configuration is only served by new environments
+        configure(
+            lambda_client,
+            function_name,
+            memory_size,
+            dict(environment, bench_run=uuid.uuid4().hex),
+        )
+        cold.append(invoke(lambda_client, function_name, payload))
+    warm = [invoke(lambda_client, function_name, payload) for _ in range(runs)]
+    return cold, warm
+
+
+def main():
+    handler = sys.argv[1] if len(sys.argv) > 1 else "get_recommendation"
+    memory_sizes = [
+        int(size)
+        for size in (sys.argv[2] if len(sys.argv) > 2 else "256,512").split(",")
+    ]
+    runs = int(sys.argv[3]) if len(sys.argv) > 3 else 50
+
+    session = boto3.Session(region_name=DEPLOY_REGION)
+    lambda_client = session.client("lambda")
+    function_name = resource_name(_lambda.Function, FUNCTIONS[handler])
+    with open(os.path.join(script_dir, f"../tests/data/{handler}.json")) as fr:
+        payload = fr.read()
+
+    function = lambda_client.get_function(FunctionName=function_name)
+    original = function["Configuration"]
+    with urllib.request.urlopen(function["Code"]["Location"]) as response:
+        code = response.read()
+    environment = original.get("Environment", {}).get("Variables", {})
+
+    print(
+        "architecture  memory  init p50  cold p50  warm p50  warm p99  "
+        "max memory  $ per 1M warm"
+    )
+    try:
+        for architecture in ARCHITECTURES:
+            deploy_architecture(lambda_client, function_name, code, architecture)
+            for memory_size in memory_sizes:
+                cold, warm = measure(
+                    lambda_client,
+                    function_name,
+                    payload,
+                    memory_size,
+                    environment,
+                    runs,
+                )
+                billed = percentile([report["billed"] for report in warm], 0.5)
+                cost = 1000000 * (
+                    billed / 1000 * memory_size / 1024 * GB_SECOND_PRICE[architecture]
+                    + REQUEST_PRICE
+                )
+                print(
+                    f"{architecture:12}  {memory_size:6}  "
+                    f"{percentile([report['init'] for report in cold], 0.5):8.0f}  "
+                    f"{percentile([report['duration'] for report in cold], 0.5):8.0f}  "
+                    f"{percentile([report['duration'] for report in warm], 0.5):8.1f}  "
+                    f"{percentile([report['duration'] for report in warm], 0.99):8.1f}  "
+                    f"{max(report['max_memory'] for report in warm + cold):10.0f}  "
+                    f"{cost:13.2f}"
+                )
+    finally:
+        deploy_architecture(
+            lambda_client, function_name, code, original["Architectures"][0]
+        )
+        configure(lambda_client, function_name, original["MemorySize"], environment)
+
+
+if __name__ == "__main__":
+    main()
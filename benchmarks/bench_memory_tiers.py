@@ -0,0 +1,390 @@
+## Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+## SPDX-License-Identifier: MIT-0
+# Memory right-sizing of the data path lambdas, runs locally. Each handler is
+# invoked warm in its own process with stand-in AWS clients: client creation
+# runs the real boto3 so its cost is measured, the calls are answered by the
+# stand-ins, which add a typical service latency instead of waiting for it and
+# an estimate of the CPU botocore spends signing the request and parsing the
+# response. Lambda gives a function CPU in proportion to its memory, a full
+# vCPU at 1769 MB, so the CPU time of an invocation is scaled for each memory
+# tier and the service latency is added unchanged. Prints p50/p99 and the cost
+# of a million invocations per tier, and recommends the cheapest tier that
+# fits the peak memory with a p99 within the tolerance of the handler of the
+# fastest tier. With --write the recommended sizes are written to
+# config/{env}.yaml.
+# usage: python benchmarks/bench_memory_tiers.py [invocations] [--write]
+import base64, io, json, math, os, re, resource, subprocess, sys, time
+
+import yaml
+
+script_dir = os.path.dirname(os.path.realpath(__file__))
+
+# the config is read directly, importing the cdk constants would add the cdk
+# libraries to the memory of the measured process
+CDK_ENVIRONMENT = os.environ.get("CDK_ENVIRONMENT", "dev")
+API_DIR = os.path.join(script_dir, "../animal_recommender/lambda/api")
+CONFIG_PATH = os.path.join(script_dir, "..", "config", f"{CDK_ENVIRONMENT}.yaml")
+ITEMS_CSV = os.path.join(script_dir, "../seed_data/items/items_0.csv")
+
+MEMORY_TIERS = [128, 256, 512, 1024, 1769, 3008]
+# memory at which a function gets one full vCPU, the handlers are single
+# threaded so more memory does not make them faster
+FULL_VCPU_MB = 1769
+# a lambda vCPU is taken as fast as a local core, raise it when the local
+# machine is faster
+LAMBDA_CPU_SLOWDOWN = 1.0
+# peak memory of the process times this must fit in the tier
+MEMORY_HEADROOM = 1.25
+WARM_UP_INVOCATIONS = 5
+
+GB_SECOND_PRICE = {"x86_64": 0.0000166667, "arm64": 0.0000133334}
+REQUEST_PRICE = 0.20 / 1000000
+
+# CPU of a call at a full vCPU, milliseconds
+CALL_CPU_MS = 1.0
+# typical latency of the calls, milliseconds
+SERVICE_LATENCY_MS = {
+    "get_parameter": 8,
+    "get_object": 20,
+    "scan": 10,
+    "update_item": 6,
+    "put_object": 30,
+    "get_recommendations": 40,
+    "get_personalized_ranking": 45,
+    "put_events": 25,
+    "send_message_batch": 15,
+}
+
+COMMON_ENV = {
+    "AWS_DEFAULT_REGION": "us-east-1",
+    "AWS_ACCESS_KEY_ID": "testing",
+    "AWS_SECRET_ACCESS_KEY": "testing",
+    "availability_table_name": "bench-availability-ddb",
+    "prewarm_on_init": "never",
+}
+
+
+def load_config(config_path=CONFIG_PATH):
+    with open(config_path) as fr:
+        return yaml.safe_load(fr)
+
+
+def handlers(config):
+    """Environment, memory config key, architecture and p99 tolerance of each
+    handler, the cheapest tier with a p99 within the tolerance of the fastest
+    one is recommended."""
+    return {
+        "get_recommendation": {
+            "config_key": "getRecommendationMemorySize",
+            "architecture": config["servingArchitecture"],
+            "p99_tolerance": 0.1,
+            "env": {
+                "campaign_arn_ssm_path": "/bench/campaign",
+                "availability_overfetch_factor": f"{config['availabilityOverfetchFactor']}",
+            },
+        },
+        "get_reranking": {
+            "config_key": "getRerankingMemorySize",
+            "architecture": config["servingArchitecture"],
+            "p99_tolerance": 0.1,
+            "env": {
+                "reranking_campaign_arn_ssm_path": "/bench/rerank-campaign",
+                "post_ranking_enabled": f"{config['postRankingEnabled']}",
+                "post_ranking_item_value_weight": f"{config['postRankingItemValueWeight']}",
+                "post_ranking_waiting_weight": f"{config['postRankingWaitingWeight']}",
+                "post_ranking_max_per_breed": f"{config['postRankingMaxPerBreed']}",
+                "catalog_bucket_name": "bench-seed-bucket",
+                "catalog_items_key": config["catalogItemsKey"],
+                "group_expansion_strategy": config["groupExpansionStrategy"],
+                "group_expansion_signal": config["groupExpansionSignal"],
+            },
+        },
+        "put_personalize_events": {
+            "config_key": "putEventsMemorySize",
+            "architecture": "x86_64",
+            # the consumer only has to keep up with the stream
+            "p99_tolerance": 0.5,
+            "env": {
+                "event_tracker_ssm_path": "/bench/event-tracker",
+                "dedup_window_seconds": f"{config['dedupWindowSeconds']}",
+                "late_event_policy": config["lateEventPolicy"],
+                "event_aggregation_mode": config["eventAggregationMode"],
+            },
+        },
+    }
+
+
+class StandInClient:
+    """Answers the calls of a handler and books their service latency."""
+
+    def __init__(self, responses, ledger):
+        self.responses = responses
+        self.ledger = ledger
+
+    def __getattr__(self, operation):
+        if operation not in self.responses:
+            raise AttributeError(operation)
+        respond = self.responses[operation]
+
+        def call(**kwargs):
+            self.ledger.append(SERVICE_LATENCY_MS[operation])
+            return respond(**kwargs)
+
+        return call
+
+
+def catalog():
+    with open(ITEMS_CSV) as fr:
+        items_csv = fr.read()
+    item_ids = [line.split(",")[5] for line in items_csv.splitlines()[1:]]
+    return items_csv, item_ids
+
+
+def stand_in_responses():
+    items_csv, item_ids = catalog()
+    # two animals of every group, both adopted in a tenth of the catalog
+    availability = [
+        {
+            "animal_id": {"S": f"{item_id}.{animal}"},
+            "group_id": {"S": item_id},
+            "available": {"BOOL": ordinal % 10 != 0},
+        }
+        for ordinal, item_id in enumerate(item_ids)
+        for animal in range(2)
+    ]
+
+    def get_object(Bucket, Key):
+        return {"Body": io.BytesIO(items_csv.encode("utf-8"))}
+
+    return {
+        "ssm": {"get_parameter": lambda Name: {"Parameter": {"Value": f"arn:{Name}"}}},
+        "s3": {"get_object": get_object, "put_object": lambda **kwargs: {}},
+        "dynamodb": {
+            "scan": lambda **kwargs: {"Items": availability},
+            "update_item": lambda **kwargs: {},
+        },
+        "personalize-runtime": {
+            "get_recommendations": lambda numResults, **kwargs: {
+                "itemList": [{"itemId": item_id} for item_id in item_ids[:numResults]]
+            },
+            "get_personalized_ranking": lambda inputList, **kwargs: {
+                "personalizedRanking": [
+                    {"itemId": group, "score": 1.0 / (rank + 1)}
+                    for rank, group in enumerate(inputList)
+                ]
+            },
+        },
+        "personalize-events": {"put_events": lambda **kwargs: {}},
+        "sqs": {"send_message_batch": lambda **kwargs: {"Failed": []}},
+    }
+
+
+def animal_metadata(item_id):
+    species, breed, size, age = item_id.split("-")
+    return {
+        "animal_species_id": species,
+        "animal_primary_breed_id": breed,
+        "animal_size_id": size,
+        "animal_age_id": age,
+    }
+
+
+def handler_event(handler, config, invocation=0):
+    _, item_ids = catalog()
+    if handler == "get_recommendation":
+        return {"body": {"userId": "bench-user", "limit": 25}}
+    if handler == "get_reranking":
+        # a search result page of 500 animals
+        return {
+            "body": {
+                "userId": "bench-user",
+                "itemMetadataList": [
+                    {
+                        "itemId": f"animal-{i}",
+                        "animalMetadata": dict(
+                            animal_metadata(item_ids[i % len(item_ids)]),
+                            intake_timestamp=1600000000 + i * 3600,
+                        ),
+                    }
+                    for i in range(500)
+                ],
+            }
+        }
+    now = int(time.time())
+    records = []
+    for i in range(config["putEventsBatchSize"]):
+        data = {
+            "userId": f"user-{i % 7}",
+            # new sessions in every batch, so the dedup window does not drop them
+            "sessionId": f"session-{invocation}-{i % 11}",
+            "eventType": "DetailView",
+            "timestamp": now,
+            "animalMetadata": animal_metadata(item_ids[i % len(item_ids)]),
+        }
+        if i % 25 == 0:
+            data.update(eventType="AvailabilityChange", available=False)
+        records.append(
+            {
+                "kinesis": {
+                    "data": base64.b64encode(json.dumps(data).encode("utf-8")).decode(
+                        "ascii"
+                    ),
+                    "sequenceNumber": f"{i}",
+                    "approximateArrivalTimestamp": now,
+                }
+            }
+        )
+    return {"Records": records}
+
+
+def run_worker(handler, invocations):
+    """Invoke the handler in this process, prints cpu and service ms per call."""
+    import boto3
+
+    config = load_config()
+    responses = stand_in_responses()
+    ledger = []
+    create_client = boto3.client
+
+    def stand_in_client(service_name, *args, **kwargs):
+        create_client(service_name, *args, **kwargs)
+        return StandInClient(responses[service_name], ledger)
+
+    boto3.client = stand_in_client
+    sys.path.append(API_DIR)
+    module = __import__(handler)
+    events = [
+        handler_event(handler, config, invocation)
+        for invocation in range(WARM_UP_INVOCATIONS + invocations)
+    ]
+
+    cpu_ms, service_ms, calls = [], [], []
+    with open(os.devnull, "w") as devnull:
+        stdout, sys.stdout = sys.stdout, devnull
+        try:
+            for invocation, event in enumerate(events):
+                del ledger[:]
+                start = time.process_time()
+                module.lambda_handler(event, None)
+                if invocation >= WARM_UP_INVOCATIONS:
+                    cpu_ms.append((time.process_time() - start) * 1000)
+                    service_ms.append(sum(ledger))
+                    calls.append(len(ledger))
+        finally:
+            sys.stdout = stdout
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(
+        json.dumps(
+            {
+                "cpu_ms": cpu_ms,
+                "service_ms": service_ms,
+                "calls": calls,
+                "peak_mb": peak_mb,
+            }
+        )
+    )
+
+
+def measure(handler, env, invocations):
+    output = subprocess.run(
+        [sys.executable, __file__, "--worker", handler, f"{invocations}"],
+        env=dict(os.environ, **COMMON_ENV, **env, PYTHONDONTWRITEBYTECODE="1"),
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=os.path.join(script_dir, ".."),
+    )
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def simulate(samples, memory_mb, architecture):
+    """p50, p99 ms and the cost of a million invocations at a memory tier."""
+    cpu_share = min(1.0, memory_mb / FULL_VCPU_MB)
+    durations = [
+        (cpu + calls * CALL_CPU_MS) * LAMBDA_CPU_SLOWDOWN / cpu_share + service
+        for cpu, service, calls in zip(
+            samples["cpu_ms"], samples["service_ms"], samples["calls"]
+        )
+    ]
+    billed_seconds = sum(math.ceil(duration) for duration in durations) / 1000
+    cost = 1000000 * (
+        billed_seconds
+        / len(durations)
+        * memory_mb
+        / 1024
+        * GB_SECOND_PRICE[architecture]
+        + REQUEST_PRICE
+    )
+    return percentile(durations, 0.5), percentile(durations, 0.99), cost
+
+
+def recommend(tiers, peak_mb, p99_tolerance):
+    """Cheapest tier that fits the peak memory and is close to the fastest p99."""
+    eligible = {
+        memory_mb: result
+        for memory_mb, result in tiers.items()
+        if memory_mb >= peak_mb * MEMORY_HEADROOM
+    }
+    if not eligible:
+        return max(tiers)
+    fastest_p99 = min(p99 for _, p99, _ in eligible.values())
+    return min(
+        (cost, memory_mb)
+        for memory_mb, (_, p99, cost) in eligible.items()
+        if p99 <= fastest_p99 * (1 + p99_tolerance)
+    )[1]
+
+
+def write_memory_sizes(recommended, config_path=CONFIG_PATH):
+    """Replace the memory size keys in the config file, keeping its comments."""
+    with open(config_path) as fr:
+        text = fr.read()
+    for key, memory_mb in recommended.items():
+        text, count = re.subn(
+            rf"^{key}:.*$", f"{key}: {memory_mb}", text, flags=re.MULTILINE
+        )
+        if not count:
+            text += f"{key}: {memory_mb}\n"
+    with open(config_path, "w") as fw:
+        fw.write(text)
+
+
+def main():
+    if sys.argv[1:2] == ["--worker"]:
+        run_worker(sys.argv[2], int(sys.argv[3]))
+        return
+    args = [arg for arg in sys.argv[1:] if arg != "--write"]
+    invocations = int(args[0]) if args else 200
+
+    config = load_config()
+    recommended = {}
+    for handler, settings in handlers(config).items():
+        samples = measure(handler, settings["env"], invocations)
+        tiers = {
+            memory_mb: simulate(samples, memory_mb, settings["architecture"])
+            for memory_mb in MEMORY_TIERS
+        }
+        memory_mb = recommend(tiers, samples["peak_mb"], settings["p99_tolerance"])
+        recommended[settings["config_key"]] = memory_mb
+        print(
+            f"{handler}: cpu p50 {percentile(samples['cpu_ms'], 0.5):.1f} ms, "
+            f"service {percentile(samples['service_ms'], 0.5):.0f} ms, "
+            f"peak {samples['peak_mb']:.0f} MB, "
+            f"{settings['config_key']} {config[settings['config_key']]} -> {memory_mb}"
+        )
+        print("  memory MB    p50 ms    p99 ms  $ per 1M")
+        for tier, (p50, p99, cost) in tiers.items():
+            marker = "  <" if tier == memory_mb else ""
+            print(f"  {tier:9}  {p50:8.1f}  {p99:8.1f}  {cost:8.2f}{marker}")
+    if "--write" in sys.argv:
+        write_memory_sizes(recommended)
+        print(f"Wrote {recommended} to {CONFIG_PATH}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+## Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+## SPDX-License-Identifier: MIT-0
+# Measures the client side cost of personalize calls against a local TLS
+# stand-in that answers after a fixed service time: a new client for every
+# call, as put_personalize_events did for every event, against one pooled
+# client per container. Needs openssl for the self-signed certificate.
+# usage: python benchmarks/bench_personalize_clients.py [calls] [service_ms]
+import json, os, ssl, statistics, subprocess, sys, tempfile, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import boto3, urllib3
+
+script_dir = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.join(script_dir, "../animal_recommender/lambda/api"))
+
+from embedded_metrics import Metrics
+from personalize_client import ConnectionStats, client_config
+
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+
+def stand_in_handler(service_seconds):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # headers and body are written separately, nagle would hold the body
+        disable_nagle_algorithm = True
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers["Content-Length"]))
+            time.sleep(service_seconds)
+            body = json.dumps({"itemList": []}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def start_server(directory, service_seconds):
+    cert, key = os.path.join(directory, "cert.pem"), os.path.join(directory, "key.pem")
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1"]
+        + ["-subj", "/CN=localhost", "-keyout", key, "-out", cert],
+        check=True,
+        capture_output=True,
+    )
+    server = ThreadingHTTPServer(("127.0.0.1", 0), stand_in_handler(service_seconds))
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(cert, key)
+    server.socket = context.wrap_socket(server.socket, server_side=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def new_client(endpoint_url):
+    return boto3.client(
+        "personalize-runtime",
+        region_name="us-east-1",
+        endpoint_url=endpoint_url,
+        aws_access_key_id="bench",
+        aws_secret_access_key="bench",
+        verify=False,
+        config=client_config(),
+    )
+
+
+def measure(calls, client_for_call):
+    latencies = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        client_for_call().get_recommendations(campaignArn="arn:campaign", userId="1")
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def main():
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    service_ms = float(sys.argv[2]) if len(sys.argv) > 2 else 20
+    with tempfile.TemporaryDirectory() as directory:
+        server = start_server(directory, service_ms / 1000)
+        endpoint_url = f"https://127.0.0.1:{server.server_port}"
+
+        per_call = measure(calls, lambda: new_client(endpoint_url))
+        pooled_client = new_client(endpoint_url)
+        stats = ConnectionStats(pooled_client)
+        pooled = measure(calls, lambda: pooled_client)
+        metrics = Metrics("bench")
+        stats.record(metrics)
+        server.shutdown()
+
+    print(f"{calls} calls, {service_ms:.0f} ms service time")
+    print(f"{'':>16} {'mean ms':>8} {'p50 ms':>8} {'p99 ms':>8}")
+    for name, latencies in (("client per call", per_call), ("pooled client", pooled)):
+        quantiles = statistics.quantiles(latencies, n=100)
+        print(
+            f"{name:>16} {statistics.mean(latencies):8.1f} "
+            f"{quantiles[49]:8.1f} {quantiles[98]:8.1f}"
+        )
+    print(
+        f"pooled connection reuse rate {metrics.counts['PersonalizeConnectionReuseRate']}%"
+    )
+
+
+if __name__ == "__main__":
+    main()
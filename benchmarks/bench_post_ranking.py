@@ -0,0 +1,55 @@
+## Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+## SPDX-License-Identifier: MIT-0
+# Measures the time the reranking post ranking stage adds for a candidate list
+# usage: python benchmarks/bench_post_ranking.py [num_items]
+import os, random, sys, time
+
+script_dir = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.join(script_dir, "../animal_recommender/lambda/api"))
+
+from post_ranking import PostRanker
+
+BREEDS = ["Abyssinian", "Bengal", "beagle", "pug", "Saint_Bernard", "Siamese"]
+
+
+def build_candidates(num_items, now):
+    items = []
+    group_scores = {}
+    for i in range(num_items):
+        breed = random.choice(BREEDS)
+        group_id = f"{random.randint(1, 2)}-{breed}-{random.randint(1, 5)}-{random.randint(1, 5)}"
+        group_scores[group_id] = random.random()
+        metadata = {
+            "animal_primary_breed_id": breed,
+            "intake_timestamp": str(now - random.randint(0, 400) * 86400),
+        }
+        items.append((str(i), group_id, metadata))
+    return items, group_scores
+
+
+def main():
+    num_items = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    now = time.time()
+    items, group_scores = build_candidates(num_items, now)
+    ranker = PostRanker(
+        item_value_weight=0.5,
+        waiting_weight=0.2,
+        max_per_breed=3,
+        item_values={group_id: random.random() for group_id in group_scores},
+    )
+
+    timings = []
+    for _ in range(200):
+        start = time.perf_counter()
+        ranker.rank(items, group_scores, now=now)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    print(
+        f"post ranking {num_items} items: "
+        f"p50 {timings[len(timings) // 2] * 1000:.3f} ms, "
+        f"p99 {timings[int(len(timings) * 0.99)] * 1000:.3f} ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+## Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+## SPDX-License-Identifier: MIT-0
+# Measures the compiled request schemas on large reranking bodies: the schema
+# check alone, the whole validate stage that also builds the animal group of
+# every item, the rejection of a body whose last item is malformed, and json
+# parsing of the same body for scale.
+# usage: python benchmarks/bench_request_validation.py [num_items] [repeats]
+import json, os, sys, time
+
+script_dir = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.join(script_dir, "../animal_recommender/lambda/api"))
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+from group_expansion import GroupExpander
+from recommendation import validate_body as validate_recommendation_body
+from reranking import RerankOperation, validate_list_body
+from serving_engine import RequestError
+
+BREEDS = ["Abyssinian", "Bengal", "Beagle", "Pug", "Saint_Bernard", "Siamese"]
+
+
+def rerank_body(num_items):
+    return {
+        "userId": "12345",
+        "limit": 25,
+        "itemMetadataList": [
+            {
+                "itemId": str(i),
+                "animalMetadata": {
+                    "animal_species_id": str(1 + i % 2),
+                    "animal_primary_breed_id": BREEDS[i % len(BREEDS)],
+                    "animal_size_id": str(1 + i % 5),
+                    "animal_age_id": str(1 + i % 4),
+                    "intake_timestamp": "1656408773",
+                },
+            }
+            for i in range(num_items)
+        ],
+    }
+
+
+def best_of(repeats, function, *args):
+    """Fastest of repeats runs in microseconds, the others include noise."""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        try:
+            function(*args)
+        except RequestError:
+            pass
+        timings.append((time.perf_counter() - start) * 1e6)
+    return min(timings)
+
+
+def main():
+    num_items = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    body = rerank_body(num_items)
+    text = json.dumps(body)
+    malformed = json.loads(text)
+    del malformed["itemMetadataList"][-1]["animalMetadata"]["animal_age_id"]
+    rerank = RerankOperation("/rerank-campaign", GroupExpander())
+
+    print(f"rerank body with {num_items} items, {len(text) / 1e6:.1f} MB of json")
+    print(f"{'':>28} {'us':>10} {'us / item':>10}")
+    for name, function, argument in (
+        ("schema check", validate_list_body, body),
+        ("validate stage", rerank.validate, body),
+        ("reject last item", validate_list_body, malformed),
+        ("json parse", json.loads, text),
+    ):
+        micros = best_of(repeats, function, argument)
+        print(f"{name:>28} {micros:10.0f} {micros / num_items:10.3f}")
+    micros = best_of(
+        repeats * 100, validate_recommendation_body, {"userId": "12345", "limit": 10}
+    )
+    print(f"{'recommendation schema check':>28} {micros:10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+## Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+## SPDX-License-Identifier: MIT-0
+# Maintains the animal group items dataset from a shelter inventory feed.
+# The feed is a snapshot of the shelter animals, a csv or json lines file with
+# the animalMetadata fields of an animal (animal_id, animal_species_id,
+# animal_primary_breed_id, animal_size_id, animal_age_id), its intake_timestamp
+# in epoch seconds and its status. Groups get the intake time of their first
+# available animal as CREATION_TIMESTAMP, so exploration can favor new
+# animals. The groups that are new or changed are written to a delta file and
+# can be sent to personalize with PutItems instead of re-importing the catalog.
+# usage: python seed_data/sync_items_dataset.py feed.csv [--put-items]
+import argparse, csv, datetime, json, os, sys, time
+
+import boto3
+
+script_dir = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.join(script_dir, "../animal_recommender/utils"))
+
+from constants import *
+
+ITEMS_FIELDS = [
+    "ANIMAL_TYPE",
+    "ANIMAL_AGE",
+    "ANIMAL_SIZE",
+    "ANIMAL_BREED",
+    "ITEM_VALUE",
+    "ITEM_ID",
+    "CREATION_TIMESTAMP",
+]
+DEFAULT_ITEM_VALUE = "0.1"
+AVAILABLE_STATUSES = ("available",)
+# creation timestamps before 2000 are placeholders, like the seed 15000000
+PLACEHOLDER_BEFORE = 946684800
+# PutItems limit
+PUT_ITEMS_BATCH_SIZE = 10
+
+
+def group_id(animal):
+    return (
+        f"{animal['animal_species_id']}-{animal['animal_primary_breed_id']}"
+        f"-{animal['animal_size_id']}-{animal['animal_age_id']}"
+    )
+
+
+def read_feed(path):
+    """Animals of a csv or json lines inventory feed."""
+    with open(path, newline="") as fr:
+        if path.endswith((".json", ".jsonl")):
+            for line in fr:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from csv.DictReader(fr)
+
+
+def available_groups(animals):
+    """Earliest and latest intake time of the available animals per group."""
+    groups = {}
+    for animal in animals:
+        if str(animal.get("status", "available")).casefold() not in AVAILABLE_STATUSES:
+            continue
+        intake = int(float(animal["intake_timestamp"]))
+        group = group_id(animal)
+        first, last = groups.get(group, (intake, intake))
+        groups[group] = (min(first, intake), max(last, intake))
+    return groups
+
+
+def read_items(path):
+    try:
+        with open(path, newline="") as fr:
+            return {row["ITEM_ID"]: row for row in csv.DictReader(fr)}
+    except FileNotFoundError:
+        return {}
+
+
+def read_state(path):
+    try:
+        with open(path) as fr:
+            return json.load(fr)
+    except FileNotFoundError:
+        return None
+
+
+def sync_items(items, previously_available, groups):
+    """Return the changed item rows and the updated items.
+
+    A new group is created at the intake of its first animal. A group that
+    comes back after having no available animals is recreated at the intake
+    of its newest animal, and a placeholder CREATION_TIMESTAMP is replaced
+    with the intake of its first animal.
+    """
+    changed = {}
+    for group, (first_intake, last_intake) in groups.items():
+        row = items.get(group)
+        if row is None:
+            species, rest = group.split("-", 1)
+            breed, size, age = rest.rsplit("-", 2)
+            changed[group] = {
+                "ANIMAL_TYPE": species,
+                "ANIMAL_AGE": age,
+                "ANIMAL_SIZE": size,
+                "ANIMAL_BREED": breed,
+                "ITEM_VALUE": DEFAULT_ITEM_VALUE,
+                "ITEM_ID": group,
+                "CREATION_TIMESTAMP": str(first_intake),
+            }
+        elif int(row["CREATION_TIMESTAMP"]) < PLACEHOLDER_BEFORE:
+            changed[group] = dict(row, CREATION_TIMESTAMP=str(first_intake))
+        elif group not in previously_available and last_intake > int(
+            row["CREATION_TIMESTAMP"]
+        ):
+            changed[group] = dict(row, CREATION_TIMESTAMP=str(last_intake))
+    updated = dict(items)
+    updated.update(changed)
+    return list(changed.values()), updated
+
+
+def write_items(path, rows, fields=ITEMS_FIELDS):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", newline="") as fw:
+        writer = csv.DictWriter(fw, fieldnames=fields, lineterminator="\n")
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def item_properties(row):
+    # PutItems takes the schema fields in camel case
+    return json.dumps(
+        {
+            "animalType": row["ANIMAL_TYPE"],
+            "animalAge": row["ANIMAL_AGE"],
+            "animalSize": row["ANIMAL_SIZE"],
+            "animalBreed": row["ANIMAL_BREED"],
+            "itemValue": float(row["ITEM_VALUE"]),
+            "creationTimestamp": int(row["CREATION_TIMESTAMP"]),
+        }
+    )
+
+
+def put_items(personalize_events, dataset_arn, rows):
+    for start in range(0, len(rows), PUT_ITEMS_BATCH_SIZE):
+        personalize_events.put_items(
+            datasetArn=dataset_arn,
+            items=[
+                {"itemId": row["ITEM_ID"], "properties": item_properties(row)}
+                for row in rows[start : start + PUT_ITEMS_BATCH_SIZE]
+            ],
+        )
+
+
+def sync(feed_path, items_path, state_path, delta_dir, now=None):
+    """Sync the items dataset with the feed.
+
+    Returns the delta file, None when nothing changed, and the changed rows.
+    """
+    items = read_items(items_path)
+    state = read_state(state_path)
+    groups = available_groups(read_feed(feed_path))
+    # without a previous sync no group counts as coming back
+    previously_available = set(groups) if state is None else set(state["available"])
+    changed, updated = sync_items(items, previously_available, groups)
+
+    delta_path = None
+    if changed:
+        fields = list(next(iter(items.values())).keys()) if items else ITEMS_FIELDS
+        write_items(items_path, updated.values(), fields)
+        now = now or time.time()
+        stamp = datetime.datetime.fromtimestamp(now, tz=datetime.timezone.utc)
+        delta_path = os.path.join(
+            delta_dir, f"items_delta_{stamp.strftime('%Y%m%dT%H%M%SZ')}.csv"
+        )
+        write_items(delta_path, changed, fields)
+    os.makedirs(os.path.dirname(os.path.abspath(state_path)), exist_ok=True)
+    with open(state_path, "w") as fw:
+        json.dump({"available": sorted(groups)}, fw)
+    return delta_path, changed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync the items dataset")
+    parser.add_argument("feed", help="inventory feed, csv or json lines")
+    parser.add_argument(
+        "--items", default=os.path.join(script_dir, "items/items_0.csv")
+    )
+    parser.add_argument(
+        "--state", default=os.path.join(script_dir, "manifests/items_state.json")
+    )
+    parser.add_argument("--deltas", default=os.path.join(script_dir, "items_delta"))
+    parser.add_argument(
+        "--put-items",
+        action="store_true",
+        help="send the changed groups to the items dataset with PutItems",
+    )
+    args = parser.parse_args()
+
+    delta_path, changed = sync(args.feed, args.items, args.state, args.deltas)
+    if delta_path is None:
+        print("Items dataset is up to date")
+        return
+    print(f"{len(changed)} new or changed animal groups written to {delta_path}")
+    if args.put_items:
+        dataset_arn = f"arn:aws:personalize:{DEPLOY_REGION}:{ACCOUNT_ID}:dataset/{ENV_PREFIX}-recommender-datasetgroup-pdg/ITEMS"
+        put_items(
+            boto3.client("personalize-events", region_name=DEPLOY_REGION),
+            dataset_arn,
+            changed,
+        )
+        print(f"Sent {len(changed)} items to {dataset_arn}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+## Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+## SPDX-License-Identifier: MIT-0
+# Uploads the seed datasets to the seed bucket, skipping files whose content
+# did not change since the last upload. Files are hashed and uploaded in
+# parallel, large files with concurrent multipart transfers.
+# usage: python seed_data/upload_seed_data.py [--bucket name] [--gzip] [--workers N]
+import argparse, gzip, hashlib, json, os, shutil, sys, tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.exceptions import ClientError
+
+script_dir = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.join(script_dir, "../animal_recommender/utils"))
+
+from constants import *
+
+# object metadata with the sha256 of the uncompressed source file
+HASH_METADATA = "source-sha256"
+HASH_BLOCK_BYTES = 1024 * 1024
+MULTIPART_THRESHOLD = 64 * 1024 * 1024
+MULTIPART_CHUNK_BYTES = 16 * 1024 * 1024
+# the directories deploy.sh uploads
+SEED_DIRECTORIES = ("items", "interactions", "popularity")
+KEY_PREFIX = "seed_data"
+
+
+def file_hash(path):
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as fr:
+        for block in iter(lambda: fr.read(HASH_BLOCK_BYTES), b""):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+
+class S3Backend:
+    def __init__(self, s3_client, bucket, transfer_config=None):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.transfer_config = transfer_config or TransferConfig(
+            multipart_threshold=MULTIPART_THRESHOLD,
+            multipart_chunksize=MULTIPART_CHUNK_BYTES,
+            max_concurrency=8,
+        )
+
+    def stored_hash(self, key):
+        try:
+            response = self.s3_client.head_object(Bucket=self.bucket, Key=key)
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+        return response.get("Metadata", {}).get(HASH_METADATA)
+
+    def upload(self, path, key, source_hash, content_type=None):
+        extra_args = {"Metadata": {HASH_METADATA: source_hash}}
+        if content_type:
+            extra_args["ContentType"] = content_type
+        self.s3_client.upload_file(
+            path, self.bucket, key, ExtraArgs=extra_args, Config=self.transfer_config
+        )
+
+
+class LocalBackend:
+    """Stand-in for S3Backend that keeps objects in a local directory."""
+
+    def __init__(self, root):
+        self.root = root
+
+    def _metadata_path(self, key):
+        return os.path.join(self.root, key + ".metadata.json")
+
+    def stored_hash(self, key):
+        try:
+            with open(self._metadata_path(key)) as fr:
+                return json.load(fr).get(HASH_METADATA)
+        except FileNotFoundError:
+            return None
+
+    def upload(self, path, key, source_hash, content_type=None):
+        target = os.path.join(self.root, key)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.copyfile(path, target)
+        with open(self._metadata_path(key), "w") as fw:
+            json.dump({HASH_METADATA: source_hash, "ContentType": content_type}, fw)
+
+
+def seed_files(source_dir, directories=SEED_DIRECTORIES):
+    """(path, key) of the files to upload, keyed like deploy.sh uploads them."""
+    files = []
+    for directory in directories:
+        for root, _, names in os.walk(os.path.join(source_dir, directory)):
+            for name in sorted(names):
+                path = os.path.join(root, name)
+                relative = os.path.relpath(path, source_dir).replace(os.sep, "/")
+                files.append((path, f"{KEY_PREFIX}/{relative}"))
+    return sorted(files)
+
+
+def sync_file(backend, path, key, compress=False):
+    """Upload the file unless its hash matches the stored one, returns the key or None."""
+    source_hash = file_hash(path)
+    if compress:
+        key += ".gz"
+    if backend.stored_hash(key) == source_hash:
+        return None
+    if not compress:
+        backend.upload(path, key, source_hash)
+        return key
+    with tempfile.NamedTemporaryFile(suffix=".gz", delete=False) as compressed:
+        try:
+            with open(path, "rb") as fr, gzip.GzipFile(
+                fileobj=compressed, mode="wb"
+            ) as fw:
+                shutil.copyfileobj(fr, fw, HASH_BLOCK_BYTES)
+            compressed.close()
+            backend.upload(compressed.name, key, source_hash, "application/gzip")
+        finally:
+            os.remove(compressed.name)
+    return key
+
+
+def sync(backend, source_dir, directories=SEED_DIRECTORIES, compress=False, workers=4):
+    files = seed_files(source_dir, directories)
+    with ThreadPoolExecutor(workers) as executor:
+        uploaded = list(
+            executor.map(lambda file: sync_file(backend, *file, compress), files)
+        )
+    uploaded = [key for key in uploaded if key]
+    return {"uploaded": uploaded, "skipped": len(files) - len(uploaded)}
+
+
+def main():
+    config = get_config()
+    parser = argparse.ArgumentParser(description="Upload changed seed data files")
+    parser.add_argument("--bucket", help="defaults to the seed bucket in ssm")
+    parser.add_argument("--source", default=script_dir)
+    parser.add_argument(
+        "--gzip", action="store_true", help="upload gzipped .gz objects"
+    )
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    bucket = args.bucket
+    if not bucket:
+        ssm = boto3.client("ssm", region_name=DEPLOY_REGION)
+        bucket = ssm.get_parameter(Name=config["s3SeedNameSsmPath"])["Parameter"][
+            "Value"
+        ]
+    backend = S3Backend(boto3.client("s3", region_name=DEPLOY_REGION), bucket)
+    result = sync(backend, args.source, compress=args.gzip, workers=args.workers)
+    for key in result["uploaded"]:
+        print(f"Uploaded s3://{bucket}/{key}")
+    print(f"{len(result['uploaded'])} uploaded, {result['skipped']} unchanged")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,464 @@
+## Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+## SPDX-License-Identifier: MIT-0
+# Validates and profiles the seed datasets against their personalize schemas
+# before they are imported. A dataset is a csv file or a folder, a folder is
+# checked as one dataset made of all its csv files like the import job reads
+# it. The csv files are streamed in chunks of rows that are checked column by
+# column, memory grows with the number of items and users but not with the
+# number of interactions.
+# usage: python seed_data/validate_seed_data.py [--items path] [--interactions path] [--chunk-rows N] [--json]
+import argparse, csv, json, os, statistics, sys, time
+
+script_dir = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.join(script_dir, "../animal_recommender/lambda/api"))
+
+from dedup_window import BloomFilter
+
+CHUNK_ROWS = 50000
+MAX_EXAMPLES = 5
+# personalize limits
+MAX_ID_LENGTH = 256
+MAX_CATEGORICAL_LENGTH = 1000
+MIN_INTERACTIONS = 1000
+MIN_USERS_WITH_TWO_INTERACTIONS = 25
+# epoch seconds above this are milliseconds
+MILLISECONDS_THRESHOLD = 1e11
+
+ID_FIELDS = ("USER_ID", "ITEM_ID")
+TIMESTAMP_FIELDS = ("TIMESTAMP", "CREATION_TIMESTAMP")
+
+
+def load_schema(path):
+    with open(path) as fr:
+        return json.load(fr)
+
+
+def field_type(field):
+    """(type, nullable) of an avro field, unions are only used with null."""
+    types = field["type"] if isinstance(field["type"], list) else [field["type"]]
+    nullable = "null" in types
+    types = [t for t in types if t != "null"]
+    return types[0], nullable
+
+
+def parse_column(values, avro_type):
+    """Parse a column, returns (parsed, invalid positions).
+
+    Converts the whole column at once and only goes value by value for a
+    column that has invalid values.
+    """
+    if avro_type in ("long", "int"):
+        convert = int
+    elif avro_type in ("float", "double"):
+        convert = float
+    elif avro_type == "boolean":
+        convert = parse_boolean
+    else:
+        return values, []
+    try:
+        return list(map(convert, values)), []
+    except ValueError:
+        pass
+    parsed = []
+    invalid = []
+    for position, value in enumerate(values):
+        try:
+            parsed.append(convert(value))
+        except ValueError:
+            parsed.append(None)
+            invalid.append(position)
+    return parsed, invalid
+
+
+def parse_boolean(value):
+    lowered = value.casefold()
+    if lowered not in ("true", "false"):
+        raise ValueError(value)
+    return lowered == "true"
+
+
+class FieldProfile:
+    def __init__(self, field, column):
+        self.name = field["name"]
+        self.type, self.nullable = field_type(field)
+        self.categorical = field.get("categorical", False)
+        self.column = column
+        self.rows = 0
+        self.nulls = 0
+        self.invalid = 0
+        self.examples = []
+        self.minimum = None
+        self.maximum = None
+        if self.name.upper() in ID_FIELDS:
+            self.max_length = MAX_ID_LENGTH
+        elif self.categorical:
+            self.max_length = MAX_CATEGORICAL_LENGTH
+        else:
+            self.max_length = None
+
+    def invalid_rows(self, rows, message, location):
+        self.invalid += len(rows)
+        for row in rows[: MAX_EXAMPLES - len(self.examples)]:
+            self.examples.append(f"{location(row)}: {message}")
+
+    def update(self, values, first_row, location):
+        """Check a chunk of the column, returns the parsed values."""
+        self.rows += len(values)
+        empty = [position for position, value in enumerate(values) if value == ""]
+        if empty:
+            self.nulls += len(empty)
+            if not self.nullable:
+                self.invalid_rows(
+                    [first_row + position for position in empty],
+                    "missing value",
+                    location,
+                )
+            rows = [
+                first_row + position
+                for position, value in enumerate(values)
+                if value != ""
+            ]
+            present = [value for value in values if value != ""]
+        else:
+            rows = range(first_row, first_row + len(values))
+            present = values
+
+        parsed, invalid = parse_column(present, self.type)
+        if invalid:
+            self.invalid_rows(
+                [rows[position] for position in invalid],
+                f"not a valid {self.type}",
+                location,
+            )
+        if self.max_length is not None:
+            too_long = [
+                rows[position]
+                for position, value in enumerate(present)
+                if len(value) > self.max_length
+            ]
+            if too_long:
+                self.invalid_rows(too_long, f"longer than {self.max_length}", location)
+        if self.type in ("long", "int", "float", "double"):
+            numbers = [value for value in parsed if value is not None]
+            if numbers:
+                low, high = min(numbers), max(numbers)
+                self.minimum = low if self.minimum is None else min(self.minimum, low)
+                self.maximum = high if self.maximum is None else max(self.maximum, high)
+        return parsed
+
+    def report(self):
+        report = {
+            "type": self.type,
+            "rows": self.rows,
+            "nulls": self.nulls,
+            "invalid": self.invalid,
+        }
+        if self.minimum is not None:
+            report["min"] = self.minimum
+            report["max"] = self.maximum
+        if self.examples:
+            report["examples"] = self.examples
+        return report
+
+
+def read_chunks(path, chunk_rows=CHUNK_ROWS):
+    """Yield (header, columns, first_row, chunk_bytes) for chunks of a csv file.
+
+    first_row is the 1-based line number of the first row of the chunk.
+    """
+    with open(path, newline="") as fr:
+        reader = csv.reader(fr)
+        header = next(reader, None)
+        if header is None:
+            return
+        first_row = 2
+        rows = []
+        for row in reader:
+            rows.append(row)
+            if len(rows) == chunk_rows:
+                yield header, columnar(header, rows), first_row, chunk_size(rows)
+                first_row += len(rows)
+                rows = []
+        if rows:
+            yield header, columnar(header, rows), first_row, chunk_size(rows)
+
+
+def columnar(header, rows):
+    # short rows are padded so every column has a value per row
+    width = len(header)
+    padded = (
+        row if len(row) == width else (row + [""] * width)[:width] for row in rows
+    )
+    return [list(column) for column in zip(*padded)]
+
+
+def chunk_size(rows):
+    return sum(len(value) + 1 for row in rows for value in row)
+
+
+def dataset_files(path):
+    """The csv files of a dataset, every csv below a folder or the file itself."""
+    if not os.path.isdir(path):
+        return [path]
+    return [
+        os.path.join(root, name)
+        for root, _, names in sorted(os.walk(path))
+        for name in sorted(names)
+        if name.endswith(".csv")
+    ]
+
+
+class DatasetProfile:
+    """Checks the csv files of a dataset against an avro schema, chunk by chunk."""
+
+    def __init__(self, name, path, schema):
+        self.name = name
+        self.path = path
+        self.files = dataset_files(path)
+        self.schema = schema
+        self.errors = []
+        self.warnings = []
+        self.rows = 0
+        self.fields = {}
+        self.header = None
+
+    def match_header(self, header):
+        # personalize matches column names to schema fields ignoring case
+        columns = {name.casefold(): position for position, name in enumerate(header)}
+        for field in self.schema["fields"]:
+            column = columns.pop(field["name"].casefold(), None)
+            if column is None:
+                if not field_type(field)[1]:
+                    self.errors.append(f"Missing column {field['name']}")
+                continue
+            self.fields[field["name"]] = FieldProfile(field, column)
+        for extra in columns:
+            self.errors.append(f"Column {header[columns[extra]]} is not in the schema")
+
+    def profile(self, chunk_rows=CHUNK_ROWS, on_chunk=None):
+        if not self.files:
+            self.errors.append(f"No csv files in {self.path}")
+        for path in self.files:
+            self.profile_file(path, chunk_rows, on_chunk)
+        for name, profile in self.fields.items():
+            if profile.invalid:
+                self.errors.append(f"{profile.invalid} invalid values in {name}")
+            if name.upper() in TIMESTAMP_FIELDS and profile.maximum is not None:
+                check_timestamp_range(self, name, profile)
+        return self
+
+    def profile_file(self, path, chunk_rows, on_chunk):
+        name = os.path.relpath(path, self.path) if len(self.files) > 1 else None
+
+        def location(row):
+            return f"row {row}" if name is None else f"{name} row {row}"
+
+        for header, columns, first_row, chunk_bytes in read_chunks(path, chunk_rows):
+            if self.header is None:
+                self.header = header
+                self.match_header(header)
+            elif header != self.header:
+                # the columns of the other files were matched with the first header
+                self.errors.append(
+                    f"{location(1)}: columns {header} differ from {self.header}"
+                )
+                return
+            rows = len(columns[0]) if columns else 0
+            self.rows += rows
+            parsed = {
+                name: profile.update(columns[profile.column], first_row, location)
+                for name, profile in self.fields.items()
+            }
+            if on_chunk:
+                on_chunk(parsed, first_row, rows, chunk_bytes, location)
+
+    def report(self):
+        return {
+            "path": self.path,
+            "files": len(self.files),
+            "rows": self.rows,
+            "errors": self.errors,
+            "warnings": self.warnings,
+            "fields": {name: profile.report() for name, profile in self.fields.items()},
+        }
+
+
+def check_timestamp_range(dataset, name, profile):
+    if profile.maximum > MILLISECONDS_THRESHOLD:
+        dataset.errors.append(
+            f"{name} has values in milliseconds, personalize expects epoch seconds"
+        )
+    elif profile.maximum > time.time():
+        dataset.warnings.append(f"{name} has values in the future")
+    if profile.minimum < 0:
+        dataset.errors.append(f"{name} has negative values")
+
+
+class InteractionChecks:
+    """Orphan items, duplicates and per user counts of the interactions."""
+
+    def __init__(self, item_ids, file_size, false_positive_rate=0.001):
+        self.item_ids = item_ids
+        self.file_size = file_size
+        self.false_positive_rate = false_positive_rate
+        self.seen = None
+        self.orphans = 0
+        self.orphan_examples = []
+        self.duplicates = 0
+        self.user_counts = {}
+
+    def __call__(self, columns, first_row, rows, chunk_bytes, location):
+        user_ids = columns.get("USER_ID")
+        item_ids = columns.get("ITEM_ID")
+        timestamps = columns.get("TIMESTAMP", [None] * rows)
+        if user_ids is None or item_ids is None:
+            return
+        if self.seen is None:
+            # size the filter for the whole file from the first chunk
+            expected = max(rows, int(self.file_size / max(chunk_bytes / rows, 1)))
+            self.seen = BloomFilter(expected, self.false_positive_rate)
+
+        if self.item_ids is not None:
+            orphans = [
+                position
+                for position, item_id in enumerate(item_ids)
+                if item_id not in self.item_ids
+            ]
+            self.orphans += len(orphans)
+            for position in orphans[: MAX_EXAMPLES - len(self.orphan_examples)]:
+                self.orphan_examples.append(
+                    f"{location(first_row + position)}: {item_ids[position]}"
+                )
+
+        for user_id, item_id, timestamp in zip(user_ids, item_ids, timestamps):
+            key = f"{user_id}\x1f{item_id}\x1f{timestamp}".encode("utf-8")
+            if not self.seen.add_new(key):
+                self.duplicates += 1
+            self.user_counts[user_id] = self.user_counts.get(user_id, 0) + 1
+
+    def apply(self, dataset):
+        if self.orphans:
+            dataset.errors.append(
+                f"{self.orphans} interactions with an ITEM_ID that is not in the items dataset"
+            )
+        if self.duplicates:
+            dataset.warnings.append(
+                f"About {self.duplicates} duplicate (USER_ID, ITEM_ID, TIMESTAMP) interactions"
+            )
+        if dataset.rows < MIN_INTERACTIONS:
+            dataset.errors.append(
+                f"{dataset.rows} interactions, personalize needs at least {MIN_INTERACTIONS}"
+            )
+        repeat_users = sum(1 for count in self.user_counts.values() if count >= 2)
+        if repeat_users < MIN_USERS_WITH_TWO_INTERACTIONS:
+            dataset.errors.append(
+                f"{repeat_users} users with 2 or more interactions, personalize needs at least {MIN_USERS_WITH_TWO_INTERACTIONS}"
+            )
+
+    def report(self):
+        counts = sorted(self.user_counts.values())
+        report = {
+            "orphan_item_ids": self.orphans,
+            "duplicates": self.duplicates,
+            "users": len(counts),
+        }
+        if self.orphan_examples:
+            report["orphan_examples"] = self.orphan_examples
+        if counts:
+            report["interactions_per_user"] = {
+                "min": counts[0],
+                "median": statistics.median(counts),
+                "p99": counts[min(len(counts) - 1, int(len(counts) * 0.99))],
+                "max": counts[-1],
+            }
+        return report
+
+
+def validate(
+    items_path, items_schema, interactions_path, interactions_schema, chunk_rows
+):
+    item_ids = set()
+
+    def collect_item_ids(columns, first_row, rows, chunk_bytes, location):
+        item_ids.update(columns.get("ITEM_ID", ()))
+
+    items = DatasetProfile("items", items_path, items_schema).profile(
+        chunk_rows, collect_item_ids
+    )
+    interactions = DatasetProfile(
+        "interactions", interactions_path, interactions_schema
+    )
+    checks = InteractionChecks(
+        item_ids if "ITEM_ID" in items.fields else None,
+        sum(os.path.getsize(path) for path in interactions.files),
+    )
+    interactions.profile(chunk_rows, checks)
+    checks.apply(interactions)
+
+    if len(item_ids) < items.rows:
+        items.errors.append(f"{items.rows - len(item_ids)} duplicate ITEM_IDs")
+    items_report = items.report()
+    items_report["distinct_item_ids"] = len(item_ids)
+    interactions_report = interactions.report()
+    interactions_report.update(checks.report())
+    return {"items": items_report, "interactions": interactions_report}
+
+
+def print_report(report):
+    for name, dataset in report.items():
+        files = f", {dataset['files']} files" if dataset["files"] != 1 else ""
+        print(f"{name}: {dataset['path']}{files}, {dataset['rows']} rows")
+        for field, profile in dataset["fields"].items():
+            summary = f"  {field} ({profile['type']}): {profile['nulls']} empty, {profile['invalid']} invalid"
+            if "min" in profile:
+                summary += f", min {profile['min']}, max {profile['max']}"
+            print(summary)
+            for example in profile.get("examples", []):
+                print(f"    {example}")
+        if "interactions_per_user" in dataset:
+            per_user = dataset["interactions_per_user"]
+            print(
+                f"  {dataset['users']} users, interactions per user min {per_user['min']}, median {per_user['median']}, p99 {per_user['p99']}, max {per_user['max']}"
+            )
+        for example in dataset.get("orphan_examples", []):
+            print(f"  orphan {example}")
+        for warning in dataset["warnings"]:
+            print(f"  WARNING {warning}")
+        for error in dataset["errors"]:
+            print(f"  ERROR {error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Validate and profile the seed datasets"
+    )
+    parser.add_argument(
+        "--items", default=os.path.join(script_dir, "items/items_0.csv")
+    )
+    parser.add_argument(
+        "--interactions",
+        default=os.path.join(script_dir, "interactions"),
+        help="csv file or folder, a folder is validated like the import job reads it",
+    )
+    parser.add_argument("--schemas", default=os.path.join(script_dir, "schemas"))
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--json", action="store_true", help="print the report as json")
+    args = parser.parse_args()
+
+    report = validate(
+        args.items,
+        load_schema(os.path.join(args.schemas, "items_schema.json")),
+        args.interactions,
+        load_schema(os.path.join(args.schemas, "interactions_schema.json")),
+        args.chunk_rows,
+    )
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+    if any(dataset["errors"] for dataset in report.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
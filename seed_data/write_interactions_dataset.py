@@ -0,0 +1,373 @@
+## Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+## SPDX-License-Identifier: MIT-0
+# Writes interaction history as time partitioned, size bounded csv shards in
+# the folder the personalize import job reads, with a manifest of the shards.
+# Rows are streamed from the seed csv or the firehose event archive, so the
+# history does not have to fit in memory. Appending more history only touches
+# the shards of the partitions it falls in, upload_seed_data.py then skips the
+# unchanged shards. The manifest records the rows of each csv and the archive
+# key ranges that were written, so running it again does not duplicate them.
+# usage: python seed_data/write_interactions_dataset.py seed --input csv
+#        python seed_data/write_interactions_dataset.py archive --bucket name [--prefix YYYY/MM]
+import argparse, collections, csv, datetime, gzip, itertools, json, os, sys
+
+import boto3
+
+script_dir = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.join(script_dir, "../animal_recommender/utils"))
+sys.path.append(os.path.join(script_dir, "../animal_recommender/lambda/api"))
+
+from constants import *
+from event_envelope import MAGIC, EnvelopeError, decode_envelope
+
+FIELDS = ["USER_ID", "ITEM_ID", "TIMESTAMP"]
+MANIFEST_VERSION = 1
+MAX_SHARD_BYTES = 100 * 1024 * 1024
+MAX_OPEN_SHARDS = 16
+PERIODS = {"day": "%Y-%m-%d", "month": "%Y-%m", "year": "%Y"}
+# events that are not interactions with an animal group
+SKIPPED_EVENT_TYPES = ("AvailabilityChange",)
+# the envelope magic byte once decoded with surrogateescape, it is not valid
+# utf-8 on its own
+ENVELOPE_START = chr(0xDC00 + MAGIC)
+
+
+def partition_of(timestamp, period):
+    return datetime.datetime.fromtimestamp(
+        timestamp, tz=datetime.timezone.utc
+    ).strftime(PERIODS[period])
+
+
+class ShardedDatasetWriter:
+    """Writes (user_id, item_id, timestamp) rows to shards of one partition per period.
+
+    A partition gets a new shard when its last one reaches max_shard_bytes of
+    csv. Rows keep their order within a partition, partitions are not sorted
+    internally. Personalize imports plain csv, compress gzips the shards for
+    readers that support it.
+    """
+
+    def __init__(
+        self,
+        directory,
+        manifest_path,
+        prefix="interactions",
+        period="month",
+        max_shard_bytes=MAX_SHARD_BYTES,
+        compress=False,
+        max_open_shards=MAX_OPEN_SHARDS,
+    ):
+        if period not in PERIODS:
+            raise ValueError(f"Invalid period: {period}")
+        self.directory = directory
+        self.manifest_path = manifest_path
+        self.prefix = prefix
+        self.period = period
+        self.max_shard_bytes = max_shard_bytes
+        self.compress = compress
+        self.max_open_shards = max_open_shards
+        self.shards, self.sources = self._load_manifest()
+        # the last shard of each partition is the one that is appended to
+        self.last_shards = {}
+        for shard in self.shards:
+            self.last_shards[shard["partition"]] = shard
+        self.open_shards = collections.OrderedDict()
+        self.touched = set()
+
+    def _load_manifest(self):
+        try:
+            with open(self.manifest_path) as fr:
+                manifest = json.load(fr)
+        except FileNotFoundError:
+            return [], {}
+        if manifest["period"] != self.period or manifest["prefix"] != self.prefix:
+            raise ValueError(
+                f"Manifest {self.manifest_path} was written with another period or prefix"
+            )
+        # manifests written before the sources were recorded have none
+        return manifest["shards"], manifest.get("sources", {})
+
+    def _shard_name(self, partition, part):
+        suffix = ".csv.gz" if self.compress else ".csv"
+        return f"{self.prefix}-{partition}-part-{part:05d}{suffix}"
+
+    def _open(self, shard, new):
+        path = os.path.join(self.directory, shard["key"])
+        if self.compress:
+            # appending adds a gzip member, readers decompress the members in order
+            handle = gzip.open(path, "at", newline="")
+        else:
+            handle = open(path, "a", newline="")
+        writer = csv.writer(handle)
+        if new:
+            writer.writerow(FIELDS)
+        if len(self.open_shards) >= self.max_open_shards:
+            _, (oldest, _) = self.open_shards.popitem(last=False)
+            oldest.close()
+        self.open_shards[shard["partition"]] = (handle, writer)
+        return writer
+
+    def _new_shard(self, partition):
+        last = self.last_shards.get(partition)
+        part = 0 if last is None else last["part"] + 1
+        shard = {
+            "key": self._shard_name(partition, part),
+            "partition": partition,
+            "part": part,
+            "rows": 0,
+            "bytes": 0,
+            "min_timestamp": None,
+            "max_timestamp": None,
+        }
+        self.shards.append(shard)
+        self.last_shards[partition] = shard
+        return shard
+
+    def _writer(self, partition, row_bytes):
+        shard = self.last_shards.get(partition)
+        full = shard is not None and shard["bytes"] + row_bytes > self.max_shard_bytes
+        if shard is not None and not full:
+            if partition in self.open_shards:
+                self.open_shards.move_to_end(partition)
+                return shard, self.open_shards[partition][1]
+            return shard, self._open(shard, new=False)
+        if partition in self.open_shards:
+            self.open_shards.pop(partition)[0].close()
+        shard = self._new_shard(partition)
+        header_bytes = len(",".join(FIELDS)) + 2
+        shard["bytes"] = header_bytes
+        return shard, self._open(shard, new=True)
+
+    def write(self, rows):
+        """Write (user_id, item_id, timestamp) rows, returns the number written."""
+        os.makedirs(self.directory, exist_ok=True)
+        written = 0
+        for user_id, item_id, timestamp in rows:
+            timestamp = int(timestamp)
+            partition = partition_of(timestamp, self.period)
+            row = (str(user_id), str(item_id), str(timestamp))
+            # csv rows end with \r\n
+            row_bytes = sum(len(value.encode("utf-8")) for value in row) + 4
+            shard, writer = self._writer(partition, row_bytes)
+            writer.writerow(row)
+            shard["rows"] += 1
+            shard["bytes"] += row_bytes
+            if shard["min_timestamp"] is None or timestamp < shard["min_timestamp"]:
+                shard["min_timestamp"] = timestamp
+            if shard["max_timestamp"] is None or timestamp > shard["max_timestamp"]:
+                shard["max_timestamp"] = timestamp
+            self.touched.add(shard["key"])
+            written += 1
+        return written
+
+    def manifest(self):
+        shards = sorted(
+            self.shards, key=lambda shard: (shard["partition"], shard["part"])
+        )
+        return {
+            "version": MANIFEST_VERSION,
+            "prefix": self.prefix,
+            "period": self.period,
+            "fields": FIELDS,
+            "compressed": self.compress,
+            "rows": sum(shard["rows"] for shard in shards),
+            "shards": shards,
+            "sources": self.sources,
+        }
+
+    def close(self):
+        """Close the shards and write the manifest, returns the keys of the touched shards."""
+        for handle, _ in self.open_shards.values():
+            handle.close()
+        self.open_shards.clear()
+        os.makedirs(os.path.dirname(os.path.abspath(self.manifest_path)), exist_ok=True)
+        with open(self.manifest_path, "w") as fw:
+            json.dump(self.manifest(), fw, indent=2)
+        return sorted(self.touched)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def csv_interactions(path):
+    """Rows of an interactions csv in the seed data format."""
+    with open(path, newline="") as fr:
+        for row in csv.DictReader(fr):
+            yield row["USER_ID"], row["ITEM_ID"], row["TIMESTAMP"]
+
+
+def archive_events(name, data):
+    """Events of a firehose archive object, json records and envelopes.
+
+    Firehose concatenates the records of a buffer into one object, the json
+    records of producers that did not move to envelopes yet are mixed with
+    envelopes. Records after one that cannot be decoded are skipped.
+    """
+    decoder = json.JSONDecoder()
+    offset = 0
+    while offset < len(data):
+        if data[offset] == MAGIC:
+            try:
+                event, offset = decode_envelope(data, offset)
+            except EnvelopeError as e:
+                print(f"Skipping the rest of {name}, {e}")
+                return
+            yield event
+            continue
+        # the json records up to the next envelope
+        text = data[offset:].decode("utf-8", errors="surrogateescape")
+        position = 0
+        while position < len(text) and text[position] != ENVELOPE_START:
+            if text[position].isspace():
+                position += 1
+                continue
+            try:
+                event, position = decoder.raw_decode(text, position)
+            except json.JSONDecodeError:
+                print(f"Skipping the rest of {name}, it is not a json record")
+                return
+            yield event
+        offset += len(text[:position].encode("utf-8", errors="surrogateescape"))
+
+
+def archive_interactions(objects):
+    """Rows of the put events records in firehose archive objects.
+
+    Records without a userId or timestamp cannot be imported and are skipped.
+    """
+    for name, data in objects:
+        for event in archive_events(name, data):
+            if (
+                event.get("eventType") in SKIPPED_EVENT_TYPES
+                or not event.get("userId")
+                or event.get("timestamp") is None
+            ):
+                continue
+            metadata = event["animalMetadata"]
+            item_id = (
+                f"{metadata['animal_species_id']}-{metadata['animal_primary_breed_id']}"
+                f"-{metadata['animal_size_id']}-{metadata['animal_age_id']}"
+            )
+            timestamp = float(event["timestamp"])
+            # same as event_time, epoch values this large are milliseconds
+            if timestamp > 1e11:
+                timestamp /= 1000.0
+            yield event["userId"], item_id, int(timestamp)
+
+
+def new_csv_rows(rows, source):
+    """The rows after the ones source already counts, counted once written.
+
+    Seed csv files are only appended to, so the rows that were written
+    before are the first ones of the file.
+    """
+    source.setdefault("rows", 0)
+    for row in itertools.islice(rows, source["rows"], None):
+        yield row
+        # the writer asks for the next row once this one is written
+        source["rows"] += 1
+
+
+def new_archive_objects(objects, source):
+    """The objects outside the key ranges of source, added once written.
+
+    Firehose names objects by delivery time, so the objects of one run form
+    a key range. An object is only added once all of its records were
+    written, a run that fails reads the object again.
+    """
+    ranges = source.setdefault("ranges", [])
+    current = None
+    for name, data in objects:
+        if not any(first <= name <= last for first, last in ranges):
+            yield name, data
+        # the range of the run spans the objects that were written before
+        if current is None:
+            current = [name, name]
+            ranges.append(current)
+        else:
+            current[1] = name
+    source["ranges"] = merge_ranges(ranges)
+
+
+def merge_ranges(ranges):
+    merged = []
+    for first, last in sorted(ranges):
+        if merged and first <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], last)
+        else:
+            merged.append([first, last])
+    return merged
+
+
+def contains(directory, path):
+    directory, path = os.path.realpath(directory), os.path.realpath(path)
+    return os.path.commonpath([directory, path]) == directory
+
+
+def s3_archive_objects(s3, bucket, prefix=""):
+    """(key, data) of the archive objects under prefix, in key (time) order."""
+    paginator = s3.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        for item in page.get("Contents", []):
+            if item["Key"].startswith(("error/", "logs/")):
+                continue
+            body = s3.get_object(Bucket=bucket, Key=item["Key"])["Body"].read()
+            yield item["Key"], body
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write sharded interactions")
+    parser.add_argument("source", choices=["seed", "archive"])
+    parser.add_argument("--input", help="interactions csv of the seed source")
+    parser.add_argument("--bucket", help="recommender bucket with the event archive")
+    parser.add_argument("--prefix", default="", help="archive prefix, e.g. 2022/07")
+    parser.add_argument("--output", default=os.path.join(script_dir, "interactions"))
+    parser.add_argument(
+        "--manifest",
+        default=os.path.join(script_dir, "manifests/interactions.json"),
+    )
+    parser.add_argument("--period", choices=sorted(PERIODS), default="month")
+    parser.add_argument("--max-shard-mb", type=int, default=100)
+    parser.add_argument("--gzip", action="store_true")
+    args = parser.parse_args()
+    if args.source == "seed":
+        if not args.input:
+            parser.error("seed needs --input")
+        # the import job reads every csv of the output folder, the input too
+        if contains(args.output, args.input):
+            parser.error(
+                f"{args.input} is in {args.output}, its rows would be imported twice"
+            )
+    elif not args.bucket:
+        parser.error("archive needs --bucket")
+
+    with ShardedDatasetWriter(
+        args.output,
+        args.manifest,
+        period=args.period,
+        max_shard_bytes=args.max_shard_mb * 1024 * 1024,
+        compress=args.gzip,
+    ) as writer:
+        if args.source == "seed":
+            name = os.path.relpath(
+                os.path.realpath(args.input),
+                os.path.dirname(os.path.realpath(args.manifest)),
+            )
+            source = writer.sources.setdefault(f"seed:{name}", {})
+            rows = new_csv_rows(csv_interactions(args.input), source)
+        else:
+            s3 = boto3.client("s3", region_name=DEPLOY_REGION)
+            source = writer.sources.setdefault(f"archive:{args.bucket}", {})
+            objects = s3_archive_objects(s3, args.bucket, args.prefix)
+            rows = archive_interactions(new_archive_objects(objects, source))
+        written = writer.write(rows)
+    print(f"Wrote {written} interactions to {len(writer.touched)} shards")
+    for key in sorted(writer.touched):
+        print(f"  {key}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+## Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+## SPDX-License-Identifier: MIT-0
+# Counts the interactions of each animal group in the interactions folder the
+# personalize import job reads (the seed csv and the shards written from the
+# event archive) and writes the top K groups of each species as the
+# popularity index the recommendation lambda falls back to.
+# usage: python seed_data/write_popularity_index.py [--top-k N] [--output path]
+import argparse, csv, gzip, os, sys
+
+script_dir = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.join(script_dir, "../animal_recommender/lambda/api"))
+
+from popularity_index import PopularityIndex
+
+TOP_K = 100
+
+
+def interaction_files(directory):
+    for root, _, names in os.walk(directory):
+        for name in sorted(names):
+            if name.endswith((".csv", ".csv.gz")):
+                yield os.path.join(root, name)
+
+
+def interacted_items(paths):
+    """ITEM_ID of every interaction row of the csv files."""
+    for path in paths:
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt", newline="") as fr:
+            for row in csv.DictReader(fr):
+                yield row["ITEM_ID"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write the popularity index")
+    parser.add_argument("--input", default=os.path.join(script_dir, "interactions"))
+    parser.add_argument(
+        "--output", default=os.path.join(script_dir, "popularity/index.json")
+    )
+    parser.add_argument("--top-k", type=int, default=TOP_K)
+    args = parser.parse_args()
+
+    index = PopularityIndex.from_interactions(
+        interacted_items(interaction_files(args.input)), args.top_k
+    )
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, "w") as fw:
+        fw.write(index.to_json())
+    print(
+        f"Wrote the {len(index)} most popular groups of "
+        f"{len(index.segments) - 1} segments to {args.output}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,10 @@ sys.path.append(os.path.join(script_dir, "../../animal_recommender/utils"))
 
 from constants import *
 
+sys.path.append(os.path.join(script_dir, "../.."))
+
+from animal_recommender.producer.kinesis_producer import KinesisEventProducer
+
 config = get_config()
 
 
@@ -121,6 +125,31 @@ def test_put_event_kinesis():
     assert response["ResponseMetadata"]["HTTPStatusCode"] == 200
 
 
+def test_put_events_batched_kinesis():
+    ssm = session.client(
+        "ssm",
+        region_name=DEPLOY_REGION,
+    )
+
+    steam_name = ssm.get_parameter(Name="/animal-recommender/kinesis-stream/name")[
+        "Parameter"
+    ]["Value"]
+
+    kinesis = session.client(
+        "kinesis",
+        region_name=DEPLOY_REGION,
+    )
+
+    event = read_put_event()["Data"]
+
+    with KinesisEventProducer(kinesis, steam_name) as producer:
+        for _ in range(10):
+            producer.put(event)
+        failed = producer.flush()
+
+    assert failed == []
+
+
 def read_get_recommendation():
     with open("./tests/data/get_recommendation.json", "r") as filehandle:
         recs = json.load(filehandle)
@@ -1,11 +1,16 @@
 ## Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
 ## SPDX-License-Identifier: MIT-0
+import os
+
 import aws_cdk as core
 import aws_cdk.assertions as assertions
 
 from animal_recommender.animal_recommender_stack import AnimalRecommenderStack
+from animal_recommender.components import serving
 from animal_recommender.utils.constants import *
 
+config = get_config()
+
 
 def test_lambdas_created():
     # Given
@@ -29,4 +34,267 @@ def test_lambdas_created():
         if resource["Type"] == "AWS::Lambda::Function"
     ]
 
-    assert len(lambdas) == 12
+    assert len(lambdas) == 13
+
+
+def test_put_events_reads_through_stream_consumer():
+    # Given
+    app = core.App()
+
+    # When
+    stack = AnimalRecommenderStack(
+        app,
+        "animal-recommender",
+        seed_bucket_name="example-seed-bucket",
+        env=core.Environment(account=ACCOUNT_ID, region="us-east-1"),
+    )
+    template = assertions.Template.from_stack(stack)
+
+    # Then
+    template.has_resource_properties(
+        "AWS::Lambda::EventSourceMapping",
+        {
+            "EventSourceArn": {
+                "Fn::GetAtt": [
+                    assertions.Match.string_like_regexp("recommenderstreamconsumer"),
+                    "ConsumerARN",
+                ]
+            },
+            "ParallelizationFactor": config["putEventsParallelizationFactor"],
+            "BatchSize": config["putEventsBatchSize"],
+        },
+    )
+
+
+def test_put_events_failures_go_to_dead_letter_queue():
+    # Given
+    app = core.App()
+
+    # When
+    stack = AnimalRecommenderStack(
+        app,
+        "animal-recommender",
+        seed_bucket_name="example-seed-bucket",
+        env=core.Environment(account=ACCOUNT_ID, region="us-east-1"),
+    )
+    template = assertions.Template.from_stack(stack)
+
+    # Then
+    template.has_resource_properties(
+        "AWS::SQS::Queue",
+        {"QueueName": f"{ENV_PREFIX}-recommender-put-events-dlq-sqs"},
+    )
+    template.has_resource_properties(
+        "AWS::Lambda::EventSourceMapping",
+        {
+            "FunctionResponseTypes": ["ReportBatchItemFailures"],
+            "BisectBatchOnFunctionError": True,
+            "MaximumRetryAttempts": config["putEventsRetryAttempts"],
+            "DestinationConfig": {
+                "OnFailure": {"Destination": assertions.Match.any_value()}
+            },
+        },
+    )
+
+
+def test_availability_is_kept_per_animal_in_dynamodb():
+    # Given
+    app = core.App()
+
+    # When
+    stack = AnimalRecommenderStack(
+        app,
+        "animal-recommender",
+        seed_bucket_name="example-seed-bucket",
+        env=core.Environment(account=ACCOUNT_ID, region="us-east-1"),
+    )
+    template = assertions.Template.from_stack(stack)
+
+    # Then
+    table_name = f"{ENV_PREFIX}-recommender-availability-ddb"
+    template.has_resource_properties(
+        "AWS::DynamoDB::Table",
+        {
+            "TableName": table_name,
+            "KeySchema": [{"AttributeName": "animal_id", "KeyType": "HASH"}],
+        },
+    )
+    for function_name in (
+        "recommender-put-events-lambda",
+        "recommender-get-recommendation-lambda",
+        "recommender-recommend-rerank-lambda",
+    ):
+        template.has_resource_properties(
+            "AWS::Lambda::Function",
+            {
+                "FunctionName": assertions.Match.string_like_regexp(function_name),
+                "Environment": {
+                    "Variables": assertions.Match.object_like(
+                        {"availability_table_name": assertions.Match.any_value()}
+                    )
+                },
+            },
+        )
+
+
+def test_component_resources_keep_stack_logical_ids():
+    # Given
+    app = core.App()
+    flat_stack = core.Stack(app, "flat")
+    flat_queue = sqs.Queue(
+        flat_stack, resource_name(sqs.Queue, "recommender-put-events-dlq")
+    )
+    flat_table = dynamodb.Table(
+        flat_stack,
+        resource_name(dynamodb.Table, "recommender-rerank-cursor"),
+        partition_key=dynamodb.Attribute(
+            name="cursor", type=dynamodb.AttributeType.STRING
+        ),
+    )
+
+    # When
+    stack = AnimalRecommenderStack(
+        app,
+        "animal-recommender",
+        seed_bucket_name="example-seed-bucket",
+        env=core.Environment(account=ACCOUNT_ID, region="us-east-1"),
+    )
+
+    # Then
+    assert stack.resolve(
+        stack.ingestion.dead_letter_queue.node.default_child.logical_id
+    ) == flat_stack.resolve(flat_queue.node.default_child.logical_id)
+    assert stack.resolve(
+        stack.serving.rerank_cursor_table.node.default_child.logical_id
+    ) == flat_stack.resolve(flat_table.node.default_child.logical_id)
+    assert (
+        stack.resolve(stack.datasets.personalize_dataset_group.logical_id)
+        == "devrecommenderdatasetgrouppdg"
+    )
+
+
+def test_lambda_bundles_only_ship_the_modules_the_handler_imports():
+    # Given
+    app = core.App()
+
+    # When
+    stack = AnimalRecommenderStack(
+        app,
+        "animal-recommender",
+        seed_bucket_name="example-seed-bucket",
+        env=core.Environment(account=ACCOUNT_ID, region="us-east-1"),
+    )
+    assembly = app.synth()
+
+    # Then
+    template = assembly.get_stack_by_name("animal-recommender").template
+
+    def bundled_files(function):
+        logical_id = stack.resolve(function.node.default_child.logical_id)
+        code = template["Resources"][logical_id]["Properties"]["Code"]
+        asset_hash = code["S3Key"].split(".")[0]
+        return os.listdir(os.path.join(assembly.directory, f"asset.{asset_hash}"))
+
+    assert sorted(bundled_files(stack.serving.get_recommendation_lambda)) == [
+        "availability_index.py",
+        "circuit_breaker.py",
+        "embedded_metrics.py",
+        "get_recommendation.py",
+        "hedging.py",
+        "init_hook.py",
+        "personalize_client.py",
+        "popularity_index.py",
+        "recommendation.py",
+        "request_coalescing.py",
+        "request_schema.py",
+        "serving_engine.py",
+    ]
+    assert sorted(bundled_files(stack.serving.get_reranking_lambda)) == [
+        "embedded_metrics.py",
+        "get_reranking.py",
+        "group_expansion.py",
+        "hedging.py",
+        "init_hook.py",
+        "personalize_client.py",
+        "post_ranking.py",
+        "request_schema.py",
+        "rerank_cursor.py",
+        "reranking.py",
+        "serving_engine.py",
+    ]
+    put_events_files = bundled_files(stack.ingestion.put_events_lambda)
+    assert "put_personalize_events.py" in put_events_files
+    assert "dead_letter.py" in put_events_files
+    assert "personalize_client.py" in put_events_files
+    assert "get_reranking.py" not in put_events_files
+
+
+def test_serving_lambdas_are_invoked_through_live_alias(monkeypatch):
+    # Given
+    app = core.App()
+    monkeypatch.setitem(serving.config, "getRecommendationProvisionedConcurrency", 2)
+    monkeypatch.setitem(
+        serving.config,
+        "getRecommendationConcurrencySchedule",
+        [
+            {
+                "name": "business-hours",
+                "schedule": "cron(0 8 ? * MON-FRI *)",
+                "minCapacity": 5,
+                "maxCapacity": 20,
+            }
+        ],
+    )
+    monkeypatch.setitem(serving.config, "servingArchitecture", "arm64")
+
+    # When
+    stack = AnimalRecommenderStack(
+        app,
+        "animal-recommender",
+        seed_bucket_name="example-seed-bucket",
+        env=core.Environment(account=ACCOUNT_ID, region="us-east-1"),
+    )
+    template = assertions.Template.from_stack(stack)
+
+    # Then
+    template.resource_count_is("AWS::Lambda::Alias", 3)
+    template.has_resource_properties(
+        "AWS::Lambda::Alias",
+        {
+            "Name": "live",
+            "ProvisionedConcurrencyConfig": {"ProvisionedConcurrentExecutions": 2},
+        },
+    )
+    template.has_resource_properties(
+        "AWS::Lambda::Function",
+        {
+            "Handler": "get_recommendation.lambda_handler",
+            "Architectures": ["arm64"],
+            "MemorySize": config["getRecommendationMemorySize"],
+        },
+    )
+    template.has_resource_properties(
+        "AWS::ApplicationAutoScaling::ScalableTarget",
+        {
+            "MinCapacity": 2,
+            "MaxCapacity": 20,
+            "ScheduledActions": [
+                {
+                    "ScheduledActionName": "business-hours",
+                    "Schedule": "cron(0 8 ? * MON-FRI *)",
+                    "ScalableTargetAction": {"MinCapacity": 5, "MaxCapacity": 20},
+                }
+            ],
+        },
+    )
+    template.has_resource_properties(
+        "AWS::SSM::Parameter",
+        {
+            "Name": config["getRecommendationNamePath"],
+            "Value": {
+                "Fn::Join": assertions.Match.array_with(
+                    [assertions.Match.array_with([":live"])]
+                )
+            },
+        },
+    )
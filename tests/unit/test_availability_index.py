@@ -0,0 +1,97 @@
+## Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+## SPDX-License-Identifier: MIT-0
+import os, sys
+
+script_dir = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.join(script_dir, "../../animal_recommender/lambda/api"))
+
+from availability_index import AvailabilityIndex, load_index, write_changes
+
+
+def test_filter_available():
+    index = AvailabilityIndex(["1-Siamese-1-1", "2-beagle-3-3", "2-pug-1-1"])
+    index.set_available("2-beagle-3-3", False)
+    index.set_available("1-Persian-2-2", False)
+
+    ranked = ["2-beagle-3-3", "1-Persian-2-2", "2-pug-1-1", "1-unknown-1-1"]
+
+    assert index.filter_available(ranked) == ["2-pug-1-1", "1-unknown-1-1"]
+    assert index.unavailable() == {"2-beagle-3-3", "1-Persian-2-2"}
+
+
+class StubDynamoDb:
+    """Conditional updates of the availability table, scanned in pages of two."""
+
+    class exceptions:
+        class ConditionalCheckFailedException(Exception):
+            pass
+
+    def __init__(self):
+        self.items = {}
+
+    def update_item(self, Key, ExpressionAttributeValues, **kwargs):
+        animal_id = Key["animal_id"]["S"]
+        changed_at = float(ExpressionAttributeValues[":changed_at"]["N"])
+        stored = self.items.get(animal_id)
+        if stored is not None and float(stored["changed_at"]["N"]) > changed_at:
+            raise self.exceptions.ConditionalCheckFailedException()
+        self.items[animal_id] = {
+            "animal_id": Key["animal_id"],
+            "group_id": ExpressionAttributeValues[":group_id"],
+            "available": ExpressionAttributeValues[":available"],
+            "changed_at": ExpressionAttributeValues[":changed_at"],
+        }
+
+    def scan(self, TableName, ExclusiveStartKey=None, **kwargs):
+        keys = sorted(self.items)
+        start = 0 if ExclusiveStartKey is None else keys.index(ExclusiveStartKey) + 1
+        page = {"Items": [self.items[key] for key in keys[start : start + 2]]}
+        if start + 2 < len(keys):
+            page["LastEvaluatedKey"] = keys[start + 1]
+        return page
+
+
+def test_consumers_of_different_shards_keep_each_others_changes():
+    dynamodb = StubDynamoDb()
+
+    # two consumers read their batches at the same time, the second one
+    # writes last but its change of the beagle is older
+    write_changes(dynamodb, "table", {"98765": ("2-beagle-3-3", False, 200.0)})
+    written = write_changes(
+        dynamodb,
+        "table",
+        {
+            "98765": ("2-beagle-3-3", True, 100.0),
+            "12": ("2-pug-1-1", False, 150.0),
+            "13": ("1-Siamese-1-1", False, 150.0),
+        },
+    )
+    index = load_index(dynamodb, "table")
+
+    assert written == 2
+    assert index.unavailable() == {"2-beagle-3-3", "2-pug-1-1", "1-Siamese-1-1"}
+    assert len(index) == 3
+
+
+def test_a_group_is_available_while_one_of_its_animals_is():
+    dynamodb = StubDynamoDb()
+    write_changes(
+        dynamodb,
+        "table",
+        {
+            "98765": ("2-beagle-3-3", True, 100.0),
+            "98766": ("2-beagle-3-3", True, 100.0),
+            "12": ("2-pug-1-1", True, 100.0),
+        },
+    )
+
+    # one of the beagles is adopted, the other one is still waiting
+    write_changes(dynamodb, "table", {"98765": ("2-beagle-3-3", False, 200.0)})
+    assert load_index(dynamodb, "table").unavailable() == set()
+
+    # a replayed batch does not count the adoption twice
+    write_changes(dynamodb, "table", {"98765": ("2-beagle-3-3", False, 200.0)})
+    assert load_index(dynamodb, "table").unavailable() == set()
+
+    write_changes(dynamodb, "table", {"98766": ("2-beagle-3-3", False, 300.0)})
+    assert load_index(dynamodb, "table").unavailable() == {"2-beagle-3-3"}
@@ -0,0 +1,197 @@
+## Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+## SPDX-License-Identifier: MIT-0
+import base64, json, os, sys
+
+from botocore.exceptions import ClientError
+
+script_dir = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.join(script_dir, "../../animal_recommender/lambda/api"))
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+import put_personalize_events
+from animal_recommender.producer.dead_letter_reprocessor import (
+    DeadLetterReprocessor,
+    RateLimiter,
+    put_records_chunks,
+)
+from dead_letter import LocalDeadLetterQueue
+from dedup_window import DedupWindow
+
+
+class StubSsm:
+    def get_parameter(self, Name):
+        return {"Parameter": {"Value": "tracking-id"}}
+
+
+class StubPersonalizeEvents:
+    def __init__(self, throttle_once=()):
+        self.events = []
+        self.throttle_once = set(throttle_once)
+
+    def put_events(self, sessionId, eventList, **kwargs):
+        if sessionId in self.throttle_once:
+            self.throttle_once.discard(sessionId)
+            raise ClientError(
+                {"Error": {"Code": "ThrottlingException", "Message": "Rate exceeded"}},
+                "PutEvents",
+            )
+        self.events.append(sessionId)
+
+
+class StubKinesis:
+    def __init__(self, reject=()):
+        self.records = []
+        self.reject = set(reject)
+
+    def put_records(self, StreamName, Records):
+        results = []
+        for record in Records:
+            if record["PartitionKey"] in self.reject:
+                results.append({"ErrorCode": "ProvisionedThroughputExceededException"})
+            else:
+                self.records.append(record)
+                results.append({"SequenceNumber": "1", "ShardId": "shardId-0"})
+        failed = sum(1 for result in results if "ErrorCode" in result)
+        return {"FailedRecordCount": failed, "Records": results}
+
+
+def kinesis_record(sequence_number, session_id, payload=None):
+    if payload is None:
+        payload = {
+            "sessionId": session_id,
+            "eventType": "DetailView",
+            "animalMetadata": {
+                "animal_species_id": "1",
+                "animal_primary_breed_id": "Russian_Blue",
+                "animal_size_id": "1",
+                "animal_age_id": "4",
+            },
+        }
+    return {
+        "eventSourceARN": "arn:aws:kinesis:us-east-1:123456789012:stream/test",
+        "kinesis": {
+            "partitionKey": session_id,
+            "sequenceNumber": sequence_number,
+            "data": base64.b64encode(json.dumps(payload).encode()).decode(),
+        },
+    }
+
+
+def handle(monkeypatch, records, personalize_events, queue):
+    monkeypatch.setattr(put_personalize_events, "ssm", StubSsm())
+    monkeypatch.setattr(put_personalize_events, "dead_letter_queue", queue)
+    monkeypatch.setattr(
+        put_personalize_events, "personalize_events", personalize_events
+    )
+    return put_personalize_events.lambda_handler({"Records": records}, None)
+
+
+def test_poison_records_are_dead_lettered(monkeypatch):
+    personalize_events = StubPersonalizeEvents()
+    queue = LocalDeadLetterQueue()
+    records = [
+        kinesis_record("1", "s1"),
+        kinesis_record("2", "s2", payload={"sessionId": "s2"}),
+        kinesis_record("3", "s3"),
+    ]
+
+    response = handle(monkeypatch, records, personalize_events, queue)
+
+    assert response == {"batchItemFailures": []}
+    assert personalize_events.events == ["s1", "s3"]
+    [(_, entry)] = queue.receive()
+    assert entry["reason"] == "KeyError: 'eventType'"
+    assert entry["reprocessable"] is False
+    assert entry["sequenceNumber"] == "2"
+    assert entry["data"] == records[1]["kinesis"]["data"]
+
+
+def test_throttled_record_is_retried_not_deduplicated(monkeypatch):
+    personalize_events = StubPersonalizeEvents(throttle_once={"s2"})
+    queue = LocalDeadLetterQueue()
+    monkeypatch.setattr(put_personalize_events, "dedup_window", DedupWindow(30))
+    records = [
+        kinesis_record("1", "s1"),
+        kinesis_record("2", "s2"),
+        kinesis_record("3", "s3"),
+    ]
+
+    first = handle(monkeypatch, records, personalize_events, queue)
+    retry = handle(monkeypatch, records[1:], personalize_events, queue)
+
+    assert first == {"batchItemFailures": [{"itemIdentifier": "2"}]}
+    assert retry == {"batchItemFailures": []}
+    assert personalize_events.events == ["s1", "s2", "s3"]
+    assert len(queue) == 0
+
+
+def test_reprocessor_drains_queue_and_keeps_failures():
+    queue = LocalDeadLetterQueue()
+    queue.put(
+        [
+            {
+                "reason": "ClientError: ResourceNotFoundException",
+                "reprocessable": True,
+                "partitionKey": f"s{i}",
+                "data": base64.b64encode(b"{}").decode(),
+            }
+            for i in range(25)
+        ]
+        + [
+            {
+                "reason": "KeyError: 'eventType'",
+                "reprocessable": False,
+                "partitionKey": f"poison{i}",
+                "data": base64.b64encode(b"{}").decode(),
+            }
+            for i in range(2)
+        ]
+    )
+    kinesis = StubKinesis(reject={"s7"})
+    reprocessor = DeadLetterReprocessor(
+        queue, kinesis, "stream", workers=3, max_retries=0
+    )
+
+    summary = reprocessor.run()
+
+    assert summary == {"reprocessed": 24, "failed": 1, "skipped": 2}
+    assert len(kinesis.records) == 24
+    assert sorted(entry["partitionKey"] for entry in queue.inflight.values()) == [
+        "poison0",
+        "poison1",
+        "s7",
+    ]
+
+
+def test_reprocessed_records_are_put_within_the_api_limits():
+    small = [{"Data": b"{}", "PartitionKey": f"s{i}"} for i in range(1001)]
+    large = [{"Data": b"x" * 2 * 1024 * 1024, "PartitionKey": "s"} for _ in range(5)]
+
+    assert [len(chunk) for chunk in put_records_chunks(small)] == [500, 500, 1]
+    assert [len(chunk) for chunk in put_records_chunks(large)] == [2, 2, 1]
+
+
+def test_rate_limiter_waits_for_tokens():
+    now = [0.0]
+    waits = []
+
+    def sleep(seconds):
+        waits.append(seconds)
+        now[0] += seconds
+
+    limiter = RateLimiter(10, clock=lambda: now[0], sleep=sleep)
+    for _ in range(3):
+        limiter.acquire(10)
+
+    assert sum(waits) == 2.0
+
+
+def test_aggregated_events_are_sent_once(monkeypatch):
+    personalize_events = StubPersonalizeEvents()
+    monkeypatch.setattr(put_personalize_events, "aggregation_mode", "count")
+    records = [kinesis_record(str(i), "s1") for i in range(5)]
+
+    response = handle(monkeypatch, records, personalize_events, LocalDeadLetterQueue())
+
+    assert response == {"batchItemFailures": []}
+    assert personalize_events.events == ["s1"]
@@ -0,0 +1,61 @@
+## Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+## SPDX-License-Identifier: MIT-0
+import os, sys
+
+script_dir = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.join(script_dir, "../../animal_recommender/lambda/api"))
+
+from dedup_window import BloomFilter, DedupWindow
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_duplicates_within_window_are_seen():
+    clock = Clock()
+    window = DedupWindow(10, capacity=1000, clock=clock)
+
+    assert not window.seen("s1", "10001", "2-Pug-4-2", "DetailView")
+    assert not window.seen("s1", None, "2-Pug-4-2", "DetailView")
+    clock.now = 9
+    assert window.seen("s1", "10001", "2-Pug-4-2", "DetailView")
+    assert window.duplicates == 1
+
+
+def test_fingerprints_expire_after_window():
+    clock = Clock()
+    window = DedupWindow(10, capacity=1000, clock=clock)
+
+    window.seen("s1", "10001", "2-Pug-4-2", "DetailView")
+    clock.now = 16
+    window.seen("s2", "10002", "2-Pug-4-2", "DetailView")
+    clock.now = 21
+
+    assert not window.seen("s1", "10001", "2-Pug-4-2", "DetailView")
+    assert window.seen("s2", "10002", "2-Pug-4-2", "DetailView")
+
+
+def test_memory_is_bounded():
+    window = DedupWindow(60, capacity=100, clock=Clock())
+
+    unique = sum(
+        not window.seen("s", str(i), "item", "DetailView") for i in range(1000)
+    )
+
+    assert len(window.generations) <= 3
+    # a few false positives are allowed
+    assert unique > 990
+
+
+def test_bloom_filter_add_new():
+    bloom = BloomFilter(100, 0.001)
+
+    assert bloom.add_new(b"a")
+    assert not bloom.add_new(b"a")
+    assert b"a" in bloom
+    assert bloom.count == 1
@@ -0,0 +1,68 @@
+## Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+## SPDX-License-Identifier: MIT-0
+import os, sys, pytest
+
+script_dir = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.join(script_dir, "../../animal_recommender/lambda/api"))
+
+from event_aggregation import aggregate_events
+
+
+def event(event_type, item_id="1-Pug-2-2", session_id="s1", sent_at=0):
+    return {
+        "userId": "10001",
+        "sessionId": session_id,
+        "eventType": event_type,
+        "itemId": item_id,
+        "sentAt": sent_at,
+    }
+
+
+BATCH = [
+    event("DetailView", sent_at=1),
+    event("DetailView", item_id="2-Pug-2-2", sent_at=2),
+    event("DetailView", sent_at=3),
+    event("favorite", sent_at=4),
+    event("DetailView", session_id="s2", sent_at=5),
+    event("AIF", sent_at=6),
+]
+
+
+def test_none_sends_every_event():
+    aggregated = aggregate_events(list(enumerate(BATCH)), "none")
+
+    assert [positions for positions, _ in aggregated] == [[i] for i in range(6)]
+    assert "eventValue" not in aggregated[0][1]
+
+
+def test_count_collapses_repeated_events():
+    aggregated = aggregate_events(list(enumerate(BATCH)), "count")
+
+    assert [
+        (positions, e["eventType"], e["eventValue"], e["sentAt"])
+        for positions, e in aggregated
+    ] == [
+        ([0, 2], "DetailView", 2.0, 3),
+        ([1], "DetailView", 1.0, 2),
+        ([3], "favorite", 1.0, 4),
+        ([4], "DetailView", 1.0, 5),
+        ([5], "AIF", 1.0, 6),
+    ]
+
+
+def test_ranked_keeps_the_strongest_event_type():
+    aggregated = aggregate_events(list(enumerate(BATCH)), "ranked")
+
+    assert [
+        (positions, e["itemId"], e["sessionId"], e["eventType"], e["eventValue"])
+        for positions, e in aggregated
+    ] == [
+        ([0, 2, 3, 5], "1-Pug-2-2", "s1", "AIF", 4.0),
+        ([1], "2-Pug-2-2", "s1", "DetailView", 1.0),
+        ([4], "1-Pug-2-2", "s2", "DetailView", 1.0),
+    ]
+
+
+def test_invalid_mode():
+    with pytest.raises(ValueError):
+        aggregate_events([], "sum")
@@ -0,0 +1,55 @@
+## Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+## SPDX-License-Identifier: MIT-0
+import json, os, sys, pytest
+
+script_dir = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.join(script_dir, "../../animal_recommender/lambda/api"))
+
+from event_envelope import EnvelopeError, decode_event, deserialize_record, encode_event
+
+
+def read_put_event(name="put_event.json"):
+    with open(os.path.join(script_dir, "../data", name)) as filehandle:
+        return json.load(filehandle)["Data"]
+
+
+def test_round_trip():
+    for name in ["put_event.json", "put_event_no_user.json"]:
+        event = read_put_event(name)
+        envelope = encode_event(event)
+
+        assert deserialize_record(envelope) == event
+        assert len(envelope) < len(json.dumps(event)) / 3
+
+
+def test_literals_and_optional_fields():
+    event = {
+        "sessionId": "s1",
+        "eventType": "AvailabilityChange",
+        "available": False,
+        "timestamp": 1656408773.5,
+        "animalMetadata": {
+            "animal_species_id": "3",
+            "animal_primary_breed_id": "Norwegian_Forest",
+            "animal_size_id": "01",
+            "animal_age_id": "300",
+        },
+    }
+
+    assert decode_event(encode_event(event)) == event
+
+
+def test_legacy_json_is_accepted():
+    event = read_put_event()
+
+    assert deserialize_record(json.dumps(event).encode("utf-8")) == event
+
+
+def test_rejects_unknown_versions():
+    envelope = bytearray(encode_event(read_put_event()))
+    envelope[1] = 2
+    with pytest.raises(EnvelopeError):
+        decode_event(bytes(envelope))
+
+    with pytest.raises(EnvelopeError):
+        decode_event(encode_event(read_put_event())[:-3])
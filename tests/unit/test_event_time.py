@@ -0,0 +1,60 @@
+## Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+## SPDX-License-Identifier: MIT-0
+import datetime, os, sys, pytest
+
+script_dir = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.join(script_dir, "../../animal_recommender/lambda/api"))
+
+from event_time import LatenessPolicy, event_timestamp
+
+NOW = 1656408773.0
+
+
+def test_event_timestamp_sources():
+    kinesis_record = {"approximateArrivalTimestamp": NOW - 5}
+
+    assert event_timestamp({"timestamp": NOW - 60}, kinesis_record, NOW) == NOW - 60
+    assert event_timestamp({"timestamp": (NOW - 60) * 1000}, {}, NOW) == NOW - 60
+    assert event_timestamp({"timestamp": "bad"}, kinesis_record, NOW) == NOW - 5
+    assert event_timestamp({}, {}, NOW) == NOW
+
+
+@pytest.mark.parametrize("timestamp", ["NaN", "inf", float("-inf"), float("nan")])
+def test_timestamps_that_are_not_finite_are_invalid(timestamp):
+    kinesis_record = {"approximateArrivalTimestamp": NOW - 5}
+
+    assert event_timestamp({"timestamp": timestamp}, kinesis_record, NOW) == NOW - 5
+    sent_at = LatenessPolicy().sent_at(
+        event_timestamp({"timestamp": timestamp}, {}, NOW), NOW
+    )
+    assert sent_at == datetime.datetime.fromtimestamp(NOW, tz=datetime.timezone.utc)
+
+
+@pytest.mark.parametrize(
+    "policy, expected",
+    [
+        ("accept", NOW - 7200),
+        ("clamp", NOW - 3600),
+        ("archive", None),
+    ],
+)
+def test_late_event_policies(policy, expected):
+    lateness_policy = LatenessPolicy(policy, max_lateness_seconds=3600)
+
+    sent_at = lateness_policy.sent_at(NOW - 7200, NOW)
+
+    if expected is None:
+        assert sent_at is None
+    else:
+        assert sent_at.timestamp() == expected
+    assert lateness_policy.late_events == 1
+
+
+def test_on_time_and_future_events():
+    lateness_policy = LatenessPolicy("archive", max_lateness_seconds=3600)
+
+    assert lateness_policy.sent_at(NOW - 60, NOW).timestamp() == NOW - 60
+    assert lateness_policy.sent_at(NOW + 60, NOW) == datetime.datetime.fromtimestamp(
+        NOW, tz=datetime.timezone.utc
+    )
+    assert lateness_policy.late_events == 0
@@ -0,0 +1,49 @@
+## Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+## SPDX-License-Identifier: MIT-0
+from itertools import islice
+import os, sys
+
+script_dir = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.join(script_dir, "../../animal_recommender/lambda/api"))
+
+from group_expansion import GroupExpander
+
+INVERSE_MAPPING = {
+    "2-beagle-3-3": [
+        ("b1", {"intake_timestamp": "300"}),
+        ("b2", {"intake_timestamp": "100"}),
+        ("b3", {}),
+        ("b4", {"intake_timestamp": "200"}),
+    ],
+    "1-Siamese-1-1": [("s1", {}), ("s2", {})],
+}
+RANKED_GROUPS = ["2-beagle-3-3", "1-Siamese-1-1"]
+GROUP_SCORES = {"2-beagle-3-3": 0.5, "1-Siamese-1-1": 0.25}
+
+
+def test_concatenate_orders_within_group_by_signal():
+    expander = GroupExpander(signal_key="intake_timestamp")
+
+    ranking = list(expander.expand(RANKED_GROUPS, INVERSE_MAPPING))
+
+    assert ranking == ["b2", "b4", "b1", "b3", "s1", "s2"]
+
+
+def test_round_robin_interleaves_by_score():
+    expander = GroupExpander(strategy="round_robin")
+
+    ranking = list(expander.expand(RANKED_GROUPS, INVERSE_MAPPING, GROUP_SCORES))
+
+    assert ranking == ["b1", "s1", "b2", "b3", "s2", "b4"]
+
+
+def test_expansion_is_lazy():
+    expander = GroupExpander(strategy="round_robin")
+    inverse_mapping = dict(INVERSE_MAPPING, **{"2-pug-1-1": [None]})
+
+    # the pug group would fail to expand if it were reached
+    ranking = expander.expand(
+        RANKED_GROUPS + ["2-pug-1-1"], inverse_mapping, GROUP_SCORES
+    )
+
+    assert list(islice(ranking, 2)) == ["b1", "s1"]
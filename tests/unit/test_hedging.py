@@ -0,0 +1,54 @@
+## Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+## SPDX-License-Identifier: MIT-0
+import os, sys, threading, time
+
+script_dir = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.join(script_dir, "../../animal_recommender/lambda/api"))
+
+from embedded_metrics import Metrics
+from hedging import Hedger
+
+
+def test_stalled_call_is_answered_by_its_hedge():
+    metrics = Metrics("test")
+    hedger = Hedger(metrics, initial_delay_seconds=0.01)
+    stalled = threading.Event()
+    calls = []
+
+    def call(request):
+        calls.append(request)
+        if len(calls) == 1:
+            stalled.wait(5)
+            return "first"
+        return "hedge"
+
+    start = time.monotonic()
+    result = hedger.call("/campaign", call, "request")
+    elapsed = time.monotonic() - start
+    stalled.set()
+
+    assert result == "hedge"
+    assert calls == ["request", "request"]
+    assert elapsed < 1
+    assert metrics.counts == {"HedgedCalls": 1, "HedgeWins": 1}
+
+
+def test_delay_follows_the_recent_latency_percentile():
+    hedger = Hedger(Metrics("test"), initial_delay_seconds=0.5, min_samples=20)
+
+    assert hedger.delay("/campaign") == 0.5
+    for i in range(100):
+        hedger.windows["/campaign"].record(i / 1000)
+
+    assert hedger.delay("/campaign") == 0.094
+    assert hedger.delay("/rerank-campaign") == 0.5
+
+
+def test_fast_calls_are_not_hedged():
+    metrics = Metrics("test")
+    hedger = Hedger(metrics, initial_delay_seconds=1)
+    calls = []
+
+    assert hedger.call("/campaign", lambda: calls.append(1) or "answer") == "answer"
+    assert calls == [1]
+    assert metrics.counts == {}
@@ -0,0 +1,36 @@
+## Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+## SPDX-License-Identifier: MIT-0
+import os, sys
+
+import pytest
+
+script_dir = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.join(script_dir, "../../animal_recommender/lambda/api"))
+
+from init_hook import PROVISIONED_CONCURRENCY, run_init_hook, should_prewarm
+
+
+def test_provisioned_mode_only_prewarms_provisioned_concurrency_inits():
+    assert should_prewarm("provisioned", PROVISIONED_CONCURRENCY)
+    assert not should_prewarm("provisioned", "on-demand")
+    assert should_prewarm("always", "on-demand")
+    assert not should_prewarm("never", PROVISIONED_CONCURRENCY)
+    with pytest.raises(ValueError):
+        should_prewarm("sometimes", "on-demand")
+
+
+def test_failing_step_is_left_to_the_first_request():
+    calls = []
+
+    def load_campaign_arn():
+        raise RuntimeError("parameter not found")
+
+    def create_client():
+        calls.append("client")
+
+    assert run_init_hook(load_campaign_arn, create_client, mode="always") == [
+        "create_client"
+    ]
+    assert calls == ["client"]
+    assert run_init_hook(create_client, mode="never") == []
+    assert calls == ["client"]
@@ -0,0 +1,160 @@
+## Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+## SPDX-License-Identifier: MIT-0
+import asyncio, json, threading
+
+from animal_recommender.producer.kinesis_producer import (
+    AsyncKinesisEventProducer,
+    KinesisEventProducer,
+    RecordBatcher,
+    send_batch,
+)
+
+
+class StubKinesis:
+    """Records put_records calls and rejects the first attempt of selected records."""
+
+    def __init__(self, reject_once=()):
+        self.calls = []
+        self.reject_once = set(reject_once)
+
+    def put_records(self, StreamName, Records):
+        self.calls.append([json.loads(record["Data"]) for record in Records])
+        results = []
+        for record in Records:
+            session_id = json.loads(record["Data"])["sessionId"]
+            if session_id in self.reject_once:
+                self.reject_once.discard(session_id)
+                results.append({"ErrorCode": "ProvisionedThroughputExceededException"})
+            else:
+                results.append({"SequenceNumber": "1", "ShardId": "shardId-0"})
+        failed = sum(1 for result in results if "ErrorCode" in result)
+        return {"FailedRecordCount": failed, "Records": results}
+
+
+class FailingKinesis:
+    """put_records raises for the first failures calls."""
+
+    def __init__(self, failures):
+        self.failures = failures
+        self.calls = 0
+
+    def put_records(self, StreamName, Records):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise ConnectionError("Connection reset by peer")
+        return {"FailedRecordCount": 0, "Records": [{} for _ in Records]}
+
+
+def event(session_id):
+    return {
+        "sessionId": session_id,
+        "eventType": "DetailView",
+        "animalMetadata": {
+            "animal_species_id": "1",
+            "animal_primary_breed_id": "Russian_Blue",
+            "animal_size_id": "1",
+            "animal_age_id": "4",
+        },
+    }
+
+
+def test_batcher_splits_at_record_limit():
+    batcher = RecordBatcher()
+    full_batches = [batcher.add(event(str(i)), now=0) for i in range(501)]
+
+    full = [batch for batch in full_batches if batch]
+    assert len(full) == 1
+    assert len(full[0]) == 500
+    assert full[0][0]["PartitionKey"] == "0"
+    assert len(batcher) == 1
+
+
+def test_send_batch_retries_only_failed_records():
+    kinesis = StubKinesis(reject_once={"b"})
+    records = RecordBatcher()
+    for session_id in "abc":
+        records.add(event(session_id), now=0)
+
+    failed = send_batch(kinesis, "stream", records.drain(), sleep=lambda _: None)
+
+    assert failed == []
+    assert [[e["sessionId"] for e in call] for call in kinesis.calls] == [
+        ["a", "b", "c"],
+        ["b"],
+    ]
+
+
+def test_send_batch_retries_calls_that_raise():
+    records = RecordBatcher()
+    records.add(event("a"), now=0)
+    records = records.drain()
+
+    assert send_batch(FailingKinesis(1), "stream", records, sleep=lambda _: None) == []
+
+    failed = send_batch(
+        FailingKinesis(4), "stream", records, max_retries=3, sleep=lambda _: None
+    )
+    assert [record["ErrorCode"] for record in failed] == ["ConnectionError"]
+
+
+def test_flusher_reports_failures_and_keeps_running():
+    reported = []
+    report = threading.Semaphore(0)
+
+    def on_failure(failed):
+        reported.append(failed)
+        report.release()
+
+    producer = KinesisEventProducer(
+        FailingKinesis(2), "stream", max_retries=0, on_failure=on_failure
+    )
+    producer.put(event("a"))
+    assert report.acquire(timeout=5)
+    producer.put(event("b"))
+    assert report.acquire(timeout=5)
+    producer.put(event("c"))
+
+    assert producer.close() == []
+    assert producer.flusher.is_alive() is False
+    assert [len(failed) for failed in reported] == [1, 1]
+
+
+def test_producer_flushes_on_close():
+    kinesis = StubKinesis()
+    with KinesisEventProducer(kinesis, "stream") as producer:
+        for i in range(1200):
+            producer.put(event(str(i)))
+
+    assert sum(len(call) for call in kinesis.calls) == 1200
+    assert all(len(call) <= 500 for call in kinesis.calls)
+
+
+def test_async_producer():
+    kinesis = StubKinesis()
+
+    async def produce():
+        async with AsyncKinesisEventProducer(kinesis, "stream") as producer:
+            for i in range(10):
+                await producer.put(event(str(i)))
+
+    asyncio.run(produce())
+
+    assert [len(call) for call in kinesis.calls] == [10]
+
+
+def test_async_flush_waits_for_every_batch():
+    kinesis = StubKinesis(reject_once={"0"})
+
+    def on_failure(failed):
+        raise RuntimeError("failure handler is broken")
+
+    async def produce():
+        producer = AsyncKinesisEventProducer(
+            kinesis, "stream", max_retries=0, on_failure=on_failure
+        )
+        for i in range(600):
+            await producer.put(event(str(i)))
+        await producer.flush()
+
+    asyncio.run(produce())
+    assert sum(len(call) for call in kinesis.calls) == 600
@@ -0,0 +1,85 @@
+## Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+## SPDX-License-Identifier: MIT-0
+import json, os, sys, threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import boto3
+import pytest
+
+script_dir = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.join(script_dir, "../../animal_recommender/lambda/api"))
+
+from embedded_metrics import Metrics
+from personalize_client import ConnectionStats, client_config
+
+
+class PersonalizeHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        body = json.dumps({"itemList": [{"itemId": "2-Pug-2-2"}]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def endpoint_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), PersonalizeHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_warm_calls_reuse_the_pooled_connection(endpoint_url):
+    client = boto3.client(
+        "personalize-runtime",
+        region_name="us-east-1",
+        endpoint_url=endpoint_url,
+        aws_access_key_id="test",
+        aws_secret_access_key="test",
+        config=client_config(max_pool_connections=4),
+    )
+    stats = ConnectionStats(client)
+    metrics = Metrics("test")
+
+    for _ in range(4):
+        client.get_recommendations(campaignArn="arn:campaign", userId="1")
+    stats.record(metrics)
+    client.get_recommendations(campaignArn="arn:campaign", userId="1")
+    stats.record(metrics)
+
+    assert metrics.counts == {
+        "PersonalizeRequests": 5,
+        "PersonalizeNewConnections": 1,
+        "PersonalizeConnectionReuseRate": 100.0,
+    }
+    assert metrics.units == {"PersonalizeConnectionReuseRate": "Percent"}
+
+
+def test_unknown_retry_mode_is_rejected(monkeypatch):
+    monkeypatch.setenv("personalize_retry_mode", "eager")
+
+    with pytest.raises(ValueError):
+        client_config()
+
+
+def test_stand_in_clients_are_not_counted():
+    class StandIn:
+        def __getattr__(self, name):
+            raise KeyError(name)
+
+    metrics = Metrics("test")
+
+    ConnectionStats(StandIn()).record(metrics)
+
+    assert metrics.counts == {}
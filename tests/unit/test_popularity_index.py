@@ -0,0 +1,143 @@
+## Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+## SPDX-License-Identifier: MIT-0
+import json, os, sys, threading
+
+import pytest
+from botocore.exceptions import ClientError
+
+script_dir = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.join(script_dir, "../../animal_recommender/lambda/api"))
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from popularity_index import PopularityIndex
+from recommendation import RecommendOperation
+from serving_engine import CampaignResolver, ServingEngine
+
+
+class StubSsm:
+    def get_parameter(self, Name):
+        return {"Parameter": {"Value": f"arn:{Name}"}}
+
+
+class FailingPersonalizeRuntime:
+    def __init__(self, error=None, delay=None):
+        self.calls = 0
+        self.error = error
+        self.delay = delay
+
+    def get_recommendations(self, campaignArn, userId, numResults):
+        self.calls += 1
+        if self.delay:
+            self.delay.wait(5)
+        if self.error:
+            raise self.error
+        return {"itemList": [{"itemId": "2-Pug-2-2"}]}
+
+
+def throttling():
+    return ClientError({"Error": {"Code": "ThrottlingException"}}, "GetRecommendations")
+
+
+def recommend_with_fallback(runtime, breaker, latency_budget_seconds=5):
+    engine = ServingEngine(CampaignResolver(StubSsm()))
+    engine.runtime = runtime
+    recommend = RecommendOperation(
+        "/campaign", breaker=breaker, latency_budget_seconds=latency_budget_seconds
+    )
+    recommend.popularity_index = PopularityIndex.from_interactions(
+        ["2-Beagle-1-1"] * 3 + ["1-Siamese-1-1"] * 2 + ["2-Pug-2-2"]
+    )
+    return engine, recommend
+
+
+def test_index_keeps_the_top_k_of_each_species():
+    index = PopularityIndex.from_interactions(
+        ["2-Beagle-1-1"] * 3 + ["1-Siamese-1-1"] * 2 + ["2-Pug-2-2", "2-Akita-1-1"],
+        top_k=2,
+    )
+
+    restored = PopularityIndex.from_json(index.to_json())
+
+    assert restored.top(10) == ["2-Beagle-1-1", "1-Siamese-1-1"]
+    assert restored.top(10, "2") == ["2-Beagle-1-1", "2-Akita-1-1"]
+    assert restored.top(1, "1") == ["1-Siamese-1-1"]
+    assert restored.top(10, "9") == ["2-Beagle-1-1", "1-Siamese-1-1"]
+
+
+def test_breaker_opens_after_consecutive_failures_and_closes_after_a_trial():
+    now = [0.0]
+    breaker = CircuitBreaker(failure_threshold=2, open_seconds=10, clock=lambda: now[0])
+
+    breaker.record_failure()
+    assert breaker.allows()
+    breaker.record_failure()
+    assert breaker.state == OPEN and not breaker.allows()
+
+    now[0] = 10.0
+    assert breaker.allows() and breaker.state == HALF_OPEN
+    # only one trial call while half open
+    assert not breaker.allows()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+
+    now[0] = 20.0
+    assert breaker.allows()
+    breaker.record_success()
+    assert breaker.state == CLOSED and breaker.allows()
+
+
+def test_throttled_recommendations_are_served_from_the_popularity_index():
+    runtime = FailingPersonalizeRuntime(error=throttling())
+    engine, recommend = recommend_with_fallback(
+        runtime, CircuitBreaker(failure_threshold=1)
+    )
+
+    throttled = engine.handle(recommend, {"body": {"userId": "12345", "limit": 2}})
+    circuit_open = engine.handle(recommend, {"body": {"segment": "1"}})
+
+    assert throttled["statusCode"] == 200
+    assert json.loads(throttled["body"]) == [
+        {"id": "2-Beagle-1-1"},
+        {"id": "1-Siamese-1-1"},
+    ]
+    assert json.loads(circuit_open["body"]) == [{"id": "1-Siamese-1-1"}]
+    assert runtime.calls == 1
+
+
+def test_slow_recommendations_are_answered_within_the_latency_budget():
+    release = threading.Event()
+    runtime = FailingPersonalizeRuntime(delay=release)
+    engine, recommend = recommend_with_fallback(
+        runtime, CircuitBreaker(), latency_budget_seconds=0.05
+    )
+
+    response = engine.handle(recommend, {"body": {"limit": 1}})
+    release.set()
+
+    assert json.loads(response["body"]) == [{"id": "2-Beagle-1-1"}]
+    assert recommend.breaker.failures == 1
+
+
+def test_trial_call_that_raises_reopens_the_breaker():
+    for latency_budget_seconds in (5, None):
+        now = [0.0]
+        breaker = CircuitBreaker(
+            failure_threshold=1, open_seconds=10, clock=lambda: now[0]
+        )
+        runtime = FailingPersonalizeRuntime(error=KeyError("itemList"))
+        engine, recommend = recommend_with_fallback(
+            runtime, breaker, latency_budget_seconds=latency_budget_seconds
+        )
+        breaker.record_failure()
+
+        now[0] = 10.0
+        with pytest.raises(KeyError):
+            engine.handle(recommend, {"body": {"limit": 1}})
+        assert breaker.state == OPEN and runtime.calls == 1
+
+        now[0] = 20.0
+        runtime.error = None
+        response = engine.handle(recommend, {"body": {"limit": 1}})
+        assert json.loads(response["body"]) == [{"id": "2-Pug-2-2"}]
+        assert breaker.state == CLOSED
@@ -0,0 +1,69 @@
+## Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+## SPDX-License-Identifier: MIT-0
+import os, sys
+
+script_dir = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.join(script_dir, "../../animal_recommender/lambda/api"))
+
+from post_ranking import PostRanker, parse_item_values
+
+NOW = 1656408773
+
+
+def item(item_id, group_id, breed, days_waiting=None):
+    metadata = {"animal_primary_breed_id": breed}
+    if days_waiting is not None:
+        metadata["intake_timestamp"] = str(NOW - days_waiting * 86400)
+    return (item_id, group_id, metadata)
+
+
+def test_blends_personalize_score_and_catalog_features():
+    items = [
+        item("1", "2-beagle-3-3", "beagle", days_waiting=0),
+        item("2", "2-pug-1-1", "pug", days_waiting=365),
+        item("3", "1-Siamese-1-1", "Siamese"),
+        item("4", "1-Persian-1-1", "Persian"),
+    ]
+    group_scores = {"2-beagle-3-3": 0.5, "2-pug-1-1": 0.4, "1-Siamese-1-1": 0.1}
+
+    assert PostRanker().rank(items, group_scores, now=NOW) == ["1", "2", "3", "4"]
+
+    ranker = PostRanker(
+        item_value_weight=1.0,
+        waiting_weight=0.2,
+        item_values={"1-Siamese-1-1": 0.5},
+    )
+    assert ranker.rank(items, group_scores, now=NOW) == ["2", "3", "1", "4"]
+
+
+def test_max_per_breed_defers_items():
+    items = [
+        item("1", "2-beagle-3-3", "beagle"),
+        item("2", "2-beagle-3-3", "beagle"),
+        item("3", "2-beagle-1-1", "beagle"),
+        item("4", "2-pug-1-1", "pug"),
+    ]
+    group_scores = {"2-beagle-3-3": 0.6, "2-beagle-1-1": 0.3, "2-pug-1-1": 0.1}
+
+    ranker = PostRanker(max_per_breed=1)
+    assert ranker.rank(items, group_scores, now=NOW) == ["1", "4", "2", "3"]
+
+
+def test_unparseable_intake_timestamps_count_as_missing():
+    items = [
+        ("1", "2-beagle-3-3", {"intake_timestamp": "2024-01-01"}),
+        ("2", "2-beagle-3-3", {"intake_timestamp": {"seconds": NOW}}),
+        item("3", "2-beagle-3-3", "beagle", days_waiting=30),
+    ]
+
+    ranker = PostRanker(waiting_weight=0.2)
+    assert ranker.rank(items, {"2-beagle-3-3": 0.5}, now=NOW) == ["3", "1", "2"]
+
+
+def test_parse_item_values():
+    items_csv = (
+        "ANIMAL_TYPE,ANIMAL_AGE,ANIMAL_SIZE,ANIMAL_BREED,ITEM_VALUE,ITEM_ID,CREATION_TIMESTAMP\n"
+        "2,1,1,English_Setter,0.1,2-English_Setter-1-1,15000000\n"
+        "2,2,1,English_Setter,,2-English_Setter-1-2,15000000\n"
+    )
+    assert parse_item_values(items_csv) == {"2-English_Setter-1-1": 0.1}
@@ -0,0 +1,190 @@
+## Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+## SPDX-License-Identifier: MIT-0
+import json, os, sys, threading
+
+from botocore.exceptions import ClientError, EndpointConnectionError
+
+script_dir = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.join(script_dir, "../../animal_recommender/lambda/api"))
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+from embedded_metrics import Metrics
+from recommendation import RecommendOperation
+from request_coalescing import RequestCoalescer
+from serving_engine import CampaignResolver, ServingEngine
+
+
+class StubSsm:
+    def get_parameter(self, Name):
+        return {"Parameter": {"Value": f"arn:{Name}"}}
+
+
+class StubDynamoDb:
+    """The coalescing table, shared by the containers of a test."""
+
+    def __init__(self):
+        self.items = {}
+        self.lock = threading.Lock()
+
+    def get_item(self, TableName, Key, ConsistentRead):
+        with self.lock:
+            item = self.items.get(Key["key"]["S"])
+        return {} if item is None else {"Item": item}
+
+    def put_item(self, TableName, Item, **condition):
+        with self.lock:
+            current = self.items.get(Item["key"]["S"])
+            if condition and current is not None:
+                now = float(condition["ExpressionAttributeValues"][":now"]["N"])
+                if float(current["expires_at"]["N"]) >= now:
+                    raise ClientError(
+                        {"Error": {"Code": "ConditionalCheckFailedException"}},
+                        "PutItem",
+                    )
+            self.items[Item["key"]["S"]] = Item
+
+    def delete_item(self, TableName, Key):
+        with self.lock:
+            self.items.pop(Key["key"]["S"], None)
+
+
+class UnreachableDynamoDb:
+    def get_item(self, **kwargs):
+        raise EndpointConnectionError(endpoint_url="https://dynamodb")
+
+    put_item = delete_item = get_item
+
+
+class SlowPersonalizeRuntime:
+    def __init__(self, started, release, fail=False):
+        self.calls = 0
+        self.started = started
+        self.release = release
+        self.fail = fail
+
+    def get_recommendations(self, campaignArn, userId, numResults):
+        self.calls += 1
+        self.started.set()
+        self.release.wait(5)
+        if self.fail:
+            raise RuntimeError("throttled")
+        return {"itemList": [{"itemId": f"group-{i}"} for i in range(numResults)]}
+
+
+def container(table, runtime, coalescing="anonymous"):
+    """The engine of one lambda environment."""
+    metrics = Metrics("get-recommendation")
+    engine = ServingEngine(
+        CampaignResolver(StubSsm()),
+        coalescer=RequestCoalescer(
+            "coalescing", metrics, wait_seconds=5, dynamodb_client=table
+        ),
+        metrics=metrics,
+    )
+    engine.runtime = runtime
+    return engine, RecommendOperation("/campaign", coalescing=coalescing)
+
+
+def serve_while_leader_calls(leader_runtime, follower_runtime, body):
+    table = StubDynamoDb()
+    started, release = threading.Event(), threading.Event()
+    leader_runtime.started, leader_runtime.release = started, release
+    leader, recommend = container(table, leader_runtime)
+    follower, _ = container(table, follower_runtime)
+
+    responses = {}
+
+    def serve(name, engine):
+        try:
+            responses[name] = engine.handle(recommend, {"body": dict(body)})
+        except RuntimeError as e:
+            responses[name] = e
+
+    leader_thread = threading.Thread(target=serve, args=("leader", leader))
+    leader_thread.start()
+    started.wait(5)
+    follower_thread = threading.Thread(target=serve, args=("follower", follower))
+    follower_thread.start()
+    release.set()
+    leader_thread.join(5)
+    follower_thread.join(5)
+    return responses
+
+
+def test_identical_anonymous_requests_share_one_personalize_call(capsys):
+    leader_runtime = SlowPersonalizeRuntime(None, None)
+    follower_runtime = SlowPersonalizeRuntime(threading.Event(), threading.Event())
+    follower_runtime.release.set()
+
+    responses = serve_while_leader_calls(leader_runtime, follower_runtime, {"limit": 3})
+
+    assert responses["leader"] == responses["follower"]
+    assert json.loads(responses["follower"]["body"]) == [
+        {"id": f"group-{i}"} for i in range(3)
+    ]
+    assert leader_runtime.calls == 1
+    assert follower_runtime.calls == 0
+    metric_lines = [
+        json.loads(line)
+        for line in capsys.readouterr().out.splitlines()
+        if line.startswith('{"_aws"')
+    ]
+    assert {"CoalescingLeaderCalls": 1} in [
+        {k: v for k, v in line.items() if k.startswith("Coalesc")}
+        for line in metric_lines
+    ]
+    assert any(line.get("CoalescedRequests") == 1 for line in metric_lines)
+
+
+def test_waiting_request_calls_personalize_when_the_leader_fails():
+    leader_runtime = SlowPersonalizeRuntime(None, None, fail=True)
+    follower_runtime = SlowPersonalizeRuntime(threading.Event(), threading.Event())
+    follower_runtime.release.set()
+
+    responses = serve_while_leader_calls(leader_runtime, follower_runtime, {"limit": 3})
+
+    assert isinstance(responses["leader"], RuntimeError)
+    assert responses["follower"]["statusCode"] == 200
+    assert follower_runtime.calls == 1
+
+
+def test_requests_of_a_user_are_not_coalesced_by_default():
+    table = StubDynamoDb()
+    runtime = SlowPersonalizeRuntime(threading.Event(), threading.Event())
+    runtime.release.set()
+    engine, recommend = container(table, runtime)
+
+    engine.handle(recommend, {"body": {"userId": "12345"}})
+    engine.handle(recommend, {"body": {"userId": "12345"}})
+
+    assert runtime.calls == 2
+    assert table.items == {}
+
+
+def test_requests_are_served_when_the_table_fails(capsys):
+    runtime = SlowPersonalizeRuntime(threading.Event(), threading.Event())
+    runtime.release.set()
+    engine, recommend = container(UnreachableDynamoDb(), runtime)
+
+    response = engine.handle(recommend, {"body": {"limit": 3}})
+
+    assert response["statusCode"] == 200
+    assert runtime.calls == 1
+    assert '"CoalescingErrors": 1' in capsys.readouterr().out
+
+
+def test_requests_are_served_when_the_response_cannot_be_shared():
+    table = StubDynamoDb()
+    runtime = SlowPersonalizeRuntime(threading.Event(), threading.Event())
+    runtime.release.set()
+    engine, recommend = container(table, runtime)
+    table.put_item = lambda Item, **kwargs: (
+        StubDynamoDb.put_item(table, Item=Item, **kwargs)
+        if kwargs.get("ConditionExpression")
+        else UnreachableDynamoDb().put_item()
+    )
+
+    response = engine.handle(recommend, {"body": {"limit": 3}})
+
+    assert response["statusCode"] == 200
+    assert runtime.calls == 1
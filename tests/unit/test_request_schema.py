@@ -0,0 +1,112 @@
+## Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+## SPDX-License-Identifier: MIT-0
+import json, os, sys
+
+import pytest
+
+script_dir = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.join(script_dir, "../../animal_recommender/lambda/api"))
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+from group_expansion import GroupExpander
+from recommendation import RecommendOperation
+from request_schema import compile_schema
+from reranking import RerankOperation
+from serving_engine import CampaignResolver, RequestError, ServingEngine
+
+
+class StubSsm:
+    def __init__(self):
+        self.calls = 0
+
+    def get_parameter(self, Name):
+        self.calls += 1
+        return {"Parameter": {"Value": f"arn:{Name}"}}
+
+
+def item(item_id, **metadata):
+    animal_metadata = {
+        "animal_species_id": 2,
+        "animal_primary_breed_id": "Beagle",
+        "animal_size_id": "3",
+        "animal_age_id": 1,
+    }
+    animal_metadata.update(metadata)
+    return {"itemId": item_id, "animalMetadata": animal_metadata}
+
+
+def test_compiled_validator_reports_the_path_of_the_invalid_value():
+    validate = compile_schema(
+        {
+            "type": "object",
+            "required": ["items"],
+            "properties": {
+                "items": {
+                    "type": "array",
+                    "maxItems": 3,
+                    "items": {
+                        "type": "object",
+                        "required": ["id"],
+                        "properties": {"id": {"type": "integer", "minimum": 0}},
+                    },
+                }
+            },
+        },
+        "test request",
+    )
+
+    validate({"items": [{"id": 1}, {"id": 0, "extra": True}]})
+    with pytest.raises(RequestError, match=r"items\[1\].id must be at least 0"):
+        validate({"items": [{"id": 1}, {"id": -1}]})
+    with pytest.raises(RequestError, match=r"items\[0\].id must be an integer"):
+        validate({"items": [{"id": True}]})
+    with pytest.raises(RequestError, match="at most 3 items"):
+        validate({"items": [{"id": 1}] * 4})
+    with pytest.raises(RequestError, match="body must be an object"):
+        validate([])
+
+
+def test_malformed_requests_are_rejected_before_ssm():
+    ssm = StubSsm()
+    engine = ServingEngine(CampaignResolver(ssm))
+    recommend = RecommendOperation("/campaign")
+    rerank = RerankOperation("/rerank-campaign", GroupExpander())
+
+    responses = [
+        engine.handle(recommend, {"body": {"limit": "ten"}}),
+        engine.handle(recommend, {"body": {"limit": 501}}),
+        engine.handle(recommend, {"body": "{not json"}),
+        engine.handle(recommend, {}),
+        engine.handle(
+            rerank,
+            {
+                "body": {
+                    "userId": "12345",
+                    "itemMetadataList": [item("1"), item("2", animal_age_id=None)],
+                }
+            },
+        ),
+        engine.handle(rerank, {"body": {"userId": "12345", "cursor": 7}}),
+    ]
+
+    assert [response["statusCode"] for response in responses] == [400] * 6
+    assert (
+        "itemMetadataList[1].animalMetadata.animal_age_id"
+        in json.loads(responses[4]["body"])["error"]
+    )
+    assert ssm.calls == 0
+
+
+def test_valid_bodies_become_requests():
+    rerank = RerankOperation("/rerank-campaign", GroupExpander())
+
+    request = rerank.validate(
+        json.loads(json.dumps({"userId": "12345", "itemMetadataList": [item(7)]}))
+    )
+
+    assert request["id_group_pairs"][0][:2] == (7, "2-Beagle-3-1")
+    assert RecommendOperation("/campaign").validate({"limit": 5}) == {
+        "userId": "unknown",
+        "limit": 5,
+        "segment": "all",
+    }
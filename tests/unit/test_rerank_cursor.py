@@ -0,0 +1,78 @@
+## Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+## SPDX-License-Identifier: MIT-0
+import base64, boto3, os, sys, pytest, uuid
+from moto import mock_dynamodb
+
+script_dir = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.join(script_dir, "../../animal_recommender/lambda/api"))
+
+from rerank_cursor import CursorStore, InvalidCursor, decode_cursor, encode_cursor
+
+TABLE_NAME = "test-recommender-rerank-cursor-ddb"
+
+
+@pytest.fixture
+def cursor_store():
+    with mock_dynamodb():
+        dynamodb = boto3.client("dynamodb", region_name="us-east-1")
+        dynamodb.create_table(
+            TableName=TABLE_NAME,
+            KeySchema=[{"AttributeName": "cursor", "KeyType": "HASH"}],
+            AttributeDefinitions=[{"AttributeName": "cursor", "AttributeType": "S"}],
+            BillingMode="PAY_PER_REQUEST",
+        )
+        yield CursorStore(dynamodb, TABLE_NAME, 900)
+
+
+def test_pages_are_sliced_from_cached_ranking(cursor_store):
+    ranking = [str(i) for i in range(5)]
+
+    page, cursor = cursor_store.first_page("12345", ranking, 2)
+    assert page == ["0", "1"]
+
+    page, cursor = cursor_store.next_page(cursor, "12345", 2)
+    assert page == ["2", "3"]
+
+    page, cursor = cursor_store.next_page(cursor, "12345", 2)
+    assert page == ["4"]
+    assert cursor is None
+
+
+def test_single_page_is_not_cached(cursor_store):
+    assert cursor_store.first_page("12345", ["1", "2"], 2) == (["1", "2"], None)
+
+
+def test_invalid_cursors(cursor_store):
+    _, cursor = cursor_store.first_page("12345", ["1", "2", "3"], 2)
+
+    with pytest.raises(InvalidCursor):
+        cursor_store.next_page(cursor, "other-user", 2)
+    with pytest.raises(InvalidCursor):
+        cursor_store.next_page("not-a-cursor", "12345", 2)
+    token, _ = decode_cursor(cursor)
+    with pytest.raises(InvalidCursor):
+        cursor_store.next_page(encode_cursor(token, -1), "12345", 2)
+
+    expired = CursorStore(cursor_store.dynamodb, TABLE_NAME, -1)
+    _, expired_cursor = expired.first_page("12345", ["1", "2", "3"], 2)
+    with pytest.raises(InvalidCursor):
+        expired.next_page(expired_cursor, "12345", 2)
+
+
+def test_large_rankings_fit_in_dynamodb_items(cursor_store):
+    # about 470 KB of json, over the 400 KB item limit uncompressed
+    ranking = [f"animal-{uuid.uuid4()}" for _ in range(10000)]
+
+    _, cursor = cursor_store.first_page("12345", ranking, 25)
+    page, _ = cursor_store.next_page(cursor, "12345", 25)
+    assert page == ranking[25:50]
+
+    split = CursorStore(cursor_store.dynamodb, TABLE_NAME, 900, max_part_bytes=4096)
+    _, cursor = split.first_page("12345", ranking, 25)
+    page, cursor = split.next_page(cursor, "12345", 9970)
+    assert page == ranking[25:9995]
+    assert split.next_page(cursor, "12345", 25) == (ranking[9995:], None)
+    # a part is not a cursor
+    token = base64.urlsafe_b64decode(cursor).decode("utf-8").split(":")[0]
+    with pytest.raises(InvalidCursor):
+        split.next_page(encode_cursor(f"{token}.1", 0), "12345", 25)
@@ -0,0 +1,207 @@
+## Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+## SPDX-License-Identifier: MIT-0
+import json, os, sys, threading
+
+script_dir = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.join(script_dir, "../../animal_recommender/lambda/api"))
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+from group_expansion import GroupExpander
+from recommendation import RecommendOperation
+from reranking import RerankOperation
+from serving_engine import CampaignResolver, ResponseCache, ServingEngine
+
+
+class StubSsm:
+    def __init__(self):
+        self.calls = 0
+
+    def get_parameter(self, Name):
+        self.calls += 1
+        return {"Parameter": {"Value": f"arn:{Name}"}}
+
+
+class StubPersonalizeRuntime:
+    def __init__(self, barrier=None):
+        self.calls = []
+        self.barrier = barrier
+
+    def get_recommendations(self, campaignArn, userId, numResults):
+        self.calls.append("get_recommendations")
+        if self.barrier:
+            self.barrier.wait()
+        return {"itemList": [{"itemId": f"group-{i}"} for i in range(numResults)]}
+
+    def get_personalized_ranking(self, campaignArn, inputList, userId):
+        self.calls.append("get_personalized_ranking")
+        if self.barrier:
+            self.barrier.wait()
+        return {
+            "personalizedRanking": [
+                {"itemId": group, "score": 0.5} for group in sorted(inputList)
+            ]
+        }
+
+
+def animal(item_id, breed):
+    return {
+        "itemId": item_id,
+        "animalMetadata": {
+            "animal_species_id": "2",
+            "animal_primary_breed_id": breed,
+            "animal_size_id": "3",
+            "animal_age_id": "2",
+        },
+    }
+
+
+def engine_with(runtime, ssm=None, cache_ttl_seconds=0):
+    engine = ServingEngine(
+        CampaignResolver(ssm or StubSsm()), ResponseCache(cache_ttl_seconds)
+    )
+    engine.runtime = runtime
+    return engine
+
+
+def test_cached_recommendations_skip_personalize():
+    ssm = StubSsm()
+    runtime = StubPersonalizeRuntime()
+    engine = engine_with(runtime, ssm, cache_ttl_seconds=60)
+    recommend = RecommendOperation("/campaign")
+
+    first = engine.handle(recommend, {"body": {"userId": "unknown", "limit": 3}})
+    second = engine.handle(recommend, {"body": {"userId": "unknown", "limit": 3}})
+    other_limit = engine.handle(recommend, {"body": {"userId": "unknown"}})
+
+    assert first == second
+    assert json.loads(first["body"]) == [{"id": f"group-{i}"} for i in range(3)]
+    assert len(json.loads(other_limit["body"])) == 10
+    assert runtime.calls == ["get_recommendations", "get_recommendations"]
+    assert ssm.calls == 1
+
+
+def test_malformed_rerank_request_is_rejected_before_ssm():
+    ssm = StubSsm()
+    runtime = StubPersonalizeRuntime()
+    engine = engine_with(runtime, ssm)
+    rerank = RerankOperation("/rerank-campaign", GroupExpander())
+
+    response = engine.handle(
+        rerank, {"body": {"userId": "12345", "itemMetadataList": [{"itemId": "1"}]}}
+    )
+
+    assert response["statusCode"] == 400
+    assert "animalMetadata" in json.loads(response["body"])["error"]
+    assert ssm.calls == 0
+    assert runtime.calls == []
+
+
+def test_recommend_and_rerank_call_personalize_concurrently():
+    # each call waits for the other one, sequential calls would break the barrier
+    runtime = StubPersonalizeRuntime(barrier=threading.Barrier(2, timeout=5))
+    engine = engine_with(runtime)
+    operations = {
+        "recommendations": RecommendOperation("/campaign"),
+        "reranking": RerankOperation("/rerank-campaign", GroupExpander()),
+    }
+
+    response = engine.handle_all(
+        operations,
+        {
+            "body": {
+                "userId": "12345",
+                "recommendations": {"limit": 2},
+                "reranking": {
+                    "itemMetadataList": [
+                        animal("1", "Saint_Bernard"),
+                        animal("2", "Beagle"),
+                        animal("3", "Saint_Bernard"),
+                    ]
+                },
+            }
+        },
+    )
+
+    body = json.loads(response["body"])
+    assert response["statusCode"] == 200
+    assert body["recommendations"] == [{"id": "group-0"}, {"id": "group-1"}]
+    assert body["reranking"]["ranking"] == ["2", "1", "3"]
+    assert sorted(runtime.calls) == ["get_personalized_ranking", "get_recommendations"]
+
+
+def test_combined_request_needs_both_bodies():
+    engine = engine_with(StubPersonalizeRuntime())
+    operations = {
+        "recommendations": RecommendOperation("/campaign"),
+        "reranking": RerankOperation("/rerank-campaign", GroupExpander()),
+    }
+
+    response = engine.handle_all(
+        operations, {"body": {"userId": "12345", "recommendations": {}}}
+    )
+
+    assert response["statusCode"] == 400
+
+
+class StubContext:
+    def __init__(self, remaining_ms):
+        self.remaining_ms = remaining_ms
+
+    def get_remaining_time_in_millis(self):
+        return self.remaining_ms
+
+
+def test_request_without_fallback_answers_504_at_the_deadline():
+    # the call waits for a second caller that never comes
+    runtime = StubPersonalizeRuntime(barrier=threading.Barrier(2, timeout=5))
+    engine = ServingEngine(CampaignResolver(StubSsm()), deadline_seconds=5)
+    engine.runtime = runtime
+    rerank = RerankOperation("/rerank-campaign", GroupExpander())
+
+    # the lambda times out before the request deadline
+    response = engine.handle(
+        rerank,
+        {"body": {"userId": "12345", "itemMetadataList": [animal("1", "Beagle")]}},
+        StubContext(remaining_ms=150),
+    )
+    runtime.barrier.abort()
+
+    assert response["statusCode"] == 504
+    assert runtime.calls == ["get_personalized_ranking"]
+
+
+def test_requests_with_a_deadline_are_answered(monkeypatch):
+    # a latency budget of 0 waits for personalize, up to the deadline
+    monkeypatch.setenv("campaign_arn_ssm_path", "/campaign")
+    monkeypatch.setenv("recommendation_latency_budget_ms", "0")
+    runtime = StubPersonalizeRuntime()
+    engine = ServingEngine(CampaignResolver(StubSsm()), deadline_seconds=2.5)
+    engine.runtime = runtime
+    recommend = RecommendOperation.from_environment()
+    rerank = RerankOperation("/rerank-campaign", GroupExpander())
+
+    recommendations = engine.handle(
+        recommend, {"body": {"limit": 2}}, StubContext(remaining_ms=3000)
+    )
+    reranking = engine.handle(
+        rerank,
+        {"body": {"userId": "12345", "itemMetadataList": [animal("1", "Beagle")]}},
+        StubContext(remaining_ms=3000),
+    )
+    combined = engine.handle_all(
+        {"recommendations": recommend, "reranking": rerank},
+        {
+            "body": {
+                "userId": "12345",
+                "recommendations": {"limit": 1},
+                "reranking": {"itemMetadataList": [animal("1", "Beagle")]},
+            }
+        },
+        StubContext(remaining_ms=3000),
+    )
+
+    assert recommend.latency_budget_seconds is None
+    assert json.loads(recommendations["body"]) == [{"id": "group-0"}, {"id": "group-1"}]
+    assert json.loads(reranking["body"])["ranking"] == ["1"]
+    assert combined["statusCode"] == 200
+    assert json.loads(combined["body"])["reranking"]["ranking"] == ["1"]
@@ -0,0 +1,134 @@
+## Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+## SPDX-License-Identifier: MIT-0
+import csv, json, os, sys
+
+script_dir = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.join(script_dir, "../../seed_data"))
+
+from sync_items_dataset import put_items, sync
+
+ITEMS = [
+    "ANIMAL_TYPE,ANIMAL_AGE,ANIMAL_SIZE,ANIMAL_BREED,ITEM_VALUE,ITEM_ID,CREATION_TIMESTAMP",
+    "2,1,1,Pug,0.3,2-Pug-1-1,15000000",
+    "2,2,1,Pug,0.1,2-Pug-1-2,1650000000",
+]
+
+
+def write_feed(path, animals):
+    with open(path, "w") as fw:
+        for animal in animals:
+            fw.write(json.dumps(animal) + "\n")
+    return str(path)
+
+
+def animal(animal_id, breed, size, age, intake, status="available"):
+    return {
+        "animal_id": animal_id,
+        "animal_species_id": "2",
+        "animal_primary_breed_id": breed,
+        "animal_size_id": size,
+        "animal_age_id": age,
+        "intake_timestamp": intake,
+        "status": status,
+    }
+
+
+def read_csv(path):
+    with open(path, newline="") as fr:
+        return {row["ITEM_ID"]: row for row in csv.DictReader(fr)}
+
+
+def run(tmp_path, animals, name):
+    return sync(
+        write_feed(tmp_path / name, animals),
+        str(tmp_path / "items" / "items_0.csv"),
+        str(tmp_path / "state.json"),
+        str(tmp_path / "deltas"),
+        now=1660000000,
+    )
+
+
+def test_delta_has_only_new_and_changed_groups(tmp_path):
+    (tmp_path / "items").mkdir()
+    (tmp_path / "items" / "items_0.csv").write_text("\n".join(ITEMS) + "\n")
+
+    delta_path, changed = run(
+        tmp_path,
+        [
+            animal("a1", "Pug", "1", "1", 1655000000),
+            animal("a2", "Pug", "1", "1", 1654000000),
+            animal("a3", "Pug", "1", "2", 1656000000),
+            animal("a4", "Golden_Retriever", "3", "2", 1657000000),
+            animal("a5", "Beagle", "2", "2", 1657000000, status="adopted"),
+        ],
+        "feed_1.jsonl",
+    )
+
+    assert delta_path.endswith("items_delta_20220808T230640Z.csv")
+    delta = read_csv(delta_path)
+    # placeholder replaced by the first intake, new group added
+    assert {item_id: row["CREATION_TIMESTAMP"] for item_id, row in delta.items()} == {
+        "2-Pug-1-1": "1654000000",
+        "2-Golden_Retriever-3-2": "1657000000",
+    }
+    assert delta["2-Pug-1-1"]["ITEM_VALUE"] == "0.3"
+    items = read_csv(tmp_path / "items" / "items_0.csv")
+    assert len(items) == 3
+    assert items["2-Pug-1-2"]["CREATION_TIMESTAMP"] == "1650000000"
+
+    # nothing changed
+    assert (
+        run(tmp_path, [animal("a3", "Pug", "1", "2", 1656000000)], "feed_2.jsonl")[0]
+        is None
+    )
+
+
+def test_group_coming_back_is_recreated(tmp_path):
+    (tmp_path / "items").mkdir()
+    (tmp_path / "items" / "items_0.csv").write_text("\n".join(ITEMS) + "\n")
+    run(tmp_path, [animal("a3", "Pug", "1", "2", 1656000000)], "feed_1.jsonl")
+    run(tmp_path, [], "feed_2.jsonl")
+
+    _, changed = run(
+        tmp_path, [animal("a6", "Pug", "1", "2", 1659000000)], "feed_3.jsonl"
+    )
+
+    assert [(row["ITEM_ID"], row["CREATION_TIMESTAMP"]) for row in changed] == [
+        ("2-Pug-1-2", "1659000000")
+    ]
+
+
+class StubPersonalizeEvents:
+    def __init__(self):
+        self.calls = []
+
+    def put_items(self, datasetArn, items):
+        self.calls.append(items)
+
+
+def test_put_items_batches():
+    personalize_events = StubPersonalizeEvents()
+    rows = [
+        {
+            "ANIMAL_TYPE": "2",
+            "ANIMAL_AGE": "1",
+            "ANIMAL_SIZE": "1",
+            "ANIMAL_BREED": "Pug",
+            "ITEM_VALUE": "0.1",
+            "ITEM_ID": f"2-Pug-1-{i}",
+            "CREATION_TIMESTAMP": "1657000000",
+        }
+        for i in range(12)
+    ]
+
+    put_items(personalize_events, "arn:dataset/ITEMS", rows)
+
+    assert [len(call) for call in personalize_events.calls] == [10, 2]
+    assert json.loads(personalize_events.calls[0][0]["properties"]) == {
+        "animalType": "2",
+        "animalAge": "1",
+        "animalSize": "1",
+        "animalBreed": "Pug",
+        "itemValue": 0.1,
+        "creationTimestamp": 1657000000,
+    }
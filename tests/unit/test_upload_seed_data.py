@@ -0,0 +1,81 @@
+## Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+## SPDX-License-Identifier: MIT-0
+import gzip, os, sys
+
+import boto3
+from moto import mock_s3
+
+script_dir = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.join(script_dir, "../../seed_data"))
+
+from upload_seed_data import LocalBackend, S3Backend, sync
+
+
+def seed_dir(tmp_path):
+    source = tmp_path / "seed_data"
+    (source / "items").mkdir(parents=True)
+    (source / "interactions").mkdir()
+    (source / "schemas").mkdir()
+    (source / "items" / "items_0.csv").write_text("ITEM_ID\n1-Pug-2-2\n")
+    (source / "interactions" / "interactions_0.csv").write_text(
+        "USER_ID,ITEM_ID,TIMESTAMP\n1,1-Pug-2-2,1656408773\n"
+    )
+    (source / "schemas" / "items_schema.json").write_text("{}")
+    return source
+
+
+def test_only_changed_files_are_uploaded(tmp_path):
+    source = seed_dir(tmp_path)
+    backend = LocalBackend(str(tmp_path / "bucket"))
+
+    first = sync(backend, str(source))
+    unchanged = sync(backend, str(source))
+    (source / "items" / "items_0.csv").write_text("ITEM_ID\n1-Pug-2-3\n")
+    changed = sync(backend, str(source))
+
+    assert first == {
+        "uploaded": [
+            "seed_data/interactions/interactions_0.csv",
+            "seed_data/items/items_0.csv",
+        ],
+        "skipped": 0,
+    }
+    assert unchanged == {"uploaded": [], "skipped": 2}
+    assert changed == {"uploaded": ["seed_data/items/items_0.csv"], "skipped": 1}
+    assert (tmp_path / "bucket/seed_data/items/items_0.csv").read_text() == (
+        "ITEM_ID\n1-Pug-2-3\n"
+    )
+
+
+def test_gzip_upload(tmp_path):
+    source = seed_dir(tmp_path)
+    backend = LocalBackend(str(tmp_path / "bucket"))
+
+    result = sync(backend, str(source), directories=["items"], compress=True)
+
+    assert result["uploaded"] == ["seed_data/items/items_0.csv.gz"]
+    with gzip.open(tmp_path / "bucket/seed_data/items/items_0.csv.gz", "rt") as fr:
+        assert fr.read() == "ITEM_ID\n1-Pug-2-2\n"
+    assert (
+        sync(backend, str(source), directories=["items"], compress=True)["skipped"] == 1
+    )
+
+
+@mock_s3
+def test_s3_backend_keeps_hash_in_metadata(tmp_path):
+    s3 = boto3.client("s3", region_name="us-east-1")
+    s3.create_bucket(Bucket="seed-bucket")
+    source = seed_dir(tmp_path)
+    backend = S3Backend(s3, "seed-bucket")
+
+    first = sync(backend, str(source))
+    second = sync(backend, str(source))
+
+    assert len(first["uploaded"]) == 2
+    assert second == {"uploaded": [], "skipped": 2}
+    assert (
+        s3.get_object(Bucket="seed-bucket", Key="seed_data/items/items_0.csv")[
+            "Body"
+        ].read()
+        == b"ITEM_ID\n1-Pug-2-2\n"
+    )
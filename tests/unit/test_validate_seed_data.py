@@ -0,0 +1,141 @@
+## Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+## SPDX-License-Identifier: MIT-0
+import os, sys
+
+script_dir = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.join(script_dir, "../../seed_data"))
+
+from validate_seed_data import load_schema, validate
+
+schemas_dir = os.path.join(script_dir, "../../seed_data/schemas")
+
+
+def write_csv(path, lines):
+    path.write_text("\n".join(lines) + "\n")
+    return str(path)
+
+
+def run(tmp_path, items, interactions, chunk_rows=2):
+    return validate(
+        write_csv(tmp_path / "items.csv", items),
+        load_schema(os.path.join(schemas_dir, "items_schema.json")),
+        write_csv(tmp_path / "interactions.csv", interactions),
+        load_schema(os.path.join(schemas_dir, "interactions_schema.json")),
+        chunk_rows,
+    )
+
+
+ITEMS = [
+    "ANIMAL_TYPE,ANIMAL_AGE,ANIMAL_SIZE,ANIMAL_BREED,ITEM_VALUE,ITEM_ID,CREATION_TIMESTAMP",
+    "2,1,1,Pug,0.1,2-Pug-1-1,15000000",
+    "2,2,1,Pug,0.1,2-Pug-1-2,15000000",
+]
+
+
+def test_seed_data_is_valid():
+    report = validate(
+        os.path.join(script_dir, "../../seed_data/items/items_0.csv"),
+        load_schema(os.path.join(schemas_dir, "items_schema.json")),
+        os.path.join(script_dir, "../../seed_data/interactions/interactions_mini.csv"),
+        load_schema(os.path.join(schemas_dir, "interactions_schema.json")),
+        1000,
+    )
+
+    assert report["items"]["errors"] == []
+    assert report["interactions"]["errors"] == []
+    assert report["interactions"]["orphan_item_ids"] == 0
+
+
+def test_invalid_values_are_reported_with_rows(tmp_path):
+    interactions = [
+        "USER_ID,ITEM_ID,TIMESTAMP",
+        "1,2-Pug-1-1,1656408773",
+        "1,2-Pug-1-1,",
+        "2,2-Pug-1-1,yesterday",
+        "2,2-Pug-1-2,1656408773",
+    ]
+
+    report = run(tmp_path, ITEMS, interactions)
+
+    timestamp = report["interactions"]["fields"]["TIMESTAMP"]
+    assert timestamp["invalid"] == 2
+    assert timestamp["examples"] == [
+        "row 3: missing value",
+        "row 4: not a valid long",
+    ]
+    assert "2 invalid values in TIMESTAMP" in report["interactions"]["errors"]
+
+
+def test_orphans_duplicates_and_user_counts(tmp_path):
+    interactions = ["USER_ID,ITEM_ID,TIMESTAMP"] + [
+        "1,2-Pug-1-1,1656408773",
+        "1,2-Pug-1-1,1656408773",
+        "1,2-Pug-9-9,1656408774",
+        "2,2-Pug-1-2,1656408775000",
+    ]
+
+    report = run(tmp_path, ITEMS, interactions)["interactions"]
+
+    assert report["orphan_item_ids"] == 1
+    assert report["orphan_examples"] == ["row 4: 2-Pug-9-9"]
+    assert report["duplicates"] == 1
+    assert report["users"] == 2
+    assert report["interactions_per_user"]["max"] == 3
+    assert any("milliseconds" in error for error in report["errors"])
+    assert any("at least 1000" in error for error in report["errors"])
+
+
+def test_header_mismatch(tmp_path):
+    interactions = ["USER_ID,ITEM,TIMESTAMP", "1,2-Pug-1-1,1656408773"]
+
+    report = run(tmp_path, ITEMS, interactions)["interactions"]
+
+    assert "Missing column ITEM_ID" in report["errors"]
+    assert "Column ITEM is not in the schema" in report["errors"]
+
+
+def test_every_csv_of_an_interactions_folder_is_validated(tmp_path):
+    items = write_csv(tmp_path / "items.csv", ITEMS)
+    folder = tmp_path / "interactions"
+    (folder / "2022").mkdir(parents=True)
+    write_csv(
+        folder / "2022" / "interactions-2022-06-part-00000.csv",
+        ["USER_ID,ITEM_ID,TIMESTAMP", "1,2-Pug-1-1,1656408773"],
+    )
+    write_csv(
+        folder / "interactions-2022-07-part-00000.csv",
+        ["USER_ID,ITEM_ID,TIMESTAMP", "1,2-Pug-1-2,1656408774", "2,2-Pug-9-9,tomorrow"],
+    )
+    write_csv(folder / "notes.txt", ["not a dataset"])
+
+    report = validate(
+        items,
+        load_schema(os.path.join(schemas_dir, "items_schema.json")),
+        str(folder),
+        load_schema(os.path.join(schemas_dir, "interactions_schema.json")),
+        2,
+    )["interactions"]
+
+    assert report["files"] == 2
+    assert report["rows"] == 3
+    assert report["users"] == 2
+    assert report["orphan_examples"] == [
+        "interactions-2022-07-part-00000.csv row 3: 2-Pug-9-9"
+    ]
+    assert report["fields"]["TIMESTAMP"]["examples"] == [
+        "interactions-2022-07-part-00000.csv row 3: not a valid long"
+    ]
+
+
+def test_an_empty_interactions_folder_is_an_error(tmp_path):
+    (tmp_path / "interactions").mkdir()
+
+    report = validate(
+        write_csv(tmp_path / "items.csv", ITEMS),
+        load_schema(os.path.join(schemas_dir, "items_schema.json")),
+        str(tmp_path / "interactions"),
+        load_schema(os.path.join(schemas_dir, "interactions_schema.json")),
+        2,
+    )["interactions"]
+
+    assert f"No csv files in {tmp_path / 'interactions'}" in report["errors"]
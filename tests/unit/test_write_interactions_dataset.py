@@ -0,0 +1,203 @@
+## Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+## SPDX-License-Identifier: MIT-0
+import csv, gzip, json, os, subprocess, sys
+
+script_dir = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.join(script_dir, "../../seed_data"))
+sys.path.append(os.path.join(script_dir, "../../animal_recommender/lambda/api"))
+
+from event_envelope import encode_event
+from write_interactions_dataset import (
+    ShardedDatasetWriter,
+    archive_interactions,
+    csv_interactions,
+    new_archive_objects,
+    new_csv_rows,
+)
+
+JUNE = 1654318223
+JULY = 1656700000
+
+
+def read_shard(path):
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", newline="") as fr:
+        return list(csv.reader(fr))
+
+
+def test_shards_are_partitioned_and_size_bounded(tmp_path):
+    rows = [(str(i), "1-Pug-2-2", JUNE + i) for i in range(10)]
+    rows += [("1", "2-Pug-2-2", JULY)]
+    manifest_path = str(tmp_path / "manifest.json")
+
+    with ShardedDatasetWriter(
+        str(tmp_path / "interactions"), manifest_path, max_shard_bytes=100
+    ) as writer:
+        writer.write(rows)
+
+    manifest = json.load(open(manifest_path))
+    keys = [shard["key"] for shard in manifest["shards"]]
+    assert keys == [
+        "interactions-2022-06-part-00000.csv",
+        "interactions-2022-06-part-00001.csv",
+        "interactions-2022-06-part-00002.csv",
+        "interactions-2022-06-part-00003.csv",
+        "interactions-2022-07-part-00000.csv",
+    ]
+    assert manifest["rows"] == 11
+    assert all(shard["bytes"] <= 100 for shard in manifest["shards"])
+    first = read_shard(str(tmp_path / "interactions" / keys[0]))
+    assert first[0] == ["USER_ID", "ITEM_ID", "TIMESTAMP"]
+    assert len(first) - 1 == manifest["shards"][0]["rows"]
+    assert manifest["shards"][4]["min_timestamp"] == JULY
+
+
+def test_appends_only_touch_newest_shards(tmp_path):
+    directory = str(tmp_path / "interactions")
+    manifest_path = str(tmp_path / "manifest.json")
+    with ShardedDatasetWriter(directory, manifest_path, compress=True) as writer:
+        writer.write([("1", "1-Pug-2-2", JUNE), ("2", "1-Pug-2-2", JULY)])
+
+    with ShardedDatasetWriter(directory, manifest_path, compress=True) as writer:
+        writer.write([("3", "1-Pug-2-2", JULY + 60)])
+
+    assert writer.touched == {"interactions-2022-07-part-00000.csv.gz"}
+    assert read_shard(
+        os.path.join(directory, "interactions-2022-07-part-00000.csv.gz")
+    ) == [
+        ["USER_ID", "ITEM_ID", "TIMESTAMP"],
+        ["2", "1-Pug-2-2", str(JULY)],
+        ["3", "1-Pug-2-2", str(JULY + 60)],
+    ]
+    assert json.load(open(manifest_path))["rows"] == 3
+
+
+def test_sources():
+    seed = list(
+        csv_interactions(
+            os.path.join(
+                script_dir, "../../seed_data/interactions/interactions_mini.csv"
+            )
+        )
+    )
+    assert seed[0] == ("10000", "1-Abyssinian-3-2", "1656408773")
+
+    metadata = {
+        "animal_species_id": "1",
+        "animal_primary_breed_id": "Pug",
+        "animal_size_id": "2",
+        "animal_age_id": "2",
+    }
+    records = [
+        {"userId": "1", "eventType": "DetailView", "timestamp": JUNE * 1000},
+        {"sessionId": "anonymous", "eventType": "DetailView", "timestamp": JUNE},
+        {"userId": "2", "eventType": "AvailabilityChange", "timestamp": JUNE},
+    ]
+    data = "".join(json.dumps(dict(r, animalMetadata=metadata)) for r in records)
+
+    assert list(archive_interactions([("2022/06/04/05/part", data.encode())])) == [
+        ("1", "1-Pug-2-2", JUNE)
+    ]
+
+
+def test_archive_objects_mix_envelopes_and_json():
+    metadata = {
+        "animal_species_id": "1",
+        "animal_primary_breed_id": "Pug",
+        "animal_size_id": "2",
+        "animal_age_id": "2",
+    }
+
+    def event(user_id):
+        return {
+            "userId": user_id,
+            "eventType": "DetailView",
+            "timestamp": JUNE,
+            "animalMetadata": metadata,
+        }
+
+    # \u00a5 is 0xc2 0xa5 in utf-8, its second byte is the envelope magic
+    data = b"".join(
+        [
+            encode_event(event("1")),
+            json.dumps(event("\u00a52"), ensure_ascii=False).encode("utf-8"),
+            json.dumps(event("3")).encode("utf-8"),
+            encode_event(event("4")),
+            encode_event(event("5")),
+        ]
+    )
+    rows = archive_interactions([("2022/06/04/05/part", data)])
+
+    assert [user_id for user_id, _, _ in rows] == ["1", "\u00a52", "3", "4", "5"]
+
+
+def test_written_sources_are_skipped_when_run_again(tmp_path):
+    directory = str(tmp_path / "interactions")
+    manifest_path = str(tmp_path / "manifest.json")
+    history = [("1", "1-Pug-2-2", JUNE), ("2", "1-Pug-2-2", JULY)]
+    record = json.dumps(
+        {
+            "userId": "3",
+            "eventType": "DetailView",
+            "timestamp": JULY,
+            "animalMetadata": {
+                "animal_species_id": "1",
+                "animal_primary_breed_id": "Pug",
+                "animal_size_id": "2",
+                "animal_age_id": "2",
+            },
+        }
+    ).encode()
+    objects = [("2022/07/01/00/a", record), ("2022/07/01/01/b", record)]
+
+    def run(csv_rows, archive_objects):
+        with ShardedDatasetWriter(directory, manifest_path) as writer:
+            seed = writer.sources.setdefault("seed:history.csv", {})
+            archive = writer.sources.setdefault("archive:bucket", {})
+            return writer.write(new_csv_rows(iter(csv_rows), seed)) + writer.write(
+                archive_interactions(new_archive_objects(archive_objects, archive))
+            )
+
+    assert run(history, objects) == 4
+    assert run(history, objects) == 0
+    # the csv grew and the archive got a later object
+    assert (
+        run(
+            history + [("4", "1-Pug-2-2", JULY)],
+            objects + [("2022/07/02/00/c", record)],
+        )
+        == 2
+    )
+
+    manifest = json.load(open(manifest_path))
+    assert manifest["rows"] == 6
+    assert manifest["sources"] == {
+        "seed:history.csv": {"rows": 3},
+        "archive:bucket": {"ranges": [["2022/07/01/00/a", "2022/07/02/00/c"]]},
+    }
+
+
+def test_seed_input_in_the_output_folder_is_refused(tmp_path):
+    output = tmp_path / "interactions"
+    output.mkdir()
+    (output / "history.csv").write_text("USER_ID,ITEM_ID,TIMESTAMP\n1,1-Pug-2-2,1\n")
+
+    result = subprocess.run(
+        [
+            sys.executable,
+            os.path.join(script_dir, "../../seed_data/write_interactions_dataset.py"),
+            "seed",
+            "--input",
+            str(output / "history.csv"),
+            "--output",
+            str(output),
+            "--manifest",
+            str(tmp_path / "manifest.json"),
+        ],
+        capture_output=True,
+        text=True,
+    )
+
+    assert result.returncode == 2
+    assert "imported twice" in result.stderr
+    assert sorted(os.listdir(output)) == ["history.csv"]